@@ -0,0 +1,3 @@
+"""
+Offline benchmarking tools (NextBus stub server, latency benchmarks)
+"""
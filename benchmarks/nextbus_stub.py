@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Local NextBus stand-in for offline performance tests
+Serves recorded or synthetic publicJSONFeed payloads with configurable latency, jitter and errors
+
+Usage:
+    # Replay a synthetic Toronto network
+    python -m benchmarks.nextbus_stub --port 8765 --latency-ms 40 --jitter-ms 20
+
+    # Record real responses while proxying to the live feed, then replay them
+    python -m benchmarks.nextbus_stub --record --fixtures benchmarks/fixtures/nextbus.json
+    python -m benchmarks.nextbus_stub --fixtures benchmarks/fixtures/nextbus.json
+
+    # Point the app at it
+    NEXTBUS_API_URL=http://127.0.0.1:8765/service/publicJSONFeed streamlit run src/app.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+import structlog
+
+logger = structlog.get_logger("maple_mover.nextbus_stub")
+
+LIVE_API_URL = "https://retro.umoiq.com/service/publicJSONFeed"
+FEED_PATH = "/service/publicJSONFeed"
+
+def fixture_key(params: List[Tuple[str, str]]) -> str:
+    """Canonical key for a request: command plus sorted params (vehicleLocations ignores t=)"""
+    params = [(k, v) for k, v in params if k != 'a']
+    command = dict(params).get('command', '')
+    if command == 'vehicleLocations':
+        params = [(k, v) for k, v in params if k != 't']
+    return "&".join(f"{k}={v}" for k, v in sorted(params))
+
+def _multi_stop_pairs(params: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [tuple(v.split('|', 1)) for k, v in params if k == 'stops' and '|' in v]
+
+class RecordedFixtures:
+    """Responses recorded from the live feed, stored as one JSON file
+
+    predictionsForMultiStops requests that were never recorded verbatim are
+    answered from every recorded (route, stop) prediction object, so replay
+    still works when the client chunks stops differently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.responses: Dict[str, Dict] = {}
+        self._pairs: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.responses = json.load(f).get('responses', {})
+            for key, payload in self.responses.items():
+                self._index(key, payload)
+
+    def _index(self, key: str, payload: Dict) -> None:
+        if not key.startswith('command=predictions'):
+            return
+        predictions = payload.get('predictions', [])
+        for pred_obj in predictions if isinstance(predictions, list) else [predictions]:
+            if isinstance(pred_obj, dict):
+                self._pairs[(pred_obj.get('routeTag', ''), pred_obj.get('stopTag', ''))] = pred_obj
+
+    def lookup(self, params: List[Tuple[str, str]]) -> Optional[Dict]:
+        key = fixture_key(params)
+        if key in self.responses:
+            return self.responses[key]
+        if dict(params).get('command') == 'predictionsForMultiStops':
+            found = [self._pairs[pair] for pair in _multi_stop_pairs(params) if pair in self._pairs]
+            return {'predictions': found}
+        return None
+
+    def record(self, params: List[Tuple[str, str]], payload: Dict) -> None:
+        key = fixture_key(params)
+        with self._lock:
+            self.responses[key] = payload
+            self._index(key, payload)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump({'version': 1, 'recorded_from': LIVE_API_URL, 'responses': self.responses}, f)
+
+class SyntheticNetwork:
+    """Deterministic grid of TTC-like routes over Toronto
+
+    East-west routes every ~1.3 km of latitude and north-south routes every
+    ~1.5 km of longitude, stops every ~250 m. Predictions and vehicles are
+    derived from the stop/route ids, so every run sees the same payloads.
+    """
+
+    MIN_LAT, MAX_LAT = 43.60, 43.83
+    MIN_LON, MAX_LON = -79.62, -79.16
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.routes: Dict[str, Dict] = {}
+        lat_step, lon_step, stop_step = 0.012, 0.018, 0.0025
+        route_no = 1
+
+        lat = self.MIN_LAT
+        while lat <= self.MAX_LAT:
+            self._add_route(str(route_no), f"{route_no}-Crosstown {route_no}",
+                            [(lat, self.MIN_LON + i * stop_step * 1.4) for i in range(int((self.MAX_LON - self.MIN_LON) / (stop_step * 1.4)) + 1)])
+            route_no += 1
+            lat += lat_step
+
+        lon = self.MIN_LON
+        while lon <= self.MAX_LON:
+            self._add_route(str(route_no), f"{route_no}-Avenue {route_no}",
+                            [(self.MIN_LAT + i * stop_step, lon) for i in range(int((self.MAX_LAT - self.MIN_LAT) / stop_step) + 1)])
+            route_no += 1
+            lon += lon_step
+
+        self._stops_by_id = {
+            stop['stopId']: (stop, tag) for tag, route in self.routes.items() for stop in route['stop']
+        }
+        self._stops_by_tag = {
+            (tag, stop['tag']): stop for tag, route in self.routes.items() for stop in route['stop']
+        }
+
+    def _add_route(self, tag: str, title: str, points: List[Tuple[float, float]]) -> None:
+        stops = [
+            {'tag': f"{tag}_{i}", 'stopId': str(int(tag) * 1000 + i), 'title': f"Route {tag} Stop {i}",
+             'lat': f"{lat:.6f}", 'lon': f"{lon:.6f}"}
+            for i, (lat, lon) in enumerate(points)
+        ]
+        self.routes[tag] = {'tag': tag, 'title': title, 'stop': stops}
+
+    def _rand(self, *parts) -> random.Random:
+        return random.Random(zlib.crc32(":".join(map(str, (self.seed,) + parts)).encode()))
+
+    def _prediction_obj(self, route_tag: str, stop: Dict) -> Dict:
+        rng = self._rand(route_tag, stop['tag'], int(time.time() // 60))
+        minutes = sorted(rng.randint(1, 30) for _ in range(3))
+        return {
+            'routeTag': route_tag,
+            'routeTitle': self.routes[route_tag]['title'],
+            'stopTag': stop['tag'],
+            'stopTitle': stop['title'],
+            'direction': {
+                'title': rng.choice(["Eastbound", "Westbound", "Northbound", "Southbound"]),
+                'prediction': [
+                    {'minutes': str(m), 'seconds': str(m * 60), 'vehicle': f"{route_tag}{rng.randint(0, 3)}"}
+                    for m in minutes
+                ]
+            }
+        }
+
+    def lookup(self, params: List[Tuple[str, str]]) -> Optional[Dict]:
+        query = dict(params)
+        command = query.get('command')
+        if command == 'routeList':
+            return {'route': [{'tag': r['tag'], 'title': r['title']} for r in self.routes.values()]}
+        if command == 'routeConfig':
+            route = self.routes.get(query.get('r'))
+            return {'route': route} if route else None
+        if command == 'predictions':
+            found = self._stops_by_id.get(query.get('stopId'))
+            return {'predictions': [self._prediction_obj(found[1], found[0])]} if found else None
+        if command == 'predictionsForMultiStops':
+            predictions = []
+            for route_tag, stop_tag in _multi_stop_pairs(params):
+                stop = self._stops_by_tag.get((route_tag, stop_tag))
+                if stop:
+                    predictions.append(self._prediction_obj(route_tag, stop))
+            return {'predictions': predictions}
+        if command == 'vehicleLocations':
+            vehicles = []
+            for tag, route in self.routes.items():
+                for n in range(4):
+                    stop = route['stop'][self._rand(tag, n).randrange(len(route['stop']))]
+                    vehicles.append({'id': f"{tag}{n}", 'routeTag': tag, 'dirTag': f"{tag}_0", 'lat': stop['lat'],
+                                     'lon': stop['lon'], 'heading': "90", 'speedKmHr': "25", 'secsSinceReport': "5"})
+            return {'vehicle': vehicles, 'lastTime': {'time': str(int(time.time() * 1000))}}
+        return None
+
+class NextBusStub:
+    """Threaded HTTP server answering publicJSONFeed requests from a fixture source
+
+    latency_ms/jitter_ms delay every response by latency ± jitter;
+    error_rate is the fraction of requests answered with HTTP 503. In
+    record mode every request is proxied to upstream_url and the response
+    is written to the fixture file before being returned.
+    """
+
+    def __init__(self, fixtures=None, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, record: bool = False,
+                 upstream_url: str = LIVE_API_URL, seed: int = 0):
+        self.fixtures = fixtures if fixtures is not None else SyntheticNetwork(seed)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.record = record
+        self.upstream_url = upstream_url
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._counts_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{FEED_PATH}"
+
+    def start(self) -> "NextBusStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="nextbus-stub", daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 NextBus stub listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "NextBusStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Requests served per command (plus 'errors' and 'missing')"""
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def reset_stats(self) -> None:
+        with self._counts_lock:
+            self._counts.clear()
+
+    def _count(self, name: str) -> None:
+        with self._counts_lock:
+            self._counts[name] += 1
+
+    def _delay_and_fail(self) -> bool:
+        """Sleep for the simulated latency; True if this request should fail"""
+        with self._rng_lock:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return fail
+
+    def _respond(self, params: List[Tuple[str, str]]) -> Tuple[int, Optional[Dict]]:
+        command = dict(params).get('command', '')
+        self._count(command or 'unknown')
+
+        if self.record:
+            response = requests.get(self.upstream_url, params=params, timeout=30)
+            if response.ok:
+                self.fixtures.record(params, response.json())
+            return response.status_code, response.json() if response.ok else None
+
+        if self._delay_and_fail():
+            self._count('errors')
+            return 503, None
+
+        payload = self.fixtures.lookup(params)
+        if payload is None:
+            self._count('missing')
+            return 404, {'Error': {'content': f"No fixture for {fixture_key(params)}", 'shouldRetry': 'false'}}
+        return 200, payload
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                status, payload = stub._respond(parse_qsl(parts.query)) if parts.path == FEED_PATH else (404, None)
+                body = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic NextBus payloads locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="Recorded fixture file (default: synthetic Toronto network)")
+    parser.add_argument("--record", action="store_true", help="Proxy to the live feed and save responses to --fixtures")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+
+    fixtures = RecordedFixtures(args.fixtures) if args.fixtures else None
+    stub = NextBusStub(fixtures, host=args.host, port=args.port, latency_ms=args.latency_ms,
+                       jitter_ms=args.jitter_ms, error_rate=args.error_rate, record=args.record, seed=args.seed)
+    stub.start()
+    print(f"NEXTBUS_API_URL={stub.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+if __name__ == "__main__":
+    main()
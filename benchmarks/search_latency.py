@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+End-to-end search latency benchmark
+Drives get_transit_data_for_location and MapleMoverApp.find_transit against the local NextBus stub
+
+Usage:
+    python -m benchmarks.search_latency --iterations 50 --latency-ms 40 --jitter-ms 15
+    python -m benchmarks.search_latency --output bench.json --compare baseline.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import structlog
+
+from benchmarks.nextbus_stub import NextBusStub, RecordedFixtures
+from src.config.settings import Settings
+
+# Cases documented in the repo's reports (see *_RESULTS.md / *_REPORT.md)
+CASES = {
+    "downtown": (43.6532, -79.3832),                 # Settings.DEFAULT_LAT/LON
+    "union_station": (43.6452, -79.3806),            # UNION_STATION_REPORT.md
+    "king_st_w_130": (43.6486, -79.3817),            # SEARCH_BAR_FIX.md (130 King St W)
+    "scarborough_marblemount": (43.7837, -79.3096),  # 32_MARBLEMOUNT_RESULTS.md
+    "seneca_hill": (43.7960291, -79.3485875),        # SENECA_COLLEGE_RESULTS.md / FIX_SENECA_HILL.md
+}
+
+TARGETS = ("get_transit_data_for_location", "find_transit")
+
+# Served by the shared vehicle poller's thread, not by the search being timed
+BACKGROUND_COMMANDS = ("vehicleLocations",)
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_output.json")
+
+def _percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+def _isolate_routes_cache(cache_dir: str) -> None:
+    """Keep the benchmark from reading or overwriting the real routes cache"""
+    from src.utils import routes_cache
+    routes_cache.redis_client = None
+    routes_cache.CACHE_DIR = cache_dir
+    routes_cache.ROUTES_CACHE_BINARY = os.path.join(cache_dir, "routes_cache.bin")
+    routes_cache.ROUTES_CACHE_PICKLE = os.path.join(cache_dir, "routes_cache.pkl")
+
+class SearchBenchmark:
+    """Runs every case against every target and collects latency, upstream calls and allocations"""
+
+    def __init__(self, stub: NextBusStub, iterations: int, warm_cache: bool):
+        self.stub = stub
+        self.iterations = iterations
+        self.warm_cache = warm_cache
+
+        # Services read the feed URL at construction time
+        Settings.NEXTBUS_API_URL = stub.url
+        from src.app import MapleMoverApp
+        from src.api.prediction_cache import prediction_cache
+        # find_transit calls st.* outside a script run; streamlit warns on every call
+        logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+        self.prediction_cache = prediction_cache
+        self.app = MapleMoverApp()
+        self.service = self.app.api.ttc_service.nextbus_service
+
+        started = time.perf_counter()
+        self.service.discover_all_routes()
+        self.service._get_all_vehicle_locations()  # warm the shared vehicle table
+        self.setup_seconds = time.perf_counter() - started
+
+    def _search(self, target: str) -> Callable[[float, float], object]:
+        if target == "find_transit":
+            return self.app.find_transit
+        return self.service.get_transit_data_for_location
+
+    def _run_once(self, search, lat: float, lon: float) -> Dict:
+        if not self.warm_cache:
+            self.prediction_cache.clear()
+        before = self.stub.stats()
+        started = time.perf_counter()
+        search(lat, lon)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        after = self.stub.stats()
+        calls = {k: after.get(k, 0) - before.get(k, 0) for k in after if after.get(k, 0) != before.get(k, 0)}
+        background = {k: calls.pop(k) for k in BACKGROUND_COMMANDS if k in calls}
+        return {'ms': elapsed_ms, 'calls': calls, 'background': background}
+
+    def _allocations(self, search, lat: float, lon: float) -> Dict:
+        """One traced run (kept out of the timed runs, tracemalloc slows everything down)"""
+        if not self.warm_cache:
+            self.prediction_cache.clear()
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            snapshot_before = tracemalloc.take_snapshot()
+            search(lat, lon)
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot_after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        diff = snapshot_after.compare_to(snapshot_before, "filename")
+        return {
+            'alloc_blocks': sum(max(0, stat.count_diff) for stat in diff),
+            'alloc_kb': round(sum(max(0, stat.size_diff) for stat in diff) / 1024, 1),
+            'peak_kb': round((peak - before) / 1024, 1),
+        }
+
+    def run_case(self, target: str, lat: float, lon: float) -> Dict:
+        search = self._search(target)
+        search(lat, lon)  # warm-up (imports, first-touch of the index)
+
+        runs = [self._run_once(search, lat, lon) for _ in range(self.iterations)]
+        samples = [run['ms'] for run in runs]
+        commands = sorted({k for run in runs for k in run['calls']})
+        upstream = {k: round(sum(run['calls'].get(k, 0) for run in runs) / len(runs), 2) for k in commands}
+
+        result = {
+            'iterations': len(samples),
+            'p50_ms': round(_percentile(samples, 50), 2),
+            'p95_ms': round(_percentile(samples, 95), 2),
+            'p99_ms': round(_percentile(samples, 99), 2),
+            'mean_ms': round(statistics.fmean(samples), 2),
+            'max_ms': round(max(samples), 2),
+            'upstream_calls_per_search': round(sum(v for k, v in upstream.items() if k not in ('errors', 'missing')), 2),
+            'upstream_by_command': upstream,
+            # Poller requests that happened to land during the timed runs (totals, not per search)
+            'background_calls': {k: sum(run['background'].get(k, 0) for run in runs) for k in BACKGROUND_COMMANDS},
+        }
+        result.update(self._allocations(search, lat, lon))
+        return result
+
+    def run(self, cases: Dict[str, tuple], targets) -> Dict:
+        results = {}
+        for target in targets:
+            results[target] = {}
+            for name, (lat, lon) in cases.items():
+                results[target][name] = self.run_case(target, lat, lon)
+                r = results[target][name]
+                print(f"{target:32s} {name:26s} p50={r['p50_ms']:8.2f}ms p95={r['p95_ms']:8.2f}ms "
+                      f"p99={r['p99_ms']:8.2f}ms calls={r['upstream_calls_per_search']:5.2f} allocs={r['alloc_blocks']}")
+        return results
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Cases whose p95 regressed by more than threshold (fraction) against the baseline"""
+    regressions = []
+    for target, cases in current['results'].items():
+        for name, result in cases.items():
+            base = baseline.get('results', {}).get(target, {}).get(name)
+            if not base or not base.get('p95_ms'):
+                continue
+            change = (result['p95_ms'] - base['p95_ms']) / base['p95_ms']
+            marker = "REGRESSION" if change > threshold else ""
+            print(f"{target:32s} {name:26s} p95 {base['p95_ms']:8.2f} -> {result['p95_ms']:8.2f}ms ({change:+.1%}) {marker}")
+            if change > threshold:
+                regressions.append(f"{target}/{name}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end transit search latency against a local NextBus stub")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Simulated upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", help="Recorded fixture file (default: synthetic network)")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--warm-cache", action="store_true", help="Keep the prediction cache between searches")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results (default: benchmarks/bench_output.json)")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p95 regression threshold for --compare")
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+
+    fixtures = RecordedFixtures(args.fixtures) if args.fixtures else None
+    with tempfile.TemporaryDirectory() as cache_dir, NextBusStub(
+        fixtures, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate
+    ) as stub:
+        _isolate_routes_cache(cache_dir)
+        bench = SearchBenchmark(stub, args.iterations, args.warm_cache)
+        print(f"Setup (route discovery + vehicle warm-up): {bench.setup_seconds:.2f}s\n")
+        results = bench.run({name: CASES[name] for name in args.cases}, args.targets)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'iterations': args.iterations,
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+            'fixtures': args.fixtures or "synthetic",
+            'warm_cache': args.warm_cache,
+        },
+        'setup_seconds': round(bench.setup_seconds, 3),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📁 Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparing against {args.compare} (commit {baseline.get('commit')})")
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Run this once before deployment to create the routes cache file
 
 import sys
 import os
+import argparse
 import logging
 import structlog
 
@@ -13,6 +14,7 @@ import structlog
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '.'))
 
 from src.api.dynamic_transit import NextBusTransitService
+from src.config.settings import Settings
 
 # Setup logging
 structlog.configure(
@@ -29,6 +31,15 @@ structlog.configure(
 logger = structlog.get_logger()
 
 def main():
+    parser = argparse.ArgumentParser(description="Pre-populate the TTC routes cache")
+    parser.add_argument("--workers", type=int, default=Settings.ROUTE_DISCOVERY_WORKERS,
+                        help="Concurrent routeConfig requests (1 = serial)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Incrementally refresh an existing cache (new routes + a rotating slice) instead of rediscovering")
+    parser.add_argument("--slice", type=int, default=Settings.ROUTE_REFRESH_SLICE,
+                        help="Existing routes to re-fetch per --refresh run")
+    args = parser.parse_args()
+    
     print("=" * 70)
     print("🚀 PRE-POPULATING TTC ROUTES CACHE")
     print("=" * 70)
@@ -36,17 +47,23 @@ def main():
     print("This will fetch all TTC routes and stops from NextBus API")
     print("and save them to a cache file for faster app startup.")
     print()
-    print("⚠️  This may take 3-5 minutes on first run...")
+    print(f"⚡ Fetching route configs with {args.workers} worker(s)...")
     print()
     
     # Create service
     service = NextBusTransitService()
     
+    if args.refresh and service.routes_cache:
+        print("🔄 Refreshing cached routes incrementally...")
+        summary = service.refresh_routes(slice_size=args.slice, max_workers=args.workers)
+        print(f"✅ {summary['added']} added, {summary['removed']} removed, {summary['refreshed']} re-fetched")
+        return
+    
     # Discover all routes (this will save to disk automatically)
     print("📋 Discovering TTC routes and stops...")
     logger.info("Starting route discovery...")
     
-    routes = service.discover_all_routes()
+    routes = service.discover_all_routes(max_workers=args.workers)
     
     if routes:
         print()
@@ -54,7 +71,7 @@ def main():
         print("✅ SUCCESS!")
         print("=" * 70)
         print(f"📊 Discovered {len(routes)} routes")
-        print(f"📁 Cache saved to: cache/routes_cache.pkl")
+        print(f"📁 Cache saved to: cache/routes_cache.bin")
         print()
         print("💡 The app will now start much faster!")
         print("   Searches will take 2-5 seconds instead of 20-30 seconds.")
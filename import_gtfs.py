@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Import a TTC GTFS static feed into the indexed schedule store
+Run this after downloading a new feed; the app falls back to it when NextBus is down
+"""
+
+import sys
+import os
+import argparse
+import logging
+import resource
+import time
+from datetime import datetime
+import structlog
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '.'))
+
+from src.api.gtfs_static import STOP_TIMES_CHUNK_ROWS, GTFSSchedule, import_gtfs_zip
+from src.config.settings import Settings
+
+# Setup logging
+structlog.configure(
+    processors=[
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.dev.ConsoleRenderer()
+    ],
+    wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+    context_class=dict,
+    logger_factory=structlog.PrintLoggerFactory(),
+    cache_logger_on_first_use=True,
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a GTFS zip into the scheduled-departure store")
+    parser.add_argument("zip_path", nargs="?", default=Settings.GTFS_ZIP_PATH, help="GTFS feed (.zip)")
+    parser.add_argument("--output", default=Settings.GTFS_SCHEDULE_CACHE, help="Where to write the indexed tables")
+    parser.add_argument("--chunk-rows", type=int, default=STOP_TIMES_CHUNK_ROWS,
+                        help="stop_times.txt rows buffered at a time (bounds import memory)")
+    parser.add_argument("--check-stop", help="Print the next departures from this stop id/code after importing")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.zip_path):
+        print(f"❌ No GTFS feed at {args.zip_path}")
+        print("   Download the TTC feed (see GTFSStaticClient.gtfs_urls) and pass its path.")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("📋 IMPORTING GTFS STATIC FEED")
+    print("=" * 70)
+
+    schedule = import_gtfs_zip(args.zip_path, chunk_rows=args.chunk_rows)
+    schedule.save(args.output)
+
+    started = time.perf_counter()
+    schedule = GTFSSchedule.load(args.output)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    print()
+    print(f"📊 {schedule.stop_count} stops, {len(schedule.route_ids)} routes, {len(schedule.trip_route)} trips, "
+          f"{schedule.departure_count} departures")
+    print(f"⚡ stop_times.txt: {schedule.feed_info['stop_times_rows']:,} rows at "
+          f"{schedule.feed_info['stop_times_rows_per_sec']:,} rows/s; import took {schedule.feed_info['import_seconds']:.1f}s")
+    # ru_maxrss is in KB on Linux
+    print(f"💾 Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    print(f"📁 Schedule saved to: {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB, loads in {load_ms:.0f}ms)")
+
+    if args.check_stop:
+        print()
+        print(f"🕒 Next departures from {args.check_stop} at {datetime.now():%H:%M}:")
+        for dep in schedule.next_departures(args.check_stop, limit=5):
+            print(f"   {dep.route_short_name:>5} {dep.headsign:40s} in {dep.minutes_away:.0f} min")
+
+if __name__ == "__main__":
+    main()
@@ -11,20 +11,24 @@ import streamlit as st
 import structlog
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from src.api.ttc_client import TTCAPIClient
-from src.geocoding.service import GeocodingService
 from src.services.location import LocationService
+from src.services.registry import get_service_registry
 from src.ui.components import UIComponents
+from src.utils.metrics import start_metrics_server
+from src.utils.tracing import current_span, traced
 
 logger = structlog.get_logger("maple_mover.app")
 
 class MapleMoverApp:
     def __init__(self):
-        self.api = TTCAPIClient()
-        self.geo = GeocodingService()
+        # Heavy services are shared per process; reruns only rebuild the cheap per-session parts
+        registry = get_service_registry()
+        self.api = registry.api
+        self.geo = registry.geo
         self.loc = LocationService()
         self.ui = UIComponents()
 
+    @traced("find_transit")
     def find_transit(self, lat, lon):
         """Find nearby TTC transit stations using NextBus API discovery."""
         # Show loading spinner
@@ -33,12 +37,21 @@ class MapleMoverApp:
             transit_data = self.api.ttc_service.get_transit_data_for_location(lat, lon)
             
             # Get all vehicle locations for displaying ALL buses on each route
-            # Access the underlying NextBus service from UnifiedTTCService
+            # (snapshot of the shared vehicle table, not another feed download)
             all_vehicles = self.api.ttc_service.nextbus_service._get_all_vehicle_locations()
             
         if not transit_data:
             return {"transit_options": []}
         
+        all_opts = self._group_transit_options(transit_data, all_vehicles)
+        
+        logger.info(f"🚀 NextBus service completed: {len(all_opts)} transit options from {len(transit_data)} stops")
+        
+        return {"transit_options": all_opts}
+
+    @traced("group_predictions")
+    def _group_transit_options(self, transit_data, all_vehicles):
+        """Build one transit option per route/direction from the per-stop predictions."""
         # Convert new data structure to expected format
         all_opts = []
         
@@ -193,11 +206,10 @@ class MapleMoverApp:
                         'distance': distance
                     })
         
-        logger.info(f"🚀 NextBus service completed: {len(all_opts)} transit options from {len(transit_data)} stops")
-        
-        return {"transit_options": all_opts}
+        return all_opts
 
     def run(self):
+        start_metrics_server()  # once per process; later reruns are a no-op
         self.ui.setup_page()
         self.ui.render_header()
 
@@ -209,46 +221,51 @@ class MapleMoverApp:
         if not st.session_state.get("auto_location_processed", False):
             detected_lat, detected_lon, source = self.loc.get_user_location()
             if detected_lat and detected_lon and source == "browser_geolocation":
-                # Check if we already have an address for these coordinates
-                if not st.session_state.get("search_address"):
-                    # Reverse geocode the location to get address
-                    with st.spinner("📍 Detecting your location..."):
-                        addr = self.geo.reverse_geocode(detected_lat, detected_lon)
-                    if addr:
-                        st.session_state.search_address = addr
-                
-                st.session_state.location_source = source
-                st.session_state.user_lat = detected_lat
-                st.session_state.user_lon = detected_lon
+                # Label the location locally; Nominatim refines the cached address in the background
+                self.ui.show_detected_location(self.geo, detected_lat, detected_lon, source)
                 lat = detected_lat
                 lon = detected_lon
                 st.session_state.auto_location_processed = True
 
+        # Detect location if requested (before the search bar is drawn, so its text can be replaced)
+        if st.session_state.get("location_requested", False):
+            detected_lat, detected_lon, source = self.loc.get_user_location()
+            if detected_lat and detected_lon:
+                self.ui.show_detected_location(self.geo, detected_lat, detected_lon, source)
+                lat = detected_lat
+                lon = detected_lon
+            st.session_state.location_requested = False
+
+        # Swap the local label for Nominatim's address once the background lookup has landed
+        self.ui.apply_refined_address(self.geo)
+
         # Step 1: show the search bar always (now with address populated)
-        address = self.ui.render_search_interface()
+        address = self.ui.render_search_interface(suggest=self.geo.suggest)
 
-        # Step 2: handle search input or location detection
-        # Check if user wants to search
-        search_requested = address and address.strip()
-        location_requested = st.session_state.get("location_requested", False)
+        # Step 2: handle search input
+        # Check if user wants to search; a picked suggestion already carries its coordinates
+        picked = st.session_state.get("location_source") == "suggestion" and address == st.session_state.get("search_address")
+        search_requested = address and address.strip() and not picked
         
-        # Detect location if requested
-        if location_requested:
-            detected_lat, detected_lon, source = self.loc.get_user_location()
-            if detected_lat and detected_lon:
-                with st.spinner("📍 Converting coordinates to address..."):
-                    addr = self.geo.reverse_geocode(detected_lat, detected_lon)
-                if addr:
-                    st.session_state.search_address = addr
-                    st.session_state.location_source = source
-                    st.session_state.user_lat = detected_lat
-                    st.session_state.user_lon = detected_lon
-                    lat = detected_lat
-                    lon = detected_lon
-                st.session_state.location_requested = False
+        if search_requested or (lat and lon):
+            # Geocode, bounds check, transit lookup and rendering are timed as one request
+            self.search(address, lat, lon, search_requested)
+        else:
+            # No location yet - show landing page with featured routes
+            self.ui.render_featured_routes()
+            self.ui.render_footer()
+
+    @traced("search")
+    def search(self, address, lat, lon, search_requested):
+        """Resolve the search location and render nearby transit (Step 3)."""
+        current_span().set(source="manual" if search_requested else st.session_state.get("location_source", "unknown"))
         
-        # Handle manual search input
-        if search_requested:
+        # Handle manual search input; text that is exactly a suggestion uses its coordinates, no geocoder
+        picked = self.geo.match_suggestion(address) if search_requested else None
+        if picked:
+            self.ui.use_suggestion(picked)
+            lat, lon = picked.lat, picked.lon
+        elif search_requested:
             with st.spinner("🔍 Looking up address..."):
                 coords = self.geo.geocode_address(address)
             if coords:
@@ -261,29 +278,23 @@ class MapleMoverApp:
                 self.ui.render_error_message("❌ Could not locate that address.")
                 return
 
-        # Step 3: Show results OR landing page
-        if lat and lon:
-            # User has location - show transit results
-            # Check Toronto boundaries
-            if not self.geo._is_toronto_area(lat, lon):
-                self.ui.render_info_message("🗺️ Now only available in Toronto — coming soon to your area!")
-                self.ui.render_footer()
-                return
-            
-            # Fetch TTC routes
-            data = self.find_transit(lat, lon)
-            
-            if data["transit_options"]:
-                self.ui.render_transit_results(data)
-                self.ui.render_map(lat, lon, data)
-            else:
-                self.ui.render_info_message("No TTC routes found nearby.")
-                
+        # Step 3: Show transit results
+        # Check Toronto boundaries
+        if not self.geo._is_toronto_area(lat, lon):
+            self.ui.render_info_message("🗺️ Now only available in Toronto — coming soon to your area!")
             self.ui.render_footer()
+            return
+        
+        # Fetch TTC routes
+        data = self.find_transit(lat, lon)
+        
+        if data["transit_options"]:
+            self.ui.render_transit_results(data)
+            self.ui.render_map(lat, lon, data)
         else:
-            # No location yet - show landing page with featured routes
-            self.ui.render_featured_routes()
-            self.ui.render_footer()
+            self.ui.render_info_message("No TTC routes found nearby.")
+            
+        self.ui.render_footer()
 
 
 if __name__ == "__main__":
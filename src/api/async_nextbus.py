@@ -0,0 +1,338 @@
+"""
+Asyncio NextBus client
+Concurrent fan-out over one httpx.AsyncClient running on a shared background event loop
+"""
+
+import asyncio
+import concurrent.futures
+import random
+import threading
+import time
+import structlog
+from typing import Any, Awaitable, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+from src.config.settings import Settings
+from src.api.vehicle_poller import get_vehicle_poller
+from src.api.prediction_cache import prediction_cache
+from src.utils.http_client import transport
+from src.utils.tracing import current_span, detached, mark_cache_hit, traced
+
+# Try to import httpx
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+if TYPE_CHECKING:
+    from src.api.dynamic_transit import NextBusTransitService, TransitStop
+
+logger = structlog.get_logger("maple_mover.async_nextbus")
+
+# -----------------------------------------------------------------------------
+# Shared event loop
+#
+# Streamlit runs each session in its own thread with no event loop, and an
+# httpx.AsyncClient is tied to the loop that created it. One daemon thread
+# owns a long-lived loop, so every session shares the same connection pool.
+# -----------------------------------------------------------------------------
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting its thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="nextbus-async-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the background loop and block until it finishes
+
+    Raises concurrent.futures.TimeoutError after timeout seconds, cancelling
+    the coroutine so a hung request can't hold the caller (or leak a task).
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+# One httpx client and in-flight table for every AsyncNextBusClient in the
+# process (only touched from the background loop). Per-host concurrency and
+# request/connection counters come from the shared HTTPTransport.
+_shared_client: Optional["httpx.AsyncClient"] = None
+_inflight: Dict[str, asyncio.Task] = {}
+
+def _get_shared_client() -> "httpx.AsyncClient":
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(Settings.HTTP_READ_TIMEOUT, connect=Settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=Settings.HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=Settings.HTTP_POOL_MAXSIZE
+            ),
+            headers={"Accept-Encoding": "gzip, deflate"}
+        )
+    return _shared_client
+
+class AsyncNextBusClient:
+    """Async counterpart of NextBusTransitService's fetch path
+
+    Network calls go through httpx; parsing, chunking and the stop index
+    are reused from the sync service so both paths return identical data.
+    Identical in-flight GETs are coalesced onto one task (the async
+    equivalent of the single-flight group), across instances too. Every
+    request goes through transport.aget, so the per-host limit and
+    transport.stats() cover this client as well as the blocking one.
+    Instances must only be used from the background loop, i.e. via
+    run_sync or from its coroutines.
+    """
+
+    def __init__(self, service: "NextBusTransitService"):
+        self.service = service
+        self.api_url = service.api_url
+        self.agency = service.agency
+        self.timeout = service.timeout
+        self._client: Optional["httpx.AsyncClient"] = None  # Overrides the shared client (tests)
+        self._refresh_tasks: Set[asyncio.Task] = set()
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        return self._client if self._client is not None else _get_shared_client()
+
+    async def _fetch_json(self, url: str) -> Dict:
+        response = await transport.aget(
+            self._get_client(), url, timeout=httpx.Timeout(self.timeout, connect=Settings.HTTP_CONNECT_TIMEOUT)
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def _get_json(self, url: str) -> Dict:
+        """GET a URL, sharing the request with concurrent callers of the same URL"""
+        task = _inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_json(url))
+            _inflight[url] = task
+            task.add_done_callback(lambda _: _inflight.pop(url, None))
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(task)
+
+    def search_deadline(self) -> float:
+        """Seconds a location search may run on the loop before run_sync gives up
+
+        Predictions take at most two sequential requests (the batch, then the
+        per-stop fallback), each bounded by connect + read timeouts; the first
+        vehicle poll runs alongside them. One extra second covers parsing.
+        """
+        request = Settings.HTTP_CONNECT_TIMEOUT + self.timeout
+        return max(2 * request, Settings.VEHICLE_FIRST_POLL_TIMEOUT) + 1
+
+    async def aclose(self) -> None:
+        """Close an overriding client (the shared one lives as long as the process)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # -------------------------------------------------------------------------
+    # Routes
+    # -------------------------------------------------------------------------
+    async def _get_routes(self) -> Optional[Dict]:
+        """Get all TTC routes from NextBus API"""
+        try:
+            return await self._get_json(f"{self.api_url}?command=routeList&a={self.agency}")
+        except Exception as e:
+            logger.error(f"❌ Failed to get routes: {e}")
+            return None
+
+    async def _get_route_config(self, route_tag: str, retries: int = 0) -> Optional[Dict]:
+        """Get route configuration including stops, retrying with exponential backoff"""
+        url = f"{self.api_url}?command=routeConfig&a={self.agency}&r={route_tag}"
+        for attempt in range(retries + 1):
+            try:
+                return await self._get_json(url)
+            except Exception as e:
+                if attempt >= retries:
+                    logger.error(f"❌ Failed to get route config for {route_tag}: {e}")
+                    return None
+                delay = Settings.ROUTE_DISCOVERY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"⚠️ Route config for {route_tag} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        return None
+
+    async def fetch_route_configs(self, route_tags: List[str], max_workers: Optional[int] = None) -> Dict[str, Optional[Dict]]:
+        """Fetch routeConfig for every route tag, at most max_workers at a time"""
+        limit = asyncio.Semaphore(max_workers or Settings.ROUTE_DISCOVERY_WORKERS)
+        retries = Settings.ROUTE_DISCOVERY_RETRIES
+
+        async def fetch(route_tag):
+            async with limit:
+                return await self._get_route_config(route_tag, retries)
+
+        configs = await asyncio.gather(*(fetch(tag) for tag in route_tags))
+        return dict(zip(route_tags, configs))
+
+    # -------------------------------------------------------------------------
+    # Vehicles
+    # -------------------------------------------------------------------------
+    @traced("vehicles")
+    async def _get_all_vehicle_locations(self) -> Dict[str, Dict]:
+        """Snapshot of the shared vehicle table; only the initial full feed is waited for (see VehicleLocationPoller)"""
+        poller = get_vehicle_poller(self.api_url, self.agency)
+        mark_cache_hit(poller.has_data())
+        if not poller.has_data():
+            if poller.claim_first_poll():
+                try:
+                    data = await asyncio.wait_for(
+                        self._get_json(f"{self.api_url}?command=vehicleLocations&a={self.agency}&t=0"),
+                        Settings.VEHICLE_FIRST_POLL_TIMEOUT,
+                    )
+                    poller.apply_feed(data, since=0)
+                except Exception as e:
+                    logger.error(f"❌ Failed to get vehicle locations: {e}")
+                finally:
+                    poller.finish_first_poll()
+            elif not poller.wait_for_first_poll(0):
+                await asyncio.to_thread(poller.wait_for_first_poll)
+            # Background polling keeps the table fresh (and retries after a failure) from here on
+            poller.start()
+        return poller.snapshot()
+
+    # -------------------------------------------------------------------------
+    # Predictions
+    # -------------------------------------------------------------------------
+    async def get_real_time_predictions(self, stop_id: str, route_tags: List[str] = None, vehicle_locations: Dict = None) -> List[Dict]:
+        """Get real-time predictions for a stop with optional route filter"""
+        predictions = await self._fetch_stop_predictions(stop_id, route_tags, vehicle_locations)
+        return predictions if predictions is not None else []
+
+    async def _fetch_stop_predictions(self, stop_id: str, route_tags: List[str] = None, vehicle_locations: Dict = None) -> Optional[List[Dict]]:
+        """Predictions for one stop, or None if the request failed (so it isn't cached as "no arrivals")"""
+        if vehicle_locations is None:
+            vehicle_locations = await self._get_all_vehicle_locations()
+
+        try:
+            data = await self._get_json(f"{self.api_url}?command=predictions&a={self.agency}&stopId={stop_id}")
+        except Exception as e:
+            logger.error(f"❌ Failed to get predictions for {stop_id}: {e}")
+            return None
+
+        predictions = self.service._parse_predictions(data.get('predictions', []), stop_id, route_tags, vehicle_locations)
+        logger.info(f"✅ Got {len(predictions)} predictions for stop {stop_id}")
+        return predictions
+
+    async def _fetch_multi_stop_objects(self, chunk) -> Optional[Dict[str, List[Dict]]]:
+        """Raw prediction objects for one predictionsForMultiStops chunk, grouped by stop_id (None if the request failed)"""
+        try:
+            data = await self._get_json(self.service._multi_stop_url(chunk))
+        except Exception as e:
+            logger.error(f"❌ Multi-stop predictions failed for {len(chunk)} pairs: {e}")
+            return None
+        return self.service._split_multi_stop_response(data, chunk)
+
+    async def _get_prediction_objects(self, stops: List["TransitStop"]) -> List[Tuple[List, Optional[Dict[str, List[Dict]]]]]:
+        """Each chunk paired with its raw prediction objects (None for a failed batch)"""
+        chunks = self.service._chunk_multi_stop_pairs(stops)
+        results = await asyncio.gather(*(self._fetch_multi_stop_objects(chunk) for chunk in chunks))
+        return list(zip(chunks, results))
+
+    async def get_predictions_for_stops(self, stops: List["TransitStop"], vehicle_locations: Dict = None) -> Dict[str, List[Dict]]:
+        """Batched predictions for many stops, all chunks in flight at once (stops that failed are left out)"""
+        if vehicle_locations is None:
+            chunk_objects, vehicle_locations = await asyncio.gather(
+                self._get_prediction_objects(stops), self._get_all_vehicle_locations()
+            )
+        else:
+            chunk_objects = await self._get_prediction_objects(stops)
+        return await self._parse_prediction_objects(stops, chunk_objects, vehicle_locations)
+
+    @traced("predictions")
+    async def get_cached_predictions_for_stops(self, stops: List["TransitStop"], vehicle_locations: Dict = None) -> Dict[str, List[Dict]]:
+        """Predictions from the stale-while-revalidate cache; misses fetched now, stale stops refreshed as a task
+
+        Without vehicle_locations, the vehicle snapshot is fetched concurrently with the misses.
+        Failed fetches are never cached, so stale entries outlive an outage.
+        """
+        stops_by_id = {stop.stop_id: stop for stop in stops}
+        predictions_by_stop, misses, stale = prediction_cache.serve(list(stops_by_id), vehicle_locations)
+        miss_stops = [stops_by_id[stop_id] for stop_id in misses]
+        current_span().set(cache_hit=not misses, stops=len(stops_by_id), misses=len(misses), stale=len(stale))
+
+        if vehicle_locations is None:
+            chunk_objects, vehicle_locations = await asyncio.gather(
+                self._get_prediction_objects(miss_stops), self._get_all_vehicle_locations()
+            )
+            prediction_cache.attach_vehicles(predictions_by_stop, vehicle_locations)
+        else:
+            chunk_objects = await self._get_prediction_objects(miss_stops)
+
+        if miss_stops:
+            fetched = await self._parse_prediction_objects(miss_stops, chunk_objects, vehicle_locations)
+            prediction_cache.put_many(fetched)
+            predictions_by_stop.update(fetched)
+
+        if stale:
+            task = asyncio.ensure_future(self._refresh_predictions([stops_by_id[stop_id] for stop_id in stale]))
+            # Keep a reference so the task isn't garbage collected mid-flight
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+        return predictions_by_stop
+
+    async def _refresh_predictions(self, stops: List["TransitStop"]) -> None:
+        """Background revalidation of stale cache entries"""
+        try:
+            # Not part of the request that scheduled it
+            with detached():
+                fetched = await self.get_predictions_for_stops(stops)
+            prediction_cache.put_many(fetched)
+        except Exception as e:
+            logger.warning(f"⚠️ Background prediction refresh failed for {len(stops)} stops: {e}")
+        finally:
+            prediction_cache.release([stop.stop_id for stop in stops])
+
+    async def _parse_prediction_objects(self, stops, chunk_objects, vehicle_locations) -> Dict[str, List[Dict]]:
+        """Parse each chunk against its own route tags, then merge exactly as the sync path does"""
+        async def parse_chunk(chunk, objs_by_stop):
+            route_tags = self.service._chunk_route_tags(chunk)
+            stop_ids = list(route_tags)
+            if objs_by_stop is None:
+                # Fall back to one request per stop, for this chunk's routes only
+                results = await asyncio.gather(*(
+                    self._fetch_stop_predictions(stop_id, route_tags[stop_id], vehicle_locations) for stop_id in stop_ids
+                ))
+                return dict(zip(stop_ids, results))
+            return {
+                stop_id: self.service._parse_predictions(objs_by_stop[stop_id], stop_id, tags, vehicle_locations)
+                for stop_id, tags in route_tags.items()
+            }
+
+        results = await asyncio.gather(*(parse_chunk(chunk, objs) for chunk, objs in chunk_objects))
+        return self.service._merge_chunk_predictions(stops, results)
+
+    # -------------------------------------------------------------------------
+    # Location search
+    # -------------------------------------------------------------------------
+    async def get_transit_data_for_location(self, user_lat: float, user_lon: float, radius_m: int = 700) -> List[Dict]:
+        """Nearest stops with predictions, served through the stale-while-revalidate cache"""
+        started = time.time()
+        service = self.service
+        if not service.routes_cache:
+            # Cold start: route discovery is a long sync job, keep it off the loop
+            await asyncio.to_thread(service.discover_all_routes)
+        nearby_stops = service.find_nearby_stops(user_lat, user_lon, radius_m, max_stops=10)
+
+        # Vehicle snapshot and uncached predictions are fetched concurrently
+        predictions_by_stop = await self.get_cached_predictions_for_stops([stop for _, stop in nearby_stops])
+
+        all_transit_data = [
+            service._stop_transit_data(stop, distance_m, predictions_by_stop.get(stop.stop_id, []))
+            for distance_m, stop in nearby_stops
+        ]
+        logger.info(f"✅ Returning transit data for {len(all_transit_data)} stops in {time.time() - started:.2f}s (async)")
+        return all_transit_data
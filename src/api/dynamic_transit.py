@@ -4,16 +4,28 @@ Real Transit Data Service using NextBus API Discovery
 Finds all routes, stops, and real-time transit information
 """
 
-import requests
+import random
+import threading
+import time
 import structlog
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from src.config.settings import Settings
-from src.utils.geo_utils import calculate_distance
-from src.utils.routes_cache import load_routes_cache, save_routes_cache, get_cache_age
+from src.utils.spatial_index import GridSpatialIndex
+from src.api.vehicle_poller import get_vehicle_poller
+from src.api.prediction_cache import prediction_cache, refresh_in_background
+from src.api.async_nextbus import AsyncNextBusClient, HTTPX_AVAILABLE, run_sync
+from src.utils.single_flight import flights
+from src.utils.http_client import transport
+from src.utils.routes_cache import load_routes_cache, save_routes_cache, get_cache_age, get_cache_version
+from src.utils.tracing import current_span, mark_cache_hit, traced
 
 logger = structlog.get_logger()
 
+# Only one incremental route refresh runs per process
+_route_refresh_lock = threading.Lock()
+
 @dataclass
 class TransitStop:
     """Represents a TTC transit stop with routes"""
@@ -36,7 +48,7 @@ class NextBusTransitService:
     """Service that uses NextBus API to discover routes and stops dynamically"""
     
     def __init__(self):
-        self.api_url = "https://retro.umoiq.com/service/publicJSONFeed"
+        self.api_url = Settings.NEXTBUS_API_URL
         self.agency = "ttc"
         self.timeout = 15
         
@@ -44,28 +56,46 @@ class NextBusTransitService:
         self.routes_cache = {}
         self.stops_cache = {}  # stop_id -> TransitStop
         self.route_stops_cache = {}  # route_tag -> [stop_ids]
+        self.spatial_index = None  # GridSpatialIndex (float64 lat/lon arrays) over stops_cache
+        self._stop_coordinates = None  # (stops_cache, lats, lons) mmap-backed columns from the routes cache
+        self.cache_version = None  # Routes cache version this service saved itself (see ServiceRegistry)
+        self._async_client = None  # AsyncNextBusClient, created on first async fetch
+        self._refresh_cursor = random.randrange(1 << 16)  # start of the next rotating refresh slice
         
         # Try to load from disk cache
         self._load_disk_cache()
     
     def _load_disk_cache(self):
         """Load routes cache from disk if available"""
-        routes, stops, route_stops = load_routes_cache()
+        routes, stops, route_stops, coordinates = load_routes_cache()
         if routes and stops:
             self.routes_cache = routes
             self.stops_cache = stops
             self.route_stops_cache = route_stops
+            if coordinates is not None:
+                self._stop_coordinates = (stops, *coordinates)
+            self._build_spatial_index()
             age = get_cache_age()
             logger.info(f"📋 Loaded routes from disk cache (age: {age} days)")
+            if age >= Settings.ROUTE_REFRESH_AFTER_DAYS:
+                # Stale cache: serve it now and patch it in the background
+                self.refresh_routes_in_background()
+        
+    def discover_all_routes(self, max_workers: Optional[int] = None) -> Dict[str, RouteInfo]:
+        """Discover all TTC routes and their stops
         
-    def discover_all_routes(self) -> Dict[str, RouteInfo]:
-        """Discover all TTC routes and their stops"""
+        routeConfig requests are fanned out over a bounded worker pool
+        (max_workers, default Settings.ROUTE_DISCOVERY_WORKERS; 1 = serial).
+        Responses are parsed in routeList order, so the resulting caches are
+        identical to a serial run.
+        """
         try:
             if self.routes_cache:
                 logger.info("📋 Using cached routes")
                 return self.routes_cache
                 
             logger.info("🔍 Discovering all TTC routes and stops...")
+            started = time.time()
             
             # Step 1: Get all routes
             routes_data = self._get_routes()
@@ -73,17 +103,24 @@ class NextBusTransitService:
                 logger.error("❌ Failed to get routes")
                 return {}
             
+            route_list = routes_data.get('route', [])
+            if isinstance(route_list, dict):
+                route_list = [route_list]
+            
+            # Step 2: Fetch every route configuration (includes stops)
+            if max_workers is None:
+                max_workers = Settings.ROUTE_DISCOVERY_WORKERS
+            route_tags = [route.get('tag') for route in route_list]
+            route_configs = self._fetch_route_configs(route_tags, max_workers)
+            
             all_routes = {}
             
-            # Step 2: For each route, get all stops
-            for route in routes_data.get('route', []):
+            # Step 3: Parse stops in routeList order (keeps caches deterministic)
+            for route in route_list:
                 route_tag = route.get('tag')
                 route_title = route.get('title', '')
                 
-                logger.info(f"🔄 Getting stops for route {route_tag}: {route_title}")
-                
-                # Get route configuration (includes stops)
-                route_config = self._get_route_config(route_tag)
+                route_config = route_configs.get(route_tag)
                 if not route_config:
                     continue
                 
@@ -96,47 +133,86 @@ class NextBusTransitService:
                     stops=stops
                 )
                 
-                logger.info(f"✅ Route {route_tag} has {len(stops)} stops")
+                logger.debug(f"✅ Route {route_tag} has {len(stops)} stops")
             
             self.routes_cache = all_routes
             
             # Build reverse index: stop_id -> routes that serve it
             self._build_stop_to_routes_index()
+            self._build_spatial_index()
             
             # Save to disk cache for next time
-            save_routes_cache(self.routes_cache, self.stops_cache, self.route_stops_cache)
+            self._save_routes_cache()
             
-            logger.info(f"✅ Discovered {len(all_routes)} routes with stops")
+            logger.info(f"✅ Discovered {len(all_routes)} routes with stops in {time.time() - started:.1f}s")
             return all_routes
             
         except Exception as e:
             logger.error(f"❌ Failed to discover routes: {e}")
             return {}
     
+    def _fetch_route_configs(self, route_tags: List[str], max_workers: int) -> Dict[str, Dict]:
+        """Fetch routeConfig for every route tag, concurrently when max_workers > 1"""
+        retries = Settings.ROUTE_DISCOVERY_RETRIES
+        route_configs = {}
+        
+        if max_workers <= 1:
+            for route_tag in route_tags:
+                logger.info(f"🔄 Getting stops for route {route_tag}")
+                route_configs[route_tag] = self._get_route_config(route_tag, retries=retries)
+            return route_configs
+        
+        logger.info(f"⚡ Fetching {len(route_tags)} route configs with {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._get_route_config, route_tag, retries): route_tag
+                for route_tag in route_tags
+            }
+            for future in as_completed(futures):
+                route_configs[futures[future]] = future.result()
+        
+        return route_configs
+    
     def _get_routes(self) -> Optional[Dict]:
         """Get all TTC routes from NextBus API"""
         try:
             url = f"{self.api_url}?command=routeList&a={self.agency}"
-            response = requests.get(url, timeout=self.timeout)
+            response = transport.get(url, timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f"❌ Failed to get routes: {e}")
             return None
     
-    def _get_route_config(self, route_tag: str) -> Optional[Dict]:
-        """Get route configuration including stops"""
-        try:
-            url = f"{self.api_url}?command=routeConfig&a={self.agency}&r={route_tag}"
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"❌ Failed to get route config for {route_tag}: {e}")
-            return None
+    def _get_route_config(self, route_tag: str, retries: int = 0) -> Optional[Dict]:
+        """Get route configuration including stops, retrying with exponential backoff"""
+        url = f"{self.api_url}?command=routeConfig&a={self.agency}&r={route_tag}"
+        for attempt in range(retries + 1):
+            try:
+                response = transport.get(url, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                if attempt >= retries:
+                    logger.error(f"❌ Failed to get route config for {route_tag}: {e}")
+                    return None
+                delay = Settings.ROUTE_DISCOVERY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"⚠️ Route config for {route_tag} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        return None
     
-    def _parse_stops_from_route_config(self, config: Dict, route_tag: str) -> List[TransitStop]:
-        """Parse stops from NextBus route configuration"""
+    def _parse_stops_from_route_config(self, config: Dict, route_tag: str, stops_cache: Dict = None,
+                                       route_stops_cache: Dict = None, replace_changed: bool = False) -> List[TransitStop]:
+        """Parse stops from NextBus route configuration
+        
+        Stops are added to stops_cache / route_stops_cache (default: this
+        service's caches). With replace_changed, a cached stop whose code,
+        title or position differs is replaced by a new object.
+        """
+        if stops_cache is None:
+            stops_cache = self.stops_cache
+        if route_stops_cache is None:
+            route_stops_cache = self.route_stops_cache
         stops = []
         route_data = config.get('route', {})
         
@@ -148,8 +224,9 @@ class NextBusTransitService:
             lon = float(stop.get('lon', 0))
             
             # Add to global stops cache
-            if stop_id not in self.stops_cache:
-                self.stops_cache[stop_id] = TransitStop(
+            cached = stops_cache.get(stop_id)
+            if cached is None or (replace_changed and (cached.stop_code, cached.title, cached.lat, cached.lon) != (stop_tag, title, lat, lon)):
+                stops_cache[stop_id] = TransitStop(
                     stop_id=stop_id,
                     stop_code=stop_tag,
                     title=title,
@@ -158,13 +235,13 @@ class NextBusTransitService:
                     routes=[]  # Will be filled by _build_stop_to_routes_index
                 )
             
-            stops.append(self.stops_cache[stop_id])
+            stops.append(stops_cache[stop_id])
             
             # Track which routes serve this stop
-            if stop_id not in self.route_stops_cache:
-                self.route_stops_cache[stop_id] = []
-            if route_tag not in self.route_stops_cache[stop_id]:
-                self.route_stops_cache[stop_id].append(route_tag)
+            if stop_id not in route_stops_cache:
+                route_stops_cache[stop_id] = []
+            if route_tag not in route_stops_cache[stop_id]:
+                route_stops_cache[stop_id].append(route_tag)
         
         return stops
     
@@ -173,51 +250,166 @@ class NextBusTransitService:
         for stop_id, stop in self.stops_cache.items():
             stop.routes = self.route_stops_cache.get(stop_id, [])
     
-    def find_nearby_stops(self, user_lat: float, user_lon: float, radius_m: int = 700, max_stops: int = 10) -> List[TransitStop]:
-        """Find NEAREST stops - sorts by distance, takes closest max_stops"""
-        # First ensure we have all routes discovered
+    def _build_spatial_index(self):
+        """Bucket every cached stop into the grid index used by find_nearby_stops
+        
+        While stops_cache is still the dict loaded from the columnar cache,
+        the index reads the file's lat/lon columns in place instead of
+        copying them out of the stop objects.
+        """
+        stops = list(self.stops_cache.values())
+        if self._stop_coordinates is not None and self._stop_coordinates[0] is self.stops_cache:
+            _, lats, lons = self._stop_coordinates
+        else:
+            lats, lons = [stop.lat for stop in stops], [stop.lon for stop in stops]
+        self.spatial_index = GridSpatialIndex(lats, lons, stops)
+        logger.debug(f"🗺️ Spatial index built over {len(self.spatial_index)} stops")
+    
+    def refresh_routes(self, slice_size: Optional[int] = None, max_workers: Optional[int] = None) -> Dict[str, int]:
+        """Incrementally bring the cached routes up to date
+        
+        Re-fetches routeList and fetches routeConfig only for routes that are
+        new plus a rotating slice of slice_size existing routes (default
+        Settings.ROUTE_REFRESH_SLICE), so repeated refreshes cycle through
+        the whole network. Removed routes are dropped. The caches are patched
+        copy-on-write and swapped in at the end, so searches keep using the
+        old data until the new index is ready.
+        """
         if not self.routes_cache:
-            self.discover_all_routes()
+            self.discover_all_routes(max_workers=max_workers)
+            return {'added': len(self.routes_cache), 'removed': 0, 'refreshed': 0}
         
-        all_stops = []
-        radius_km = radius_m / 1000.0
+        started = time.time()
+        routes_data = self._get_routes()
+        if not routes_data:
+            logger.error("❌ Route refresh failed: no routeList")
+            return {'added': 0, 'removed': 0, 'refreshed': 0}
         
-        # Pre-calculate bounds for quick filtering
-        lat_margin = radius_km / 111.0
-        lon_margin = radius_km / (111.0 * abs(abs(user_lat) / 90.0))
+        route_list = routes_data.get('route', [])
+        if isinstance(route_list, dict):
+            route_list = [route_list]
+        titles = {route.get('tag'): route.get('title', '') for route in route_list if route.get('tag')}
         
-        # Collect all stops within the radius
-        for stop_id, stop in self.stops_cache.items():
-            # Quick bounding box check
-            lat_diff = abs(stop.lat - user_lat)
-            lon_diff = abs(stop.lon - user_lon)
-            
-            if lat_diff > lat_margin or lon_diff > lon_margin:
-                continue
-            
-            # Calculate exact distance
-            distance = calculate_distance(user_lat, user_lon, stop.lat, stop.lon)
-            distance_meters = distance * 1000
-            
-            if distance_meters <= radius_m:
-                stop.distance_meters = distance_meters
-                all_stops.append(stop)
+        added = [tag for tag in titles if tag not in self.routes_cache]
+        removed = [tag for tag in self.routes_cache if tag not in titles]
+        existing = sorted(tag for tag in self.routes_cache if tag in titles)
+        
+        # Rotating slice of existing routes, resuming where the last refresh stopped
+        if slice_size is None:
+            slice_size = Settings.ROUTE_REFRESH_SLICE
+        rotating = []
+        if existing and slice_size > 0:
+            start = self._refresh_cursor % len(existing)
+            rotating = [existing[(start + i) % len(existing)] for i in range(min(slice_size, len(existing)))]
+            self._refresh_cursor = start + len(rotating)
+        
+        if max_workers is None:
+            max_workers = Settings.ROUTE_DISCOVERY_WORKERS
+        route_configs = self._fetch_route_configs(added + rotating, max_workers)
+        
+        # Patch copies of the caches, then swap them in
+        routes_cache = dict(self.routes_cache)
+        stops_cache = dict(self.stops_cache)
+        route_stops_cache = {stop_id: list(tags) for stop_id, tags in self.route_stops_cache.items()}
         
-        # Sort by distance (closest first)
-        all_stops.sort(key=lambda x: x.distance_meters)
+        def detach(route_tag):
+            for stop in routes_cache.pop(route_tag).stops:
+                tags = route_stops_cache.get(stop.stop_id, [])
+                if route_tag in tags:
+                    tags.remove(route_tag)
         
-        # Take only the closest max_stops
+        for route_tag in removed:
+            detach(route_tag)
+        
+        refreshed = 0
+        for route_tag in added + rotating:
+            route_config = route_configs.get(route_tag)
+            if not route_config:
+                continue  # Keep the cached version if the fetch failed
+            if route_tag in routes_cache:
+                detach(route_tag)
+            stops = self._parse_stops_from_route_config(route_config, route_tag, stops_cache, route_stops_cache, replace_changed=True)
+            routes_cache[route_tag] = RouteInfo(tag=route_tag, title=titles[route_tag], stops=stops)
+            refreshed += 1
+        
+        # Drop stops no route serves any more. Stops whose routes changed get new objects:
+        # the old ones are shared with searches still running against the old caches
+        for stop_id in [stop_id for stop_id, tags in route_stops_cache.items() if not tags]:
+            del route_stops_cache[stop_id]
+            stops_cache.pop(stop_id, None)
+        for stop_id, stop in stops_cache.items():
+            routes = route_stops_cache.get(stop_id, [])
+            if stop.routes != routes:
+                stops_cache[stop_id] = replace(stop, routes=routes)
+        
+        # Point every route at the current stop objects
+        for route_tag, route in routes_cache.items():
+            if any(stops_cache.get(stop.stop_id) is not stop for stop in route.stops):
+                routes_cache[route_tag] = RouteInfo(
+                    tag=route.tag,
+                    title=route.title,
+                    stops=[stops_cache[stop.stop_id] for stop in route.stops if stop.stop_id in stops_cache]
+                )
+        
+        self.routes_cache, self.stops_cache, self.route_stops_cache = routes_cache, stops_cache, route_stops_cache
+        self._build_spatial_index()
+        self._save_routes_cache()
+        
+        summary = {'added': len(added), 'removed': len(removed), 'refreshed': refreshed - len(added)}
+        logger.info(f"🔄 Route refresh in {time.time() - started:.1f}s: {summary}")
+        return summary
+    
+    def _save_routes_cache(self):
+        """Persist the caches and remember the version written, so this process doesn't reload its own save"""
+        if save_routes_cache(self.routes_cache, self.stops_cache, self.route_stops_cache):
+            self.cache_version = get_cache_version()
+    
+    def refresh_routes_in_background(self) -> bool:
+        """Start refresh_routes on a daemon thread (one refresh per process at a time)"""
+        if not _route_refresh_lock.acquire(blocking=False):
+            return False
+        
+        def run():
+            try:
+                self.refresh_routes()
+            except Exception as e:
+                logger.error(f"❌ Background route refresh failed: {e}")
+            finally:
+                _route_refresh_lock.release()
+        
+        threading.Thread(target=run, name="route-refresh", daemon=True).start()
+        return True
+    
+    @traced("find_nearby_stops")
+    def find_nearby_stops(self, user_lat: float, user_lon: float, radius_m: int = 700, max_stops: int = 10) -> List[Tuple[float, TransitStop]]:
+        """Find NEAREST stops - (distance_m, stop) pairs sorted by distance, closest max_stops
+        
+        Stops are shared by every session in the process, so the per-query
+        distance travels alongside the stop instead of being written onto it.
+        """
+        # First ensure we have all routes discovered
+        if not self.routes_cache:
+            self.discover_all_routes()
+        
+        if self.spatial_index is None:
+            self._build_spatial_index()
+        
+        # k-nearest query: only the grid cells around the user are visited.
         # If 10 found at 20m, return those 10 (don't show stops at 100m)
         # If only 5 found within 700m, return those 5
-        nearby_stops = all_stops[:max_stops]
+        nearby_stops = self.spatial_index.nearest(user_lat, user_lon, max_stops, max_radius_m=radius_m)
         
+        current_span().set(stops=len(nearby_stops))
         logger.info(f"📍 Found {len(nearby_stops)} closest stops (sorted by distance)")
         return nearby_stops
     
     def get_real_time_predictions(self, stop_id: str, route_tags: List[str] = None, vehicle_locations: Dict = None) -> List[Dict]:
         """Get real-time predictions for a stop with optional route filter"""
-        predictions = []
-        
+        predictions = self._fetch_stop_predictions(stop_id, route_tags, vehicle_locations)
+        return predictions if predictions is not None else []
+    
+    def _fetch_stop_predictions(self, stop_id: str, route_tags: List[str] = None, vehicle_locations: Dict = None) -> Optional[List[Dict]]:
+        """Predictions for one stop, or None if the request failed (so it isn't cached as "no arrivals")"""
         # Get vehicle locations if not provided (for backward compatibility)
         if vehicle_locations is None:
             vehicle_locations = self._get_all_vehicle_locations()
@@ -225,109 +417,266 @@ class NextBusTransitService:
         # Get predictions for the stop
         try:
             url = f"{self.api_url}?command=predictions&a={self.agency}&stopId={stop_id}"
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json_coalesced(url)
             
-            predictions_obj = data.get('predictions', [])
-            if not isinstance(predictions_obj, list):
-                predictions_obj = [predictions_obj] if predictions_obj else []
-            
-            for pred_obj in predictions_obj:
-                if not isinstance(pred_obj, dict):
-                    continue
-                    
-                route_tag = pred_obj.get('routeTag', '')
-                route_title = pred_obj.get('routeTitle', 'Unknown Route')
-                
-                # Filter by requested routes if specified
-                if route_tags and route_tag not in route_tags:
-                    continue
-                
-                # Get direction data
-                direction = pred_obj.get('direction', {})
-                if isinstance(direction, list):
-                    direction = direction[0] if direction else {}
-                
-                if not isinstance(direction, dict):
-                    continue
-                
-                prediction_list = direction.get('prediction', [])
-                if not isinstance(prediction_list, list):
-                    prediction_list = [prediction_list] if prediction_list else []
-                
-                # Get direction title
-                dir_title = direction.get('title', direction.get('dirTitleBecauseNoPredictions', ''))
-                if not dir_title:
-                    # Try to get it from the message
-                    dir_title = pred_obj.get('dirTitleBecauseNoPredictions', '')
-                
-                for pred in prediction_list[:3]:  # Get up to 3 predictions
-                    if not isinstance(pred, dict):
-                        continue
-                        
-                    minutes = float(pred.get('minutes', 0))
-                    seconds = float(pred.get('seconds', minutes * 60))
-                    vehicle_id = pred.get('vehicle', '')
-                    
-                    # Get vehicle location and heading from vehicle_locations map
-                    vehicle_lat = 0
-                    vehicle_lon = 0
-                    vehicle_heading = 0
-                    if vehicle_id in vehicle_locations:
-                        vehicle_data = vehicle_locations[vehicle_id]
-                        vehicle_lat = float(vehicle_data.get('lat', 0))
-                        vehicle_lon = float(vehicle_data.get('lon', 0))
-                        vehicle_heading = float(vehicle_data.get('heading', 0))
-                    
-                    predictions.append({
-                        'route_tag': route_tag,
-                        'route_title': route_title,
-                        'direction': dir_title,  # e.g., "Eastbound", "Westbound"
-                        'stop_id': stop_id,
-                        'arrival_minutes': minutes,
-                        'arrival_seconds': seconds,
-                        'vehicle_id': vehicle_id,
-                        'vehicle_lat': vehicle_lat,
-                        'vehicle_lon': vehicle_lon,
-                        'vehicle_heading': vehicle_heading,
-                        'data_source': 'nextbus'
-                    })
+            predictions = self._parse_predictions(data.get('predictions', []), stop_id, route_tags, vehicle_locations)
             
             logger.info(f"✅ Got {len(predictions)} predictions for stop {stop_id}")
+            return predictions
             
         except Exception as e:
             logger.error(f"❌ Failed to get predictions for {stop_id}: {e}")
+            return None
+    
+    def _get_json_coalesced(self, url: str) -> Dict:
+        """GET a NextBus URL, sharing one request between concurrent callers of the same URL
         
-        return predictions
+        The parsed response is shared by every waiter, so callers must treat it as read-only.
+        """
+        def fetch():
+            response = transport.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        
+        return flights.do(f"nextbus:{url}", fetch)
     
-    def _get_all_vehicle_locations(self) -> Dict[str, Dict]:
-        """Get all vehicle locations and cache them"""
-        vehicle_map = {}
+    @traced("predictions")
+    def get_predictions_for_stops(self, stops: List[TransitStop], vehicle_locations: Dict = None) -> Dict[str, List[Dict]]:
+        """Get predictions for many stops, served from the stale-while-revalidate cache
+        
+        Cached stops are answered immediately (time-adjusted if stale); only
+        missing stops are fetched before returning, and stale ones are
+        refreshed on a background worker. Stops whose fetch failed are left
+        out and never cached, so a stale entry keeps being served through
+        an outage instead of being replaced by an empty list.
+        """
+        if vehicle_locations is None:
+            vehicle_locations = self._get_all_vehicle_locations()
+        
+        stops_by_id = {stop.stop_id: stop for stop in stops}
+        predictions_by_stop, misses, stale = prediction_cache.serve(list(stops_by_id), vehicle_locations)
+        current_span().set(cache_hit=not misses, stops=len(stops_by_id), misses=len(misses), stale=len(stale))
+        
+        if misses:
+            fetched = self._fetch_predictions_for_stops([stops_by_id[stop_id] for stop_id in misses], vehicle_locations)
+            prediction_cache.put_many(fetched)
+            predictions_by_stop.update(fetched)
+        
+        if stale:
+            refresh_in_background(stale, lambda stop_ids: self._fetch_predictions_for_stops(
+                [stops_by_id[stop_id] for stop_id in stop_ids], self._get_all_vehicle_locations()
+            ))
+        
+        return predictions_by_stop
+    
+    def _fetch_predictions_for_stops(self, stops: List[TransitStop], vehicle_locations: Dict = None) -> Dict[str, List[Dict]]:
+        """Get live predictions for many stops using batched predictionsForMultiStops requests
+        
+        Every (route, stop tag) pair is packed into as few requests as the URL
+        length limit allows; the response is split back into per-stop lists in
+        the same format as get_real_time_predictions. Stops whose batch and
+        per-stop fallback both failed are left out of the result; a stop split
+        across chunks keeps the routes whose chunk succeeded.
+        """
+        if vehicle_locations is None:
+            vehicle_locations = self._get_all_vehicle_locations()
+        
+        chunks = self._chunk_multi_stop_pairs(stops)
+        if not chunks:
+            return {stop.stop_id: [] for stop in stops}
+        
+        if len(chunks) == 1:
+            results = [self._fetch_multi_stop_chunk(chunks[0], vehicle_locations)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                results = list(executor.map(lambda chunk: self._fetch_multi_stop_chunk(chunk, vehicle_locations), chunks))
+        
+        predictions_by_stop = self._merge_chunk_predictions(stops, results)
+        total = sum(len(p) for p in predictions_by_stop.values())
+        logger.info(f"✅ Got {total} predictions for {len(predictions_by_stop)}/{len(stops)} stops in {len(chunks)} request(s)")
+        return predictions_by_stop
+    
+    def _chunk_multi_stop_pairs(self, stops: List[TransitStop]) -> List[List[Tuple[TransitStop, str]]]:
+        """Split (stop, route_tag) pairs into chunks that fit the URL length limit
+        
+        A stop's pairs stay in one chunk, so one failed request never leaves a
+        stop half-answered; only a stop too big for any single request is split.
+        """
+        base_length = len(f"{self.api_url}?command=predictionsForMultiStops&a={self.agency}")
+        chunks = []
+        current = []
+        current_length = base_length
+        
+        def fits(length: int, pairs: int) -> bool:
+            return length <= Settings.NEXTBUS_MAX_URL_LENGTH and pairs <= Settings.NEXTBUS_MAX_STOPS_PER_REQUEST
+        
+        for stop in stops:
+            # "&stops=" + route + "%7C" + stop tag once the pipe is percent-encoded
+            pair_lengths = [len("&stops=") + len(route_tag) + 3 + len(stop.stop_code) for route_tag in stop.routes]
+            if current and not fits(current_length + sum(pair_lengths), len(current) + len(pair_lengths)):
+                chunks.append(current)
+                current = []
+                current_length = base_length
+            for route_tag, pair_length in zip(stop.routes, pair_lengths):
+                if current and not fits(current_length + pair_length, len(current) + 1):
+                    chunks.append(current)
+                    current = []
+                    current_length = base_length
+                current.append((stop, route_tag))
+                current_length += pair_length
+        
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def _fetch_multi_stop_chunk(self, chunk: List[Tuple[TransitStop, str]], vehicle_locations: Dict) -> Dict[str, Optional[List[Dict]]]:
+        """Fetch one predictionsForMultiStops request and split it back per stop (None where every attempt failed)"""
+        route_tags = self._chunk_route_tags(chunk)
         
         try:
-            url = f"{self.api_url}?command=vehicleLocations&a={self.agency}&t=0"
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json_coalesced(self._multi_stop_url(chunk))
+        except Exception as e:
+            # Fall back to one request per stop so a bad batch doesn't blank the results
+            logger.error(f"❌ Multi-stop predictions failed for {len(route_tags)} stops: {e}")
+            # Only this chunk's routes: a stop split across chunks gets its other routes elsewhere
+            return {
+                stop_id: self._fetch_stop_predictions(stop_id, tags, vehicle_locations)
+                for stop_id, tags in route_tags.items()
+            }
+        
+        objs_by_stop = self._split_multi_stop_response(data, chunk)
+        return {
+            stop_id: self._parse_predictions(objs_by_stop[stop_id], stop_id, tags, vehicle_locations)
+            for stop_id, tags in route_tags.items()
+        }
+    
+    # Shared with AsyncNextBusClient, so the sync and async paths split and merge responses the same way
+    def _multi_stop_url(self, chunk: List[Tuple[TransitStop, str]]) -> str:
+        stops_params = "".join(f"&stops={route_tag}|{stop.stop_code}" for stop, route_tag in chunk)
+        return f"{self.api_url}?command=predictionsForMultiStops&a={self.agency}{stops_params}"
+    
+    @staticmethod
+    def _chunk_route_tags(chunk: List[Tuple[TransitStop, str]]) -> Dict[str, List[str]]:
+        """Route tags asked for per stop_id in one chunk, in request order"""
+        route_tags = {}
+        for stop, route_tag in chunk:
+            route_tags.setdefault(stop.stop_id, []).append(route_tag)
+        return route_tags
+    
+    @staticmethod
+    def _split_multi_stop_response(data: Dict, chunk: List[Tuple[TransitStop, str]]) -> Dict[str, List[Dict]]:
+        """Raw prediction objects of one predictionsForMultiStops response, grouped by stop_id"""
+        stops_by_pair = {(route_tag, stop.stop_code): stop for stop, route_tag in chunk}
+        objs_by_stop = {stop.stop_id: [] for stop, _ in chunk}
+        
+        predictions_obj = data.get('predictions', [])
+        if not isinstance(predictions_obj, list):
+            predictions_obj = [predictions_obj] if predictions_obj else []
+        
+        # Group the response back by stop using the (route, stop tag) we asked for
+        for pred_obj in predictions_obj:
+            if not isinstance(pred_obj, dict):
+                continue
+            stop = stops_by_pair.get((pred_obj.get('routeTag', ''), pred_obj.get('stopTag', '')))
+            if stop:
+                objs_by_stop[stop.stop_id].append(pred_obj)
+        return objs_by_stop
+    
+    @staticmethod
+    def _merge_chunk_predictions(stops: List[TransitStop], results: List[Dict[str, Optional[List[Dict]]]]) -> Dict[str, List[Dict]]:
+        """Combine per-chunk results; stops no chunk answered (None everywhere) are left out"""
+        predictions_by_stop = {stop.stop_id: [] for stop in stops}
+        failed, answered = set(), set()
+        # A stop only spans chunks when it alone overflows a request; each chunk holds different routes
+        for chunk_predictions in results:
+            for stop_id, predictions in chunk_predictions.items():
+                if predictions is None:
+                    failed.add(stop_id)
+                else:
+                    answered.add(stop_id)
+                    predictions_by_stop[stop_id].extend(predictions)
+        
+        for stop_id in failed - answered:
+            del predictions_by_stop[stop_id]
+        return predictions_by_stop
+    
+    def _parse_predictions(self, predictions_obj, stop_id: str, route_tags: Optional[List[str]], vehicle_locations: Dict) -> List[Dict]:
+        """Convert NextBus prediction objects for one stop into prediction dicts"""
+        predictions = []
+        
+        if not isinstance(predictions_obj, list):
+            predictions_obj = [predictions_obj] if predictions_obj else []
+        
+        for pred_obj in predictions_obj:
+            if not isinstance(pred_obj, dict):
+                continue
+                
+            route_tag = pred_obj.get('routeTag', '')
+            route_title = pred_obj.get('routeTitle', 'Unknown Route')
+            
+            # Filter by requested routes if specified
+            if route_tags and route_tag not in route_tags:
+                continue
+            
+            # Get direction data
+            direction = pred_obj.get('direction', {})
+            if isinstance(direction, list):
+                direction = direction[0] if direction else {}
             
-            vehicles = data.get('vehicle', [])
-            for vehicle in vehicles:
-                vehicle_id = vehicle.get('id')
-                vehicle_map[vehicle_id] = {
-                    'lat': vehicle.get('lat'),
-                    'lon': vehicle.get('lon'),
-                    'heading': vehicle.get('heading'),
-                    'speedKmHr': vehicle.get('speedKmHr'),
-                    'routeTag': vehicle.get('routeTag'),  # Store route for filtering
-                    'dirTag': vehicle.get('dirTag')  # Store direction
-                }
+            if not isinstance(direction, dict):
+                continue
             
-            logger.info(f"✅ Got {len(vehicle_map)} vehicle locations")
+            prediction_list = direction.get('prediction', [])
+            if not isinstance(prediction_list, list):
+                prediction_list = [prediction_list] if prediction_list else []
             
-        except Exception as e:
-            logger.error(f"❌ Failed to get vehicle locations: {e}")
+            # Get direction title
+            dir_title = direction.get('title', direction.get('dirTitleBecauseNoPredictions', ''))
+            if not dir_title:
+                # Try to get it from the message
+                dir_title = pred_obj.get('dirTitleBecauseNoPredictions', '')
+            
+            for pred in prediction_list[:3]:  # Get up to 3 predictions
+                if not isinstance(pred, dict):
+                    continue
+                    
+                minutes = float(pred.get('minutes', 0))
+                seconds = float(pred.get('seconds', minutes * 60))
+                vehicle_id = pred.get('vehicle', '')
+                
+                # Get vehicle location and heading from vehicle_locations map
+                vehicle_lat = 0
+                vehicle_lon = 0
+                vehicle_heading = 0
+                if vehicle_id in vehicle_locations:
+                    vehicle_data = vehicle_locations[vehicle_id]
+                    vehicle_lat = float(vehicle_data.get('lat', 0))
+                    vehicle_lon = float(vehicle_data.get('lon', 0))
+                    vehicle_heading = float(vehicle_data.get('heading', 0))
+                
+                predictions.append({
+                    'route_tag': route_tag,
+                    'route_title': route_title,
+                    'direction': dir_title,  # e.g., "Eastbound", "Westbound"
+                    'stop_id': stop_id,
+                    'arrival_minutes': minutes,
+                    'arrival_seconds': seconds,
+                    'vehicle_id': vehicle_id,
+                    'vehicle_lat': vehicle_lat,
+                    'vehicle_lon': vehicle_lon,
+                    'vehicle_heading': vehicle_heading,
+                    'data_source': 'nextbus'
+                })
         
+        return predictions
+    
+    @traced("vehicles")
+    def _get_all_vehicle_locations(self) -> Dict[str, Dict]:
+        """Get all vehicle locations from the shared, incrementally updated vehicle table"""
+        poller = get_vehicle_poller(self.api_url, self.agency)
+        mark_cache_hit(poller.has_data())
+        vehicle_map = poller.get_vehicles()
+        logger.debug(f"✅ Got {len(vehicle_map)} vehicle locations")
         return vehicle_map
     
     def get_all_buses_for_route(self, route_tag: str, vehicle_locations: Dict = None) -> List[Dict]:
@@ -350,34 +699,64 @@ class NextBusTransitService:
         logger.info(f"🚌 Route {route_tag}: Found {len(route_buses)} buses currently running")
         return route_buses
     
+    @traced("transit_data")
     def get_transit_data_for_location(self, user_lat: float, user_lon: float, radius_m: int = 700) -> List[Dict]:
-        """Get complete transit data for a location - shows nearest 10 stops within 700m"""
-        all_transit_data = []
+        """Get complete transit data for a location - shows nearest 10 stops within 700m
         
+        Thin sync wrapper: with httpx installed the fetches run concurrently on
+        the shared async loop, otherwise the blocking path below is used. The
+        async search is bounded by its deadline, then falls back to the
+        blocking path.
+        """
+        if HTTPX_AVAILABLE:
+            if not self.routes_cache:
+                # Cold start runs before the deadline starts, it's a long one-off job
+                self.discover_all_routes()
+            client = self._get_async_client()
+            try:
+                return run_sync(client.get_transit_data_for_location(user_lat, user_lon, radius_m), timeout=client.search_deadline())
+            except FutureTimeoutError:
+                logger.warning(f"⚠️ Async fetch missed its {client.search_deadline():.0f}s deadline, using sync path")
+            except Exception as e:
+                logger.warning(f"⚠️ Async fetch failed, using sync path: {e}")
+        return self._get_transit_data_for_location_sync(user_lat, user_lon, radius_m)
+    
+    def _get_async_client(self) -> AsyncNextBusClient:
+        if self._async_client is None:
+            self._async_client = AsyncNextBusClient(self)
+        return self._async_client
+    
+    def _stop_transit_data(self, stop: TransitStop, distance_m: float, predictions: List[Dict]) -> Dict:
+        """Result row for one stop (included even with no predictions - shows transit is available)"""
+        return {
+            'stop_id': stop.stop_id,
+            'stop_name': stop.title,  # Intersection name
+            'lat': stop.lat,
+            'lon': stop.lon,
+            'distance': distance_m,
+            'routes': stop.routes,
+            'predictions': predictions,
+            'data_source': 'nextbus'
+        }
+    
+    def _get_transit_data_for_location_sync(self, user_lat: float, user_lon: float, radius_m: int = 700) -> List[Dict]:
+        """Blocking version of get_transit_data_for_location"""
         # Find nearest 10 stops within 700m radius
         nearby_stops = self.find_nearby_stops(user_lat, user_lon, radius_m, max_stops=10)
         
         logger.info(f"📍 Found {len(nearby_stops)} stops within {radius_m}m, getting predictions...")
         
-        # Get vehicle locations ONCE for all stops (optimization)
+        # Snapshot of the shared vehicle table (no network call once the poller is warm)
         vehicle_locations = self._get_all_vehicle_locations()
         logger.info(f"🚌 Got {len(vehicle_locations)} vehicle locations")
         
-        for stop in nearby_stops:
-            # Get real-time predictions for each route serving this stop
-            predictions = self.get_real_time_predictions(stop.stop_id, stop.routes, vehicle_locations)
-            
-            # Include stop even if no predictions (shows transit is available)
-            all_transit_data.append({
-                'stop_id': stop.stop_id,
-                'stop_name': stop.title,  # Intersection name
-                'lat': stop.lat,
-                'lon': stop.lon,
-                'distance': stop.distance_meters,
-                'routes': stop.routes,
-                'predictions': predictions,
-                'data_source': 'nextbus'
-            })
+        # Get predictions for every nearby stop in one batched request
+        predictions_by_stop = self.get_predictions_for_stops([stop for _, stop in nearby_stops], vehicle_locations)
+        
+        all_transit_data = [
+            self._stop_transit_data(stop, distance_m, predictions_by_stop.get(stop.stop_id, []))
+            for distance_m, stop in nearby_stops
+        ]
         
         logger.info(f"✅ Returning transit data for {len(all_transit_data)} stops")
-        return all_transit_data
\ No newline at end of file
+        return all_transit_data
@@ -0,0 +1,596 @@
+"""
+GTFS static schedule store
+Imports a local GTFS zip into compact indexed tables and answers scheduled-departure lookups offline
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import numpy as np
+import structlog
+from src.config.settings import Settings
+from src.utils.spatial_index import GridSpatialIndex
+
+logger = structlog.get_logger("maple_mover.gtfs")
+
+try:
+    TORONTO_TZ = ZoneInfo("America/Toronto")
+except ZoneInfoNotFoundError:
+    TORONTO_TZ = None  # No tz database installed; fall back to the server's local time
+SECONDS_PER_DAY = 24 * 3600
+SCHEDULE_VERSION = 1
+# stop_times.txt rows buffered per chunk while streaming (12 bytes each once packed)
+STOP_TIMES_CHUNK_ROWS = 250_000
+SPILL_DTYPE = np.dtype([('stop', '<i4'), ('trip', '<i4'), ('seconds', '<i4')])
+
+# Everything a GTFSSchedule is made of; saved and loaded as one .npz
+ARRAY_NAMES = (
+    "stop_ids", "stop_codes", "stop_names", "stop_lats", "stop_lons",
+    "route_ids", "route_short_names", "route_long_names", "route_types",
+    "trip_route", "trip_service", "trip_headsigns",
+    "service_ids", "service_weekdays", "service_start", "service_end",
+    "exception_service", "exception_date", "exception_type",
+    "stop_key_offsets", "key_service", "key_offsets",
+    "dep_seconds", "dep_trip",
+)
+
+def parse_gtfs_time(value: str) -> int:
+    """Seconds since the start of the service day; hours may run past 24 (-1 if blank)"""
+    value = value.strip()
+    if not value:
+        return -1
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+def _yyyymmdd(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+@dataclass
+class ScheduledDeparture:
+    """One scheduled departure from a stop"""
+    stop_id: str
+    route_id: str
+    route_short_name: str
+    route_long_name: str
+    route_type: int
+    headsign: str
+    departure_seconds: int   # seconds into the service day (may exceed 24h)
+    minutes_away: float
+
+class GTFSSchedule:
+    """Read-only GTFS tables held as numpy arrays
+
+    Strings are stored once per stop/route/trip and referenced by integer
+    offsets. Departures are sorted by (stop, service, time) and indexed in
+    two CSR levels: stop_key_offsets gives each stop's run of (stop,
+    service) keys, and key_offsets gives each key's run of departures. A
+    lookup is a couple of array slices and one searchsorted per active
+    service, with no parsing and no network.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], feed_info: Optional[Dict] = None):
+        missing = [name for name in ARRAY_NAMES if name not in arrays]
+        if missing:
+            raise ValueError(f"GTFS schedule is missing arrays: {missing}")
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.feed_info = feed_info or {}
+
+        self._stop_lookup: Dict[str, int] = {str(stop_id): i for i, stop_id in enumerate(self.stop_ids)}
+        for i, code in enumerate(self.stop_codes):
+            # TTC stop codes are the NextBus stop ids; real GTFS ids win on collisions
+            if code:
+                self._stop_lookup.setdefault(str(code), i)
+        self._active_services: Dict[date, FrozenSet[int]] = {}
+        self._routes_by_stop: Dict[int, List[int]] = {}
+        self._spatial_index: Optional[GridSpatialIndex] = None
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+    def save(self, path: str) -> None:
+        """Write all tables to one .npz (atomic replace)"""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        header = json.dumps({'version': SCHEDULE_VERSION, **self.feed_info})
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, header=np.array(header), **{name: getattr(self, name) for name in ARRAY_NAMES})
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "GTFSSchedule":
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            if header.get('version') != SCHEDULE_VERSION:
+                raise ValueError(f"GTFS schedule {path} has version {header.get('version')}, expected {SCHEDULE_VERSION}")
+            arrays = {name: data[name] for name in ARRAY_NAMES}
+        header.pop('version')
+        return cls(arrays, header)
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+    @property
+    def stop_count(self) -> int:
+        return len(self.stop_ids)
+
+    @property
+    def departure_count(self) -> int:
+        return len(self.dep_seconds)
+
+    def stop_index(self, stop_id: str) -> Optional[int]:
+        """Offset of a stop by GTFS stop_id or stop_code (NextBus stop id)"""
+        return self._stop_lookup.get(str(stop_id))
+
+    def active_services(self, service_date: date) -> FrozenSet[int]:
+        """Service offsets running on a date (calendar.txt weekdays + calendar_dates.txt exceptions)"""
+        active = self._active_services.get(service_date)
+        if active is not None:
+            return active
+
+        day = _yyyymmdd(service_date)
+        running = (
+            self.service_weekdays[:, service_date.weekday()]
+            & (self.service_start <= day) & (self.service_end >= day)
+        )
+        services = set(np.flatnonzero(running).tolist())
+        on_date = self.exception_date == day
+        services.update(self.exception_service[on_date & (self.exception_type == 1)].tolist())
+        services.difference_update(self.exception_service[on_date & (self.exception_type == 2)].tolist())
+
+        active = frozenset(services)
+        with self._lock:
+            if len(self._active_services) > 32:
+                self._active_services.clear()
+            self._active_services[service_date] = active
+        return active
+
+    def next_departures(self, stop_id: str, when: Optional[datetime] = None, limit: int = 3,
+                        horizon_minutes: float = 120) -> List[ScheduledDeparture]:
+        """Next scheduled departures from a stop (GTFS stop_id or stop_code), soonest first"""
+        stop_idx = self.stop_index(stop_id)
+        if stop_idx is None:
+            return []
+        return self.next_departures_at(stop_idx, when, limit, horizon_minutes)
+
+    def next_departures_at(self, stop_idx: int, when: Optional[datetime] = None, limit: int = 3,
+                           horizon_minutes: float = 120) -> List[ScheduledDeparture]:
+        """Next scheduled departures from a stop offset, soonest first
+
+        Trips after midnight belong to the previous service day with times
+        past 24:00:00, so yesterday's services are searched too.
+        """
+        if limit <= 0:
+            return []
+
+        now = when or datetime.now(TORONTO_TZ)
+        if now.tzinfo is not None and TORONTO_TZ is not None:
+            now = now.astimezone(TORONTO_TZ)
+        seconds_now = now.hour * 3600 + now.minute * 60 + now.second
+        horizon = horizon_minutes * 60
+
+        candidates: List[Tuple[int, int]] = []
+        first_key, last_key = int(self.stop_key_offsets[stop_idx]), int(self.stop_key_offsets[stop_idx + 1])
+        for service_date, target in ((now.date(), seconds_now), (now.date() - timedelta(days=1), seconds_now + SECONDS_PER_DAY)):
+            active = self.active_services(service_date)
+            for key in range(first_key, last_key):
+                if int(self.key_service[key]) not in active:
+                    continue
+                lo, hi = int(self.key_offsets[key]), int(self.key_offsets[key + 1])
+                start = lo + int(np.searchsorted(self.dep_seconds[lo:hi], target))
+                for j in range(start, min(start + limit, hi)):
+                    wait = int(self.dep_seconds[j]) - target
+                    if wait > horizon:
+                        break
+                    candidates.append((wait, j))
+
+        candidates.sort()
+        return [self._departure(stop_idx, j, wait) for wait, j in candidates[:limit]]
+
+    def _departure(self, stop_idx: int, j: int, wait: int) -> ScheduledDeparture:
+        trip = int(self.dep_trip[j])
+        route = int(self.trip_route[trip])
+        return ScheduledDeparture(
+            stop_id=str(self.stop_ids[stop_idx]),
+            route_id=str(self.route_ids[route]),
+            route_short_name=str(self.route_short_names[route]),
+            route_long_name=str(self.route_long_names[route]),
+            route_type=int(self.route_types[route]),
+            headsign=str(self.trip_headsigns[trip]),
+            departure_seconds=int(self.dep_seconds[j]),
+            minutes_away=wait / 60.0,
+        )
+
+    def routes_for_stop(self, stop_id: str) -> List[int]:
+        """Route offsets with any scheduled departure from a stop (GTFS stop_id or stop_code)"""
+        stop_idx = self.stop_index(stop_id)
+        return self.routes_at(stop_idx) if stop_idx is not None else []
+
+    def routes_at(self, stop_idx: int) -> List[int]:
+        """Route offsets with any scheduled departure from a stop offset"""
+        routes = self._routes_by_stop.get(stop_idx)
+        if routes is None:
+            lo = int(self.key_offsets[self.stop_key_offsets[stop_idx]])
+            hi = int(self.key_offsets[self.stop_key_offsets[stop_idx + 1]])
+            routes = np.unique(self.trip_route[self.dep_trip[lo:hi]]).tolist()
+            self._routes_by_stop[stop_idx] = routes
+        return routes
+
+    def stops_near(self, lat: float, lon: float, radius_m: float, limit: int = 10) -> List[Tuple[float, int]]:
+        """(distance_m, stop offset) of the closest stops within radius_m"""
+        if self._spatial_index is None:
+            with self._lock:
+                if self._spatial_index is None:
+                    self._spatial_index = GridSpatialIndex(self.stop_lats, self.stop_lons, range(self.stop_count))
+        return self._spatial_index.nearest(lat, lon, limit, max_radius_m=radius_m)
+
+# -----------------------------------------------------------------------------
+# Import
+# -----------------------------------------------------------------------------
+def _find_member(zf: zipfile.ZipFile, name: str, required: bool = True) -> Optional[str]:
+    """Path of one GTFS file inside the zip (files may sit in a subdirectory)"""
+    member = next((info.filename for info in zf.infolist() if os.path.basename(info.filename) == name), None)
+    if member is None and required:
+        raise ValueError(f"GTFS feed is missing {name}")
+    return member
+
+def _read_table(zf: zipfile.ZipFile, name: str, required: bool = True) -> Iterator[Dict[str, str]]:
+    """Rows of one (small) GTFS file inside the zip as dicts"""
+    member = _find_member(zf, name, required)
+    if member is None:
+        return
+    with zf.open(member) as raw:
+        # utf-8-sig: many agencies' exports start with a BOM
+        yield from csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+
+def _strings(values: List[str]) -> np.ndarray:
+    return np.array(values, dtype=str) if values else np.array([], dtype="<U1")
+
+def import_gtfs_zip(path: str, chunk_rows: int = STOP_TIMES_CHUNK_ROWS) -> GTFSSchedule:
+    """Build a GTFSSchedule from a GTFS zip on disk
+
+    The small tables are read whole; stop_times.txt is streamed in chunks
+    of chunk_rows (see build_departure_index).
+    """
+    started = time.time()
+    with zipfile.ZipFile(path) as zf:
+        # Stops
+        stop_ids, stop_codes, stop_names, stop_lats, stop_lons = [], [], [], [], []
+        for row in _read_table(zf, "stops.txt"):
+            if not row.get("stop_lat") or not row.get("stop_lon"):
+                continue  # Generic nodes/boarding areas carry no position
+            stop_ids.append(row["stop_id"])
+            stop_codes.append(row.get("stop_code", "") or "")
+            stop_names.append(row.get("stop_name", "") or "")
+            stop_lats.append(float(row["stop_lat"]))
+            stop_lons.append(float(row["stop_lon"]))
+        stop_offset = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+
+        # Routes
+        route_ids, short_names, long_names, route_types = [], [], [], []
+        for row in _read_table(zf, "routes.txt"):
+            route_ids.append(row["route_id"])
+            short_names.append(row.get("route_short_name", "") or "")
+            long_names.append(row.get("route_long_name", "") or "")
+            route_types.append(int(row.get("route_type") or 3))
+        route_offset = {route_id: i for i, route_id in enumerate(route_ids)}
+
+        # Services (calendar.txt and/or calendar_dates.txt)
+        service_offset: Dict[str, int] = {}
+        weekdays, service_start, service_end = [], [], []
+
+        def service(service_id: str) -> int:
+            if service_id not in service_offset:
+                service_offset[service_id] = len(service_offset)
+                weekdays.append([False] * 7)
+                service_start.append(0)
+                service_end.append(0)
+            return service_offset[service_id]
+
+        day_columns = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+        for row in _read_table(zf, "calendar.txt", required=False):
+            i = service(row["service_id"])
+            weekdays[i] = [row.get(day, "0") == "1" for day in day_columns]
+            service_start[i] = int(row["start_date"])
+            service_end[i] = int(row["end_date"])
+
+        exception_service, exception_date, exception_type = [], [], []
+        for row in _read_table(zf, "calendar_dates.txt", required=False):
+            exception_service.append(service(row["service_id"]))
+            exception_date.append(int(row["date"]))
+            exception_type.append(int(row["exception_type"]))
+
+        # Trips
+        trip_offset: Dict[str, int] = {}
+        trip_route, trip_service, trip_headsigns = [], [], []
+        for row in _read_table(zf, "trips.txt"):
+            route = route_offset.get(row["route_id"])
+            if route is None:
+                continue
+            trip_offset[row["trip_id"]] = len(trip_route)
+            trip_route.append(route)
+            trip_service.append(service(row["service_id"]))
+            trip_headsigns.append(row.get("trip_headsign", "") or "")
+
+        # Stop times
+        with tempfile.TemporaryFile() as spill:
+            stats = _stream_stop_times(zf, stop_offset, trip_offset, spill, chunk_rows)
+            departures = build_departure_index(stats.stop_counts, np.array(trip_service, dtype=np.int32), spill, chunk_rows)
+
+    arrays = {
+        'stop_ids': _strings(stop_ids),
+        'stop_codes': _strings(stop_codes),
+        'stop_names': _strings(stop_names),
+        'stop_lats': np.array(stop_lats, dtype=np.float64),
+        'stop_lons': np.array(stop_lons, dtype=np.float64),
+        'route_ids': _strings(route_ids),
+        'route_short_names': _strings(short_names),
+        'route_long_names': _strings(long_names),
+        'route_types': np.array(route_types, dtype=np.int16),
+        'trip_route': np.array(trip_route, dtype=np.int32),
+        'trip_service': np.array(trip_service, dtype=np.int32),
+        'trip_headsigns': _strings(trip_headsigns),
+        'service_ids': _strings(list(service_offset)),
+        'service_weekdays': np.array(weekdays, dtype=bool).reshape(-1, 7),
+        'service_start': np.array(service_start, dtype=np.int32),
+        'service_end': np.array(service_end, dtype=np.int32),
+        'exception_service': np.array(exception_service, dtype=np.int32),
+        'exception_date': np.array(exception_date, dtype=np.int32),
+        'exception_type': np.array(exception_type, dtype=np.int8),
+        **departures,
+    }
+
+    elapsed = time.time() - started
+    feed_info = {
+        'source': os.path.basename(path),
+        'imported_at': datetime.now().isoformat(),
+        'stop_times_rows': stats.rows,
+        'stop_times_rows_per_sec': round(stats.rows_per_sec),
+        'import_seconds': round(elapsed, 2),
+    }
+    schedule = GTFSSchedule(arrays, feed_info)
+    logger.info(f"✅ Imported GTFS feed {path}: {len(stop_ids)} stops, {len(route_ids)} routes, "
+                f"{len(trip_route)} trips, {schedule.departure_count} departures in {elapsed:.1f}s")
+    return schedule
+
+@dataclass
+class StopTimesStats:
+    """What streaming stop_times.txt produced"""
+    stop_counts: np.ndarray   # departures kept per stop offset
+    rows: int                 # rows read, including skipped ones
+    kept: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+def _stream_stop_times(zf: zipfile.ZipFile, stop_offset: Dict[str, int], trip_offset: Dict[str, int],
+                       spill, chunk_rows: int) -> StopTimesStats:
+    """Parse stop_times.txt into packed (stop, trip, seconds) records in `spill`
+
+    Trip and stop ids are interned to their offsets as rows are read, and
+    only chunk_rows rows are buffered at a time, so memory stays flat no
+    matter how large the feed is. Per-stop counts are accumulated on the
+    way so the second pass can place every departure directly.
+    """
+    started = time.perf_counter()
+    stop_counts = np.zeros(len(stop_offset), dtype=np.int64)
+    rows = kept = 0
+    # A feed has a few tens of thousands of distinct times across millions of rows
+    time_cache: Dict[str, int] = {}
+    stop_get, trip_get, time_get = stop_offset.get, trip_offset.get, time_cache.get
+
+    def flush(stops: array, trips: array, seconds: array) -> None:
+        chunk = np.empty(len(stops), dtype=SPILL_DTYPE)
+        chunk['stop'], chunk['trip'], chunk['seconds'] = stops, trips, seconds
+        spill.write(chunk.tobytes())
+        stop_counts[:] += np.bincount(chunk['stop'], minlength=len(stop_counts))
+
+    with zf.open(_find_member(zf, "stop_times.txt")) as raw:
+        reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+        header = [column.strip() for column in next(reader, [])]
+        try:
+            trip_col, stop_col = header.index("trip_id"), header.index("stop_id")
+        except ValueError:
+            raise ValueError("GTFS stop_times.txt needs trip_id and stop_id columns")
+        departure_col = header.index("departure_time") if "departure_time" in header else -1
+        arrival_col = header.index("arrival_time") if "arrival_time" in header else -1
+        width = max(trip_col, stop_col, departure_col, arrival_col) + 1
+
+        stops, trips, seconds = array("i"), array("i"), array("i")
+        for row in reader:
+            rows += 1
+            if rows % 1_000_000 == 0:
+                elapsed = time.perf_counter() - started
+                logger.info(f"📋 stop_times.txt: {rows:,} rows ({rows / elapsed:,.0f} rows/s)")
+            if len(row) < width:
+                continue
+            trip = trip_get(row[trip_col])
+            stop = stop_get(row[stop_col])
+            if trip is None or stop is None:
+                continue
+            value = (row[departure_col] if departure_col >= 0 else "") or (row[arrival_col] if arrival_col >= 0 else "")
+            second = time_get(value)
+            if second is None:
+                second = time_cache[value] = parse_gtfs_time(value)
+            if second < 0:
+                continue  # Untimed stop between timepoints
+            stops.append(stop)
+            trips.append(trip)
+            seconds.append(second)
+            if len(stops) >= chunk_rows:
+                kept += len(stops)
+                flush(stops, trips, seconds)
+                stops, trips, seconds = array("i"), array("i"), array("i")
+        if stops:
+            kept += len(stops)
+            flush(stops, trips, seconds)
+
+    stats = StopTimesStats(stop_counts, rows, kept, time.perf_counter() - started)
+    logger.info(f"📊 stop_times.txt: {rows:,} rows, {kept:,} departures kept in {stats.seconds:.1f}s "
+                f"({stats.rows_per_sec:,.0f} rows/s)")
+    return stats
+
+def build_departure_index(stop_counts: np.ndarray, trip_service: np.ndarray, spill, chunk_rows: int) -> Dict[str, np.ndarray]:
+    """Scatter spilled departures into per-stop runs and build the two CSR levels over them
+
+    The departure arrays are allocated once at their final size from the
+    per-stop counts; each chunk read back from the spill is written
+    straight into its stops' slots (a counting sort), then each stop's
+    run is sorted by (service, time). Nothing the size of the feed is
+    held besides the output itself.
+    """
+    stop_count = len(stop_counts)
+    stop_offsets = np.zeros(stop_count + 1, dtype=np.int64)
+    np.cumsum(stop_counts, out=stop_offsets[1:])
+    total = int(stop_offsets[-1])
+
+    dep_seconds = np.empty(total, dtype=np.int32)
+    dep_trip = np.empty(total, dtype=np.int32)
+    dep_service = np.empty(total, dtype=np.int32)
+
+    cursor = stop_offsets[:-1].copy()
+    spill.seek(0)
+    while True:
+        data = spill.read(chunk_rows * SPILL_DTYPE.itemsize)
+        if not data:
+            break
+        chunk = np.frombuffer(data, dtype=SPILL_DTYPE)
+        order = np.argsort(chunk['stop'], kind="stable")
+        stops = chunk['stop'][order]
+        chunk_counts = np.bincount(stops, minlength=stop_count)
+        # Position of each row within its stop's group in this chunk
+        group_start = np.cumsum(chunk_counts) - chunk_counts
+        slots = cursor[stops] + (np.arange(len(stops)) - group_start[stops])
+        dep_seconds[slots] = chunk['seconds'][order]
+        dep_trip[slots] = chunk['trip'][order]
+        dep_service[slots] = trip_service[dep_trip[slots]]
+        cursor += chunk_counts
+
+    for stop in np.flatnonzero(stop_counts > 1):
+        lo, hi = stop_offsets[stop], stop_offsets[stop + 1]
+        order = np.lexsort((dep_seconds[lo:hi], dep_service[lo:hi]))
+        dep_seconds[lo:hi] = dep_seconds[lo:hi][order]
+        dep_trip[lo:hi] = dep_trip[lo:hi][order]
+        dep_service[lo:hi] = dep_service[lo:hi][order]
+
+    # One key per distinct (stop, service) run: a key starts wherever the
+    # service changes or a new stop's run begins
+    starts = np.zeros(total, dtype=bool)
+    if total:
+        starts[1:] = dep_service[1:] != dep_service[:-1]
+        starts[stop_offsets[:-1][stop_counts > 0]] = True
+    key_starts = np.flatnonzero(starts)
+
+    return {
+        'stop_key_offsets': np.searchsorted(key_starts, stop_offsets).astype(np.int64),
+        'key_service': dep_service[key_starts].astype(np.int32),
+        'key_offsets': np.append(key_starts, total).astype(np.int64),
+        'dep_seconds': dep_seconds,
+        'dep_trip': dep_trip,
+    }
+
+# -----------------------------------------------------------------------------
+# Process-wide schedule
+# -----------------------------------------------------------------------------
+_schedule: Optional[GTFSSchedule] = None
+_schedule_mtime: Optional[float] = None  # mtime of the saved tables _schedule was loaded from
+_schedule_checked_at = 0.0
+_schedule_lock = threading.Lock()
+_import_thread: Optional[threading.Thread] = None
+
+def load_gtfs_schedule(cache_path: Optional[str] = None) -> Optional[GTFSSchedule]:
+    """Load the saved schedule tables (None until import_gtfs.py or the background import has written them)"""
+    cache_path = cache_path or Settings.GTFS_SCHEDULE_CACHE
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        schedule = GTFSSchedule.load(cache_path)
+        logger.info(f"✅ Loaded GTFS schedule ({schedule.stop_count} stops, {schedule.departure_count} departures)")
+        return schedule
+    except Exception as e:
+        logger.warning(f"⚠️ GTFS schedule cache unreadable: {e}")
+        return None
+
+def import_gtfs_schedule(zip_path: Optional[str] = None, cache_path: Optional[str] = None) -> Optional[GTFSSchedule]:
+    """Import the zip and save its tables; parses every stop_times row, so never call this from a request"""
+    zip_path = zip_path or Settings.GTFS_ZIP_PATH
+    cache_path = cache_path or Settings.GTFS_SCHEDULE_CACHE
+    try:
+        schedule = import_gtfs_zip(zip_path)
+        schedule.save(cache_path)
+        return schedule
+    except Exception as e:
+        logger.error(f"❌ Failed to import GTFS feed {zip_path}: {e}")
+        return None
+
+def _schedule_is_stale(zip_path: str, cache_path: str) -> bool:
+    """True when there is a feed and no saved tables at least as new as it"""
+    if not os.path.exists(zip_path):
+        return False
+    return not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(zip_path)
+
+def start_gtfs_import(zip_path: Optional[str] = None, cache_path: Optional[str] = None) -> Optional[threading.Thread]:
+    """Import the feed on a background thread if its saved tables are missing or older than the zip"""
+    global _import_thread
+    zip_path = zip_path or Settings.GTFS_ZIP_PATH
+    cache_path = cache_path or Settings.GTFS_SCHEDULE_CACHE
+    if not _schedule_is_stale(zip_path, cache_path):
+        return None
+    with _schedule_lock:
+        if _import_thread is not None and _import_thread.is_alive():
+            return _import_thread
+        logger.info(f"📋 Importing GTFS feed {zip_path} in the background")
+        _import_thread = threading.Thread(target=import_gtfs_schedule, args=(zip_path, cache_path),
+                                          name="gtfs-import", daemon=True)
+        _import_thread.start()
+        return _import_thread
+
+def get_gtfs_schedule() -> Optional[GTFSSchedule]:
+    """Return the shared schedule, or None while no saved tables exist
+
+    Never imports on the caller's thread. At most every GTFS_SCHEDULE_CHECK_INTERVAL seconds the saved
+    tables are looked at again, so a feed imported (or re-imported) after startup is picked up.
+    """
+    global _schedule, _schedule_mtime, _schedule_checked_at
+    now = time.time()
+    with _schedule_lock:
+        if now - _schedule_checked_at < Settings.GTFS_SCHEDULE_CHECK_INTERVAL:
+            return _schedule
+        _schedule_checked_at = now
+
+    start_gtfs_import()  # No-op unless a newer zip is waiting to be imported
+    cache_path = Settings.GTFS_SCHEDULE_CACHE
+    mtime = os.path.getmtime(cache_path) if os.path.exists(cache_path) else None
+    if mtime is not None and mtime != _schedule_mtime:
+        schedule = load_gtfs_schedule(cache_path)
+        if schedule is not None:
+            with _schedule_lock:
+                _schedule, _schedule_mtime = schedule, mtime
+    return _schedule
+
+def reset_gtfs_schedule() -> None:
+    """Forget the shared schedule so the next call reloads it"""
+    global _schedule, _schedule_mtime, _schedule_checked_at
+    with _schedule_lock:
+        _schedule = None
+        _schedule_mtime = None
+        _schedule_checked_at = 0.0
@@ -0,0 +1,128 @@
+"""
+Stale-while-revalidate cache for per-stop NextBus predictions
+Serves a recent answer immediately and refreshes it in the background
+"""
+
+import copy
+import threading
+import time
+import structlog
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from src.config.settings import Settings
+from src.utils.cache import LRUTTLCache
+
+logger = structlog.get_logger("maple_mover.predictions")
+
+class PredictionCache:
+    """Per-stop prediction lists with fresh and stale windows
+
+    An entry younger than fresh_seconds is served as is. Between
+    fresh_seconds and stale_seconds it is still served, with arrival
+    times moved forward by its age (and arrivals that have already
+    happened dropped), and the stop is handed out once for a background
+    refresh. Older entries are gone and count as misses. Vehicle
+    positions are always re-read from the current vehicle snapshot.
+    """
+
+    def __init__(self, fresh_seconds: Optional[float] = None, stale_seconds: Optional[float] = None, max_stops: Optional[int] = None):
+        self.fresh_seconds = fresh_seconds if fresh_seconds is not None else Settings.PREDICTION_FRESH_SECONDS
+        self.stale_seconds = stale_seconds if stale_seconds is not None else Settings.PREDICTION_STALE_SECONDS
+        max_stops = max_stops if max_stops is not None else Settings.PREDICTION_CACHE_MAX_STOPS
+        self._entries = LRUTTLCache(max_entries=max_stops, default_ttl=self.stale_seconds, name="predictions")
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def put(self, stop_id: str, predictions: List[Dict]) -> None:
+        """Store a freshly fetched prediction list for a stop"""
+        self._entries.set(f"predictions:{stop_id}", {'predictions': predictions, 'fetched_at': time.time()})
+
+    def put_many(self, predictions_by_stop: Dict[str, List[Dict]]) -> None:
+        """Store the stops one fetch returned (failed stops are absent, so their entries live on)"""
+        for stop_id, predictions in predictions_by_stop.items():
+            self.put(stop_id, predictions)
+
+    def serve(self, stop_ids: List[str], vehicle_locations: Optional[Dict] = None) -> Tuple[Dict[str, List[Dict]], List[str], List[str]]:
+        """Look up stops; returns (served predictions, misses, stale stops claimed for refresh)
+
+        The caller must fetch the misses, and refresh the stale stops (calling
+        release() for them when done). Stale stops already being refreshed by
+        someone else are served but not returned again. Without
+        vehicle_locations, call attach_vehicles() on the result later.
+        """
+        now = time.time()
+        served, misses, stale = {}, [], []
+        for stop_id in stop_ids:
+            entry = self._entries.get(f"predictions:{stop_id}")
+            if entry is None:
+                misses.append(stop_id)
+                continue
+
+            age = now - entry['fetched_at']
+            served[stop_id] = self._adjust(entry['predictions'], age, vehicle_locations)
+            if age > self.fresh_seconds and self._claim(stop_id):
+                stale.append(stop_id)
+
+        if misses or stale:
+            logger.debug(f"🕒 Prediction cache: {len(served)} served, {len(misses)} missed, {len(stale)} to refresh")
+        return served, misses, stale
+
+    def release(self, stop_ids: List[str]) -> None:
+        """Mark stops as no longer being refreshed"""
+        with self._lock:
+            self._refreshing.difference_update(stop_ids)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _claim(self, stop_id: str) -> bool:
+        with self._lock:
+            if stop_id in self._refreshing:
+                return False
+            self._refreshing.add(stop_id)
+            return True
+
+    def _adjust(self, predictions: List[Dict], age: float, vehicle_locations: Optional[Dict]) -> List[Dict]:
+        """Copy predictions with arrival times reduced by age and current vehicle positions"""
+        adjusted = []
+        for pred in predictions:
+            seconds = pred.get('arrival_seconds', pred.get('arrival_minutes', 0) * 60) - age
+            if seconds < 0:
+                continue  # Vehicle has already arrived
+            pred = copy.copy(pred)
+            pred['arrival_seconds'] = seconds
+            pred['arrival_minutes'] = float(int(seconds // 60))  # NextBus rounds minutes down
+            adjusted.append(pred)
+        if vehicle_locations:
+            self._attach_vehicles(adjusted, vehicle_locations)
+        return adjusted
+
+    def attach_vehicles(self, predictions_by_stop: Dict[str, List[Dict]], vehicle_locations: Dict) -> None:
+        """Update served predictions in place with current vehicle positions"""
+        for predictions in predictions_by_stop.values():
+            self._attach_vehicles(predictions, vehicle_locations)
+
+    @staticmethod
+    def _attach_vehicles(predictions: List[Dict], vehicle_locations: Dict) -> None:
+        for pred in predictions:
+            vehicle = vehicle_locations.get(pred.get('vehicle_id'))
+            if vehicle:
+                pred['vehicle_lat'] = float(vehicle.get('lat', 0))
+                pred['vehicle_lon'] = float(vehicle.get('lon', 0))
+                pred['vehicle_heading'] = float(vehicle.get('heading', 0))
+
+# Process-wide cache and refresh workers, shared by every session and service instance
+prediction_cache = PredictionCache()
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prediction-refresh")
+
+def refresh_in_background(stop_ids: List[str], fetch: Callable[[List[str]], Dict[str, List[Dict]]]) -> None:
+    """Fetch stop_ids on a worker thread, store the results and release the claims"""
+    def run():
+        try:
+            prediction_cache.put_many(fetch(stop_ids))
+        except Exception as e:
+            logger.warning(f"⚠️ Background prediction refresh failed for {len(stop_ids)} stops: {e}")
+        finally:
+            prediction_cache.release(stop_ids)
+
+    _refresh_executor.submit(run)
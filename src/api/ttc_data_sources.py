@@ -4,12 +4,17 @@ Multiple TTC Data Sources Integration
 Implements NextBus API, GTFS static data, and third-party APIs with fallbacks
 """
 
-import requests
 import time
+from datetime import datetime
+import numpy as np
 import structlog
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
+from src.config.settings import Settings
+from src.api.gtfs_static import GTFSSchedule, ScheduledDeparture, get_gtfs_schedule, start_gtfs_import
+from src.utils.geo_utils import calculate_distances
+from src.utils.http_client import transport
 
 logger = structlog.get_logger("maple_mover.ttc_sources")
 
@@ -19,6 +24,9 @@ class DataSource(Enum):
     THIRD_PARTY = "third_party"
     MOCK = "mock"
 
+# GTFS route_type -> label used in TransitData.route_type
+ROUTE_TYPE_NAMES = {0: "Streetcar", 1: "Subway", 2: "Rail", 3: "Bus"}
+
 @dataclass
 class TransitData:
     """Unified transit data structure"""
@@ -34,7 +42,7 @@ class NextBusAPIClient:
     """NextBus API client for real-time TTC data"""
     
     def __init__(self):
-        self.base_url = "https://retro.umoiq.com/service/publicJSONFeed"
+        self.base_url = Settings.NEXTBUS_API_URL
         self.agency = "ttc"
         self.timeout = 10
         
@@ -58,7 +66,7 @@ class NextBusAPIClient:
             url = f"{self.base_url}?command=vehicleLocations&a={self.agency}&t=0"
             logger.info(f"🔄 Fetching NextBus vehicle locations from {url}")
             
-            response = requests.get(url, timeout=self.timeout)
+            response = transport.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -81,7 +89,7 @@ class NextBusAPIClient:
             url = f"{self.base_url}?command=predictions&a={self.agency}&stopId={stop_id}"
             logger.info(f"🔄 Fetching NextBus predictions for stop {stop_id} ({station_id})")
             
-            response = requests.get(url, timeout=self.timeout)
+            response = transport.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -98,7 +106,7 @@ class NextBusAPIClient:
             url = f"{self.base_url}?command=routeList&a={self.agency}"
             logger.info(f"🔄 Fetching NextBus routes")
             
-            response = requests.get(url, timeout=self.timeout)
+            response = transport.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -110,45 +118,109 @@ class NextBusAPIClient:
             return None
 
 class GTFSStaticClient:
-    """GTFS static data client"""
+    """GTFS static schedule client (local feed, no network)
+
+    Reads the indexed schedule built from Settings.GTFS_ZIP_PATH. Download
+    the TTC feed from one of gtfs_urls; without it every lookup is empty.
+    A feed newer than its saved tables is imported in the background (or
+    offline with import_gtfs.py); lookups stay empty until that finishes.
+    """
     
-    def __init__(self):
+    def __init__(self, schedule: Optional[GTFSSchedule] = None):
         self.gtfs_urls = [
             "https://www.transsee.ca/gtfslist?a=ttc",  # TransSee archive
             "https://www.ttc.ca/transit/gtfs",         # Official TTC GTFS
         ]
-        self.timeout = 15
+        self._schedule = schedule
+        if schedule is None:
+            start_gtfs_import()
+    
+    @property
+    def schedule(self) -> Optional[GTFSSchedule]:
+        return self._schedule if self._schedule is not None else get_gtfs_schedule()
+    
+    def available(self) -> bool:
+        return self.schedule is not None
         
-    def get_stops_nearby(self, lat: float, lon: float, radius: float = 0.5) -> List[Dict]:
-        """Get stops within radius of coordinates"""
-        # This would typically parse GTFS stops.txt
-        # For now, return a placeholder structure
-        logger.info(f"🔄 GTFS: Finding stops near ({lat}, {lon}) within {radius}km")
+    def get_stops_nearby(self, lat: float, lon: float, radius: float = 0.5, limit: int = 10) -> List[Dict]:
+        """Get stops within radius (km) of coordinates, closest first"""
+        schedule = self.schedule
+        if schedule is None:
+            return []
         
-        # Placeholder - in real implementation, this would parse GTFS stops.txt
-        return [
-            {
-                "stop_id": "union_station",
-                "stop_name": "Union Station",
-                "stop_lat": 43.6452,
-                "stop_lon": -79.3806,
-                "distance": 0.1
-            }
-        ]
+        stops = []
+        for distance_m, i in schedule.stops_near(lat, lon, radius * 1000, limit):
+            stops.append({
+                "stop_id": str(schedule.stop_ids[i]),
+                "stop_code": str(schedule.stop_codes[i]),
+                "stop_name": str(schedule.stop_names[i]),
+                "stop_lat": float(schedule.stop_lats[i]),
+                "stop_lon": float(schedule.stop_lons[i]),
+                "distance": distance_m / 1000
+            })
+        logger.info(f"📋 GTFS: {len(stops)} stops near ({lat}, {lon}) within {radius}km")
+        return stops
     
     def get_routes_for_stop(self, stop_id: str) -> List[Dict]:
-        """Get routes that serve a specific stop"""
-        logger.info(f"🔄 GTFS: Getting routes for stop {stop_id}")
+        """Get routes that serve a specific stop (GTFS stop_id or stop code)"""
+        schedule = self.schedule
+        if schedule is None:
+            return []
         
-        # Placeholder - in real implementation, this would parse GTFS routes.txt and stop_times.txt
         return [
             {
-                "route_id": "1",
-                "route_short_name": "1",
-                "route_long_name": "Yonge-University Line",
-                "route_type": "1"  # Subway
+                "route_id": str(schedule.route_ids[r]),
+                "route_short_name": str(schedule.route_short_names[r]),
+                "route_long_name": str(schedule.route_long_names[r]),
+                "route_type": str(schedule.route_types[r])
             }
+            for r in schedule.routes_for_stop(stop_id)
         ]
+    
+    def get_scheduled_departures(self, stop_id: str, limit: int = 3, when: Optional[datetime] = None) -> List[ScheduledDeparture]:
+        """Next scheduled departures from a stop"""
+        schedule = self.schedule
+        return schedule.next_departures(stop_id, when=when, limit=limit) if schedule is not None else []
+    
+    def get_transit_data_for_location(self, lat: float, lon: float, radius_m: int = 700, max_stops: int = 10,
+                                      when: Optional[datetime] = None) -> List[Dict]:
+        """Nearest stops with scheduled departures, in the same shape as the NextBus service's results"""
+        schedule = self.schedule
+        if schedule is None:
+            return []
+        
+        all_transit_data = []
+        for distance_m, i in schedule.stops_near(lat, lon, radius_m, max_stops):
+            departures = schedule.next_departures_at(i, when=when, limit=Settings.MAX_ARRIVALS * 3)
+            stop_id = str(schedule.stop_codes[i] or schedule.stop_ids[i])
+            all_transit_data.append({
+                'stop_id': stop_id,
+                'stop_name': str(schedule.stop_names[i]),
+                'lat': float(schedule.stop_lats[i]),
+                'lon': float(schedule.stop_lons[i]),
+                'distance': distance_m,
+                'routes': [str(schedule.route_short_names[r]) for r in schedule.routes_at(i)],
+                'predictions': [
+                    {
+                        'route_tag': dep.route_short_name,
+                        'route_title': f"{dep.route_short_name}-{dep.route_long_name}" if dep.route_long_name else dep.route_short_name,
+                        'direction': dep.headsign,
+                        'stop_id': stop_id,
+                        'arrival_minutes': float(int(dep.minutes_away)),
+                        'arrival_seconds': dep.minutes_away * 60,
+                        'vehicle_id': '',  # Scheduled trip, no live vehicle
+                        'vehicle_lat': 0,
+                        'vehicle_lon': 0,
+                        'vehicle_heading': 0,
+                        'data_source': DataSource.GTFS_STATIC.value
+                    }
+                    for dep in departures
+                ],
+                'data_source': DataSource.GTFS_STATIC.value
+            })
+        
+        logger.info(f"📋 GTFS: scheduled departures for {len(all_transit_data)} stops near ({lat}, {lon})")
+        return all_transit_data
 
 class ThirdPartyAPIClient:
     """Third-party transit API clients"""
@@ -185,6 +257,9 @@ class UnifiedTTCService:
             logger.warning(f"⚠️ NextBus transit service not available: {e}")
             self.nextbus_service = None
         
+        # No Google Places stop finder is wired up; find_nearby_stations uses the station table
+        self.dynamic_service = None
+        
         # Station coordinates (fallback for station finding)
         self.station_coordinates = {
             "union_station": (43.6452, -79.3806),
@@ -198,6 +273,8 @@ class UnifiedTTCService:
             "wellesley_station": (43.6656, -79.3846),
             "rosedale_station": (43.6719, -79.3862),
         }
+        self._station_lats = np.array([coords[0] for coords in self.station_coordinates.values()], dtype=np.float64)
+        self._station_lons = np.array([coords[1] for coords in self.station_coordinates.values()], dtype=np.float64)
     
     def find_nearby_stations(self, lat: float, lon: float, max_stations: int = 5) -> List[Tuple[str, float, float, float]]:
         """Find nearby stations using multiple methods"""
@@ -216,14 +293,14 @@ class UnifiedTTCService:
             except Exception as e:
                 logger.warning(f"⚠️ Dynamic service failed, falling back to static: {e}")
         
-        # Method 2: Use station coordinates (fallback)
-        for station_id, (station_lat, station_lon) in self.station_coordinates.items():
-            distance = self._calculate_distance(lat, lon, station_lat, station_lon)
-            stations.append((station_id, station_lat, station_lon, distance))
+        # Method 2: Use station coordinates (fallback), one vectorized distance pass
+        station_ids = list(self.station_coordinates)
+        distances = calculate_distances(lat, lon, self._station_lats, self._station_lons)
+        for i in np.argsort(distances, kind="stable")[:max_stations]:
+            station_lat, station_lon = self.station_coordinates[station_ids[i]]
+            stations.append((station_ids[i], station_lat, station_lon, float(distances[i])))
         
-        # Sort by distance and return top N
-        stations.sort(key=lambda x: x[3])
-        return stations[:max_stations]
+        return stations
     
     def get_transit_data_for_location(self, lat: float, lon: float) -> List[Dict]:
         """Get comprehensive transit data for a location using NextBus API discovery"""
@@ -239,7 +316,19 @@ class UnifiedTTCService:
             except Exception as e:
                 logger.warning(f"⚠️ NextBus service failed: {e}")
         
-        # Fallback to static stations if NextBus service fails or returns no data
+        # Realtime feed down: during an outage NextBus still lists the nearby stops from the
+        # routes cache, just without predictions, so fall back whenever no stop has any
+        if not any(stop.get('predictions') for stop in all_transit_data):
+            try:
+                scheduled = self.gtfs.get_transit_data_for_location(lat, lon, radius_m=500)
+            except Exception as e:
+                logger.warning(f"⚠️ GTFS fallback failed: {e}")
+                scheduled = []
+            if any(stop['predictions'] for stop in scheduled) or not all_transit_data:
+                logger.info(f"📋 No live predictions near ({lat}, {lon}), using scheduled departures")
+                all_transit_data = scheduled
+        
+        # Fallback to static stations if neither source has data
         if not all_transit_data:
             logger.info("🔄 Falling back to static station lookup")
             stations = self.find_nearby_stations(lat, lon, max_stations=5)
@@ -256,7 +345,8 @@ class UnifiedTTCService:
                             'lon': station_lon,
                             'distance': distance,
                             'route_name': data.route_name,
-                            'arrival_time': data.arrival_time,
+                            'closest_arrival': data.closest_arrival,
+                            'next_arrivals': data.next_arrivals,
                             'data_source': data.data_source.value,
                             'last_updated': data.last_updated
                         })
@@ -330,10 +420,36 @@ class UnifiedTTCService:
     def _try_gtfs_data(self, station_id: str) -> Optional[List[TransitData]]:
         """Try to get data from GTFS static feeds"""
         try:
-            # This would parse GTFS data
-            # For now, return None to trigger next fallback
-            logger.info(f"🔄 GTFS data not implemented yet for {station_id}")
-            return None
+            if not self.gtfs.available():
+                return None
+            
+            # Station names map to coordinates; use the closest GTFS stop to them
+            coords = self.station_coordinates.get(station_id)
+            stops = self.gtfs.get_stops_nearby(*coords, radius=0.3, limit=1) if coords else []
+            stop_id = stops[0]["stop_id"] if stops else station_id
+            
+            # Group the stop's departures by route, soonest first
+            by_route: Dict[str, List[ScheduledDeparture]] = {}
+            for dep in self.gtfs.get_scheduled_departures(stop_id, limit=Settings.MAX_ARRIVALS * 4):
+                by_route.setdefault(dep.route_short_name, []).append(dep)
+            
+            now = time.time()
+            transit_data = []
+            for route_name, departures in by_route.items():
+                arrivals = [{"minutes": dep.minutes_away} for dep in departures[:Settings.MAX_ARRIVALS]]
+                transit_data.append(TransitData(
+                    route_name=route_name,
+                    route_type=ROUTE_TYPE_NAMES.get(departures[0].route_type, "Bus"),
+                    station_name=station_id.replace('_', ' ').title(),
+                    closest_arrival=arrivals[0]["minutes"],
+                    next_arrivals=arrivals,
+                    data_source=DataSource.GTFS_STATIC,
+                    last_updated=now
+                ))
+            
+            if transit_data:
+                logger.info(f"📋 GTFS data: {len(transit_data)} scheduled routes for {station_id}")
+            return transit_data or None
             
         except Exception as e:
             logger.error(f"❌ GTFS data failed for {station_id}: {e}")
@@ -376,21 +492,4 @@ class UnifiedTTCService:
         
         logger.info(f"🔄 Mock data: {len(transit_data)} routes for {station_id}")
         return transit_data
-    
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate distance between two coordinates using Haversine formula"""
-        import math
-        
-        R = 6371  # Earth's radius in kilometers
-        
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-             math.sin(dlon/2) * math.sin(dlon/2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        return distance
+
@@ -0,0 +1,191 @@
+"""
+Shared NextBus vehicle-location poller
+Keeps one in-memory vehicle table per process, updated incrementally with t=lastTime
+"""
+
+import threading
+import time
+import structlog
+from typing import Dict, Optional
+from src.config.settings import Settings
+from src.utils.http_client import transport
+from src.utils.metrics import registry
+
+logger = structlog.get_logger("maple_mover.vehicles")
+
+class VehicleLocationPoller:
+    """Background poller for the citywide vehicleLocations feed
+
+    The first poll asks for t=0 (full feed); later polls pass the feed's
+    lastTime back as t= so only vehicles that reported since then are
+    returned. Vehicles that have not reported for max_age seconds are
+    dropped from the table.
+    """
+
+    def __init__(self, api_url: str, agency: str, interval: float = None, max_age: float = None, timeout: int = 15):
+        self.api_url = api_url
+        self.agency = agency
+        self.interval = interval if interval is not None else Settings.VEHICLE_POLL_INTERVAL
+        self.max_age = max_age if max_age is not None else Settings.VEHICLE_MAX_AGE
+        self.timeout = timeout
+
+        self._vehicles: Dict[str, Dict] = {}      # vehicle_id -> vehicle data
+        self._reported_at: Dict[str, float] = {}  # vehicle_id -> epoch seconds of last report
+        self._last_time = 0                       # feed lastTime (ms), sent as next t=
+        self._last_success = 0.0
+        self._first_poll_claimed = False
+        self._first_poll = threading.Event()      # set once the initial full feed has been tried
+
+        self._lock = threading.Lock()
+        self._poll_lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the background polling thread (no-op if already running)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="vehicle-poller", daemon=True)
+            self._thread.start()
+        logger.info(f"🚌 Vehicle poller started (every {self.interval}s)")
+
+    def stop(self):
+        """Stop the background polling thread"""
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.poll_once()
+            self._stop_event.wait(self.interval)
+
+    def poll_once(self, timeout: Optional[float] = None) -> bool:
+        """Fetch one (incremental) update and apply it to the vehicle table"""
+        with self._poll_lock:
+            since = self.next_since()
+
+            try:
+                url = f"{self.api_url}?command=vehicleLocations&a={self.agency}&t={since}"
+                response = transport.get(url, timeout=timeout if timeout is not None else self.timeout)
+                response.raise_for_status()
+                data = response.json()
+            except Exception as e:
+                logger.error(f"❌ Failed to poll vehicle locations: {e}")
+                return False
+
+            self.apply_feed(data, since)
+            return True
+
+    def next_since(self) -> int:
+        """t= value for the next poll (0 = full feed)"""
+        # After a long outage the incremental window is meaningless, start over
+        return self._last_time if time.time() - self._last_success <= self.max_age else 0
+
+    def apply_feed(self, data: Dict, since: int) -> None:
+        """Merge one vehicleLocations response (requested with t=since) into the table"""
+        now = time.time()
+        vehicles = data.get('vehicle', [])
+        if isinstance(vehicles, dict):
+            vehicles = [vehicles]
+
+        with self._lock:
+            if since == 0:
+                self._vehicles = {}
+                self._reported_at = {}
+
+            for vehicle in vehicles:
+                vehicle_id = vehicle.get('id')
+                if not vehicle_id:
+                    continue
+                # Replace (never mutate) entries so readers holding a snapshot stay consistent
+                self._vehicles[vehicle_id] = {
+                    'lat': vehicle.get('lat'),
+                    'lon': vehicle.get('lon'),
+                    'heading': vehicle.get('heading'),
+                    'speedKmHr': vehicle.get('speedKmHr'),
+                    'routeTag': vehicle.get('routeTag'),  # Store route for filtering
+                    'dirTag': vehicle.get('dirTag')  # Store direction
+                }
+                secs_since_report = float(vehicle.get('secsSinceReport', 0) or 0)
+                self._reported_at[vehicle_id] = now - secs_since_report
+
+            expired = [vid for vid, reported in self._reported_at.items() if now - reported > self.max_age]
+            for vehicle_id in expired:
+                self._vehicles.pop(vehicle_id, None)
+                del self._reported_at[vehicle_id]
+
+            last_time = data.get('lastTime', {})
+            if isinstance(last_time, dict) and last_time.get('time'):
+                self._last_time = int(last_time['time'])
+            self._last_success = now
+
+        logger.debug(f"🚌 Vehicle poll t={since}: {len(vehicles)} updated, {len(expired)} expired, {len(self._vehicles)} tracked")
+
+    def has_data(self) -> bool:
+        """True once at least one poll has succeeded"""
+        return bool(self._last_success)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Copy of the vehicle table as it is now (never triggers a poll)"""
+        with self._lock:
+            return dict(self._vehicles)
+
+    def claim_first_poll(self) -> bool:
+        """True for exactly one caller: the one that fetches the initial full feed"""
+        with self._lock:
+            if self._first_poll_claimed:
+                return False
+            self._first_poll_claimed = True
+            return True
+
+    def finish_first_poll(self) -> None:
+        """Mark the initial feed as tried (whether or not it succeeded); waiters stop waiting"""
+        self._first_poll.set()
+
+    def wait_for_first_poll(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the initial feed to be tried, at most timeout (VEHICLE_FIRST_POLL_TIMEOUT) seconds"""
+        return self._first_poll.wait(timeout if timeout is not None else Settings.VEHICLE_FIRST_POLL_TIMEOUT)
+
+    def get_vehicles(self) -> Dict[str, Dict]:
+        """Snapshot of the vehicle table (vehicle_id -> vehicle data)
+
+        Only the initial full feed is waited for, once per process and at
+        most VEHICLE_FIRST_POLL_TIMEOUT seconds. If it fails, callers get
+        the (empty) table at once and the background thread keeps retrying.
+        """
+        if not self._first_poll.is_set():
+            if self.claim_first_poll():
+                try:
+                    self.poll_once(timeout=Settings.VEHICLE_FIRST_POLL_TIMEOUT)
+                finally:
+                    self.finish_first_poll()
+            else:
+                self.wait_for_first_poll()
+
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+        return self.snapshot()
+
+    def age(self) -> float:
+        """Seconds since the last successful poll (inf if never polled)"""
+        return time.time() - self._last_success if self._last_success else float('inf')
+
+# Process-wide poller, shared by every session and service instance
+_poller: Optional[VehicleLocationPoller] = None
+_poller_lock = threading.Lock()
+
+def get_vehicle_poller(api_url: str, agency: str) -> VehicleLocationPoller:
+    """Return the shared poller, creating it on first use"""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = VehicleLocationPoller(api_url, agency)
+        return _poller
+
+registry.gauge(
+    "maple_mover_vehicle_feed_age_seconds", "Seconds since the last successful vehicleLocations poll"
+).set_function(lambda: _poller.age() if _poller is not None and _poller.has_data() else None)
+registry.gauge(
+    "maple_mover_vehicles_tracked", "Vehicles in the shared vehicle table"
+).set_function(lambda: len(_poller.snapshot()) if _poller is not None else None)
@@ -16,10 +16,79 @@ class Settings:
     API_RATE_LIMIT = 0.1  # seconds between requests
     REQUEST_TIMEOUT = 10  # seconds
 
+    # NextBus feed (point at a local stub for offline benchmarks)
+    NEXTBUS_API_URL = os.getenv("NEXTBUS_API_URL", "https://retro.umoiq.com/service/publicJSONFeed")
+
+    # Shared HTTP transport (keep-alive pool per upstream host)
+    HTTP_CONNECT_TIMEOUT = 3.05   # seconds to establish TCP/TLS
+    HTTP_READ_TIMEOUT = 10        # seconds to wait for a response when the caller gives none
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))   # kept-alive connections per host
+    HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "16"))   # concurrent requests per host
+
+    # NextBus route discovery (cold routes-cache rebuild)
+    ROUTE_DISCOVERY_WORKERS = int(os.getenv("ROUTE_DISCOVERY_WORKERS", "16"))  # 1 = serial
+    ROUTE_DISCOVERY_RETRIES = 3      # retries per routeConfig request
+    ROUTE_DISCOVERY_BACKOFF = 0.5    # seconds, doubled on each retry
+
+    # Incremental routes-cache refresh
+    ROUTE_REFRESH_AFTER_DAYS = int(os.getenv("ROUTE_REFRESH_AFTER_DAYS", "1"))  # refresh in background once the cache is this old
+    ROUTE_REFRESH_SLICE = 25         # existing routes re-fetched per refresh (new routes always are)
+
+    # NextBus predictionsForMultiStops batching
+    NEXTBUS_MAX_URL_LENGTH = 2000         # split batched requests above this URL length
+    NEXTBUS_MAX_STOPS_PER_REQUEST = 150   # route|stop pairs per request
+
+    # Stale-while-revalidate prediction cache (per stop)
+    PREDICTION_FRESH_SECONDS = int(os.getenv("PREDICTION_FRESH_SECONDS", "15"))  # served as is
+    PREDICTION_STALE_SECONDS = int(os.getenv("PREDICTION_STALE_SECONDS", "90"))  # served time-adjusted, refreshed in background
+    PREDICTION_CACHE_MAX_STOPS = 5000
+
+    # Shared vehicleLocations poller
+    VEHICLE_POLL_INTERVAL = 10   # seconds between incremental t= polls
+    VEHICLE_MAX_AGE = 120        # drop vehicles that haven't reported for this long
+    VEHICLE_FIRST_POLL_TIMEOUT = 5  # seconds searches wait for the initial full feed, once per process
+
+    # Hedged geocoding (Google and Nominatim address variants raced under one deadline)
+    GEOCODE_DEADLINE = float(os.getenv("GEOCODE_DEADLINE", "6"))   # seconds for the whole lookup
+    GEOCODE_HEDGE_DELAY = 0.4      # seconds before the next attempt starts alongside a slow one
+    GEOCODE_MAX_PARALLEL = 3       # attempts in flight at once
+    NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))  # usage policy: at most 1 request/second
+
+    # Persistent geocode store (SQLite, shared by the app processes on one host)
+    GEOCODE_STORE_ENABLED = os.getenv("GEOCODE_STORE_ENABLED", "true").lower() == "true"
+    GEOCODE_STORE_PATH = os.getenv("GEOCODE_STORE_PATH", "cache/geocode.sqlite3")
+    GEOCODE_STORE_TTL_DAYS = float(os.getenv("GEOCODE_STORE_TTL_DAYS", "30"))
+    GEOCODE_STORE_MAX_ENTRIES = int(os.getenv("GEOCODE_STORE_MAX_ENTRIES", "200000"))   # least recently used dropped beyond this
+
+    # Search-box autocomplete
+    AUTOCOMPLETE_SUGGESTIONS = 5
+    AUTOCOMPLETE_MAX_ADDRESSES = int(os.getenv("AUTOCOMPLETE_MAX_ADDRESSES", "5000"))   # most recent from the geocode store
+
+    # Offline reverse geocoding (nearest stop intersection or address point; Nominatim refines in the background)
+    REVERSE_GEOCODE_MAX_DISTANCE_M = float(os.getenv("REVERSE_GEOCODE_MAX_DISTANCE_M", "400"))   # farther from any stop: no local label
+    ADDRESS_POINTS_PATH = os.getenv("ADDRESS_POINTS_PATH", "data/address_points.csv")            # optional CSV, used if present
+    ADDRESS_POINT_MAX_DISTANCE_M = 50
+    REVERSE_GEOCODE_REFINE = os.getenv("REVERSE_GEOCODE_REFINE", "true").lower() == "true"
+    REVERSE_GEOCODE_REFINE_MAX_PENDING = int(os.getenv("REVERSE_GEOCODE_REFINE_MAX_PENDING", "32"))  # queued refinements beyond this are skipped
+    REVERSE_CACHE_RADIUS_M = float(os.getenv("REVERSE_CACHE_RADIUS_M", "25"))       # reuse an address resolved this close
+    REVERSE_CACHE_MAX_POINTS = int(os.getenv("REVERSE_CACHE_MAX_POINTS", "20000"))  # least recently used dropped beyond this
+
+    # GTFS static schedule (scheduled fallback when the realtime feed is down)
+    GTFS_ZIP_PATH = os.getenv("GTFS_ZIP_PATH", "data/ttc_gtfs.zip")                  # downloaded feed
+    GTFS_SCHEDULE_CACHE = os.getenv("GTFS_SCHEDULE_CACHE", "cache/gtfs_schedule.npz")  # indexed tables built from it
+    GTFS_SCHEDULE_CHECK_INTERVAL = int(os.getenv("GTFS_SCHEDULE_CHECK_INTERVAL", "60"))  # seconds between looks for new tables
+
+    # Prometheus-style metrics endpoint (separate port from Streamlit)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # local scrapes only; set 0.0.0.0 to serve other hosts
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
     # Application Settings
     MAX_STATIONS = 3      # reduced for faster responses
     MAX_ARRIVALS = 3
     CACHE_TTL = 300       # 5-minute caching for geocoding + TTC data
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))             # LRU-evict above this
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # approximate memory cap
 
     # Default Location (Downtown Toronto)
     DEFAULT_LAT = 43.6532
@@ -0,0 +1,179 @@
+"""
+Search-box autocomplete
+In-memory prefix and trigram index over stop names, intersections, landmarks and previously geocoded addresses
+"""
+
+import bisect
+import heapq
+import math
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+import structlog
+from src.geocoding.gazetteer import Gazetteer, search_tokens
+
+logger = structlog.get_logger("maple_mover.geocoding")
+
+# Kind bonus when ranking: landmarks and intersections are what people mostly type
+KIND_BONUS = {"landmark": 1.0, "intersection": 0.5, "stop": 0.5, "address": 0.0}
+# Words scanned for a short prefix before giving up on completeness
+MAX_PREFIX_WORDS = 400
+# Spelling corrections tried for a word that matches nothing
+MAX_CORRECTIONS = 3
+MIN_SIMILARITY = 0.3
+
+@dataclass
+class Suggestion:
+    label: str
+    lat: float
+    lon: float
+    kind: str      # "landmark" / "intersection" / "stop" / "address"
+    score: float = 0.0
+
+@dataclass
+class _Entry:
+    label: str
+    lat: float
+    lon: float
+    kind: str
+    rank: float            # kind bonus plus popularity, independent of the query
+    words: Tuple[str, ...] # label tokens first, then alias tokens
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class AutocompleteIndex:
+    """Top-k place suggestions for a partly typed query
+
+    Entries are indexed by word. Each typed token is expanded to the
+    indexed words it could mean: the words starting with it (two
+    bisects into a sorted word list, a flattened trie), or, if there are
+    none, the closest words by trigram similarity, which absorbs typos
+    ("spadna colege"). Candidates come from the rarest token's postings
+    and must match every other token. Postings are kept best-first, so
+    a one-word query only looks at the top k entries of each word.
+    Tokens come from gazetteer.search_tokens, so street types,
+    directions and "at" / "and" neither help nor hurt a match.
+    """
+
+    def __init__(self):
+        self._entries: List[_Entry] = []
+        self._by_key: Dict[str, int] = {}
+        self._words: List[str] = []                                    # sorted, distinct
+        self._postings: Dict[str, List[Tuple[float, int]]] = defaultdict(list)  # (-rank, entry), best first
+        self._word_trigrams: Dict[str, List[str]] = defaultdict(list)
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_gazetteer(cls, gazetteer: Gazetteer) -> "AutocompleteIndex":
+        index = cls()
+        for hit, stops, aliases in gazetteer.entries():
+            index.add(hit.name, hit.lat, hit.lon, hit.kind, weight=stops, aliases=aliases)
+        logger.info(f"🔎 Autocomplete index built: {len(index)} places, {len(index._words)} words")
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, label: str, lat: float, lon: float, kind: str, weight: float = 1, aliases: Tuple[str, ...] = ()) -> bool:
+        """Index a place (False if a place with the same search key is already indexed)"""
+        tokens = search_tokens(label)
+        key = " ".join(tokens)
+        if not key:
+            return False
+        words = tuple(dict.fromkeys(tokens + [t for alias in aliases for t in search_tokens(alias)]))
+        rank = KIND_BONUS.get(kind, 0.0) + 0.5 * math.log1p(weight)
+        with self._lock:
+            if key in self._by_key:
+                return False
+            entry_id = len(self._entries)
+            self._entries.append(_Entry(label, lat, lon, kind, rank, words))
+            self._by_key[key] = entry_id
+            for word in words:
+                postings = self._postings[word]
+                if not postings:
+                    bisect.insort(self._words, word)
+                    for gram in _trigrams(word):
+                        self._word_trigrams[gram].append(word)
+                # A one-word query that matches an entry's first word gets the starts-with bonus
+                bisect.insort(postings, (-(rank + (word == words[0])), entry_id))
+        return True
+
+    def addresses(self) -> List[Tuple[str, float, float]]:
+        """(label, lat, lon) of every geocoded address added to the index"""
+        with self._lock:
+            return [(entry.label, entry.lat, entry.lon) for entry in self._entries if entry.kind == "address"]
+
+    def suggest(self, query: str, k: int = 5) -> List[Suggestion]:
+        """Best k places for a query; the last token may be partly typed"""
+        tokens = search_tokens(query or "")
+        if not tokens or k <= 0:
+            return []
+
+        with self._lock:
+            matches = [self._expand(token, partial=i == len(tokens) - 1) for i, token in enumerate(tokens)]
+            if not all(matches):
+                return []
+            scored = self._single(matches[0], k) if len(matches) == 1 else self._multiple(matches)
+            best = heapq.nsmallest(k, scored.items(), key=lambda item: (-item[1], len(self._entries[item[0]].label)))
+            return [
+                Suggestion(entry.label, entry.lat, entry.lon, entry.kind, round(score, 3))
+                for entry, score in ((self._entries[entry_id], score) for entry_id, score in best)
+            ]
+
+    def _expand(self, token: str, partial: bool) -> Dict[str, float]:
+        """Indexed words a typed token may stand for, with their similarity to it"""
+        if not partial and token in self._postings:
+            return {token: 1.0}
+        start = bisect.bisect_left(self._words, token)
+        words = {}
+        for word in self._words[start:start + MAX_PREFIX_WORDS]:
+            if not word.startswith(token):
+                break
+            words[word] = 1.0
+        return words or self._corrections(token)
+
+    def _corrections(self, token: str) -> Dict[str, float]:
+        """Closest indexed words by trigram Jaccard similarity"""
+        grams = _trigrams(token)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for word in self._word_trigrams.get(gram, ()):
+                shared[word] += 1
+        similar = [(count / (len(grams) + len(word) + 2 - count), word) for word, count in shared.items()]
+        return {word: similarity for similarity, word in heapq.nlargest(MAX_CORRECTIONS, similar)
+                if similarity >= MIN_SIMILARITY}
+
+    def _single(self, words: Dict[str, float], k: int) -> Dict[int, float]:
+        """One token: the top k postings of each matching word are enough"""
+        scored: Dict[int, float] = {}
+        for word, similarity in words.items():
+            for neg_rank, entry_id in self._postings[word][:k]:
+                score = similarity - neg_rank
+                if score > scored.get(entry_id, -math.inf):
+                    scored[entry_id] = score
+        return scored
+
+    def _multiple(self, matches: List[Dict[str, float]]) -> Dict[int, float]:
+        """Several tokens: entries from the rarest token's words that also match every other token"""
+        rarest = min(range(len(matches)), key=lambda i: sum(len(self._postings[w]) for w in matches[i]))
+        candidates: Dict[int, float] = {}
+        for word, similarity in matches[rarest].items():
+            for _, entry_id in self._postings[word]:
+                candidates[entry_id] = max(similarity, candidates.get(entry_id, 0.0))
+
+        scored: Dict[int, float] = {}
+        for entry_id, similarity in candidates.items():
+            entry = self._entries[entry_id]
+            total = 0.0
+            for i, words in enumerate(matches):
+                best = similarity if i == rarest else max((words.get(w, 0.0) for w in entry.words), default=0.0)
+                if not best:
+                    break
+                total += best
+            else:
+                starts = entry.words[0] in matches[0]
+                scored[entry_id] = total / len(matches) + entry.rank + starts
+        return scored
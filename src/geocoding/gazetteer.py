@@ -0,0 +1,199 @@
+"""
+Offline gazetteer
+Resolves stop intersections ("Spadina / College") and well-known landmarks from memory, before any network geocoder
+"""
+
+import re
+import statistics
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger("maple_mover.geocoding")
+
+# Landmarks people search for by name (the ones _enhance_query_for_toronto knows about)
+LANDMARKS: Dict[str, Tuple[float, float, Tuple[str, ...]]] = {
+    "Union Station": (43.6453, -79.3806, ()),
+    "CN Tower": (43.6426, -79.3871, ()),
+    "Eaton Centre": (43.6544, -79.3807, ("toronto eaton centre", "cf toronto eaton centre")),
+    "Royal Ontario Museum": (43.6677, -79.3948, ("rom",)),
+    "Casa Loma": (43.6780, -79.4094, ()),
+    "High Park": (43.6465, -79.4637, ()),
+    "Toronto Pearson Airport": (43.6777, -79.6248, ("pearson airport", "pearson", "toronto airport")),
+    "Yorkdale Shopping Centre": (43.7255, -79.4522, ("yorkdale", "yorkdale mall")),
+    "Scarborough Town Centre": (43.7756, -79.2578, ()),
+    "Yonge-Dundas Square": (43.6561, -79.3802, ("dundas square", "sankofa square")),
+    "Nathan Phillips Square": (43.6525, -79.3839, ()),
+    "Toronto City Hall": (43.6534, -79.3841, ("city hall",)),
+}
+
+# Dropped from street names (not from the start: "St Clair" is Saint Clair)
+STREET_TYPES = frozenset({
+    "st", "street", "ave", "av", "avenue", "rd", "road", "blvd", "boulevard", "dr", "drive",
+    "cres", "crescent", "crt", "ct", "court", "pl", "place", "pkwy", "parkway", "ln", "lane",
+    "hwy", "highway", "sq", "square", "terr", "terrace", "gdns", "gardens", "cir", "circle",
+})
+DIRECTIONS = frozenset({"e", "east", "w", "west", "n", "north", "s", "south"})
+ABBREVIATIONS = {"mt": "mount", "stn": "station", "ctr": "centre", "center": "centre", "ste": "sainte"}
+# Trailing place context that says nothing about the location within the city
+CONTEXT = frozenset({"toronto", "on", "ont", "ontario", "canada", "ca"})
+
+_CONNECTORS = frozenset({"at", "and"})
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PARENTHESES = re.compile(r"\([^)]*\)")
+_SIDE = re.compile(r"\b(?:(?:north|south|east|west)\s+side|far\s*side|near\s*side)\b", re.IGNORECASE)
+_STOP_AT = re.compile(r"\s+at\s+", re.IGNORECASE)
+_QUERY_SEPARATOR = re.compile(r"\s*(?:/|&|@|\+|\band\b|\bat\b)\s*", re.IGNORECASE)
+_POSTAL_CODE = re.compile(r"^[a-z]\d[a-z]\s*\d[a-z]\d$")
+
+def _tokens(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKC", text).casefold().replace("'", "").replace("’", "")
+    return [ABBREVIATIONS.get(token, token) for token in _TOKEN.findall(text)]
+
+def normalize_name(text: str) -> str:
+    """Place name without case, punctuation or trailing city context ("Union Station, Toronto" -> "union station")"""
+    tokens = _tokens(text)
+    while len(tokens) > 1 and tokens[-1] in CONTEXT:
+        tokens.pop()
+    return " ".join(tokens)
+
+def normalize_street(text: str) -> str:
+    """Core of a street name, without type or direction ("King St W" / "king street west" -> "king")"""
+    tokens = _tokens(text)
+    if tokens and tokens[0] == "st":
+        tokens[0] = "saint"
+    core = [token for i, token in enumerate(tokens) if i == 0 or (token not in STREET_TYPES and token not in DIRECTIONS)]
+    return " ".join(core)
+
+def search_tokens(text: str) -> List[str]:
+    """Words that identify a place, for matching typed queries
+
+    Like normalize_street applied to a whole query: street types,
+    directions, "at"/"and" and trailing city context are dropped.
+    """
+    tokens = _tokens(text)
+    while len(tokens) > 1 and tokens[-1] in CONTEXT:
+        tokens.pop()
+    if tokens and tokens[0] == "st":
+        tokens[0] = "saint"
+    return [
+        token for i, token in enumerate(tokens)
+        if token not in _CONNECTORS and (i == 0 or (token not in STREET_TYPES and token not in DIRECTIONS))
+    ]
+
+@dataclass
+class GazetteerHit:
+    lat: float
+    lon: float
+    name: str
+    kind: str   # "landmark" / "intersection" / "stop"
+
+class Gazetteer:
+    """In-memory name -> coordinates index
+
+    Built from the landmark table plus TTC stop titles: "Spadina Ave At
+    College St" indexes the unordered street pair {spadina, college},
+    and titles without "At" ("Spadina Station") index the name itself.
+    Every stop sharing a key contributes its position and the median is
+    returned, which lands in the middle of an intersection's corner stops.
+    """
+
+    def __init__(self):
+        self._names: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+        self._name_titles: Dict[str, str] = {}
+        self._intersections: Dict[FrozenSet[str], List[Tuple[float, float]]] = defaultdict(list)
+        self._intersection_titles: Dict[FrozenSet[str], str] = {}
+        self._landmarks: Dict[str, GazetteerHit] = {}
+        for name, (lat, lon, aliases) in LANDMARKS.items():
+            self.add_landmark(name, lat, lon, aliases)
+
+    @classmethod
+    def from_stops(cls, stops: Iterable) -> "Gazetteer":
+        """Gazetteer over TransitStop-like objects (title, lat, lon) plus the landmarks"""
+        gazetteer = cls()
+        count = 0
+        for stop in stops:
+            gazetteer.add_stop(stop.title, stop.lat, stop.lon)
+            count += 1
+        logger.info(f"📖 Gazetteer built from {count} stops: {len(gazetteer._intersections)} intersections, "
+                    f"{len(gazetteer._names)} named stops, {len(gazetteer._landmarks)} landmark names")
+        return gazetteer
+
+    def add_landmark(self, name: str, lat: float, lon: float, aliases: Iterable[str] = ()) -> None:
+        hit = GazetteerHit(lat, lon, name, "landmark")
+        for alias in (name, *aliases):
+            self._landmarks[normalize_name(alias)] = hit
+
+    def add_stop(self, title: str, lat: float, lon: float) -> None:
+        cleaned = _SIDE.sub("", _PARENTHESES.sub("", title or "")).strip(" -,")
+        parts = _STOP_AT.split(cleaned)
+        if len(parts) == 2:
+            key = frozenset((normalize_street(parts[0]), normalize_street(parts[1])))
+            if len(key) == 2 and all(key):
+                self._intersections[key].append((lat, lon))
+                self._intersection_titles.setdefault(key, f"{parts[0].strip()} & {parts[1].strip()}")
+            return
+        name = normalize_name(cleaned)
+        if name:
+            self._names[name].append((lat, lon))
+            self._name_titles.setdefault(name, cleaned)
+
+    def resolve(self, query: str) -> Optional[GazetteerHit]:
+        """Coordinates for a landmark, stop name or "Street / Street" query (None if unknown)"""
+        if not query:
+            return None
+        segments = [segment.strip() for segment in query.split(",")]
+        # Anything after a comma must be city context ("..., Toronto, ON M5V 1J1")
+        if any(not self._is_context(segment) for segment in segments[1:]):
+            return None
+        text = segments[0]
+        if not text or text[0].isdigit():
+            return None  # Street addresses belong to the real geocoders
+
+        name = normalize_name(text)
+        landmark = self._landmarks.get(name)
+        if landmark:
+            return landmark
+
+        parts = _QUERY_SEPARATOR.split(text)
+        if len(parts) == 2:
+            key = frozenset((normalize_street(parts[0]), normalize_street(parts[1])))
+            points = self._intersections.get(key)
+            if points:
+                return self._hit(points, self._intersection_titles[key], "intersection")
+            return None
+
+        points = self._names.get(name)
+        if points:
+            return self._hit(points, self._name_titles[name], "stop")
+        return None
+
+    def entries(self) -> Iterator[Tuple[GazetteerHit, int, Tuple[str, ...]]]:
+        """Every place the gazetteer knows: (hit, number of stops behind it, aliases)"""
+        aliases: Dict[str, List[str]] = defaultdict(list)
+        for alias, hit in self._landmarks.items():
+            if alias != normalize_name(hit.name):
+                aliases[hit.name].append(alias)
+        seen = set()
+        for hit in self._landmarks.values():
+            if hit.name not in seen:
+                seen.add(hit.name)
+                yield hit, 1, tuple(aliases[hit.name])
+        for key, points in self._intersections.items():
+            yield self._hit(points, self._intersection_titles[key], "intersection"), len(points), ()
+        for name, points in self._names.items():
+            yield self._hit(points, self._name_titles[name], "stop"), len(points), ()
+
+    def _is_context(self, segment: str) -> bool:
+        tokens = _tokens(segment)
+        rest = " ".join(token for token in tokens if token not in CONTEXT)
+        return not rest or bool(_POSTAL_CODE.match(rest))
+
+    def _hit(self, points: List[Tuple[float, float]], name: str, kind: str) -> GazetteerHit:
+        return GazetteerHit(statistics.median(p[0] for p in points), statistics.median(p[1] for p in points), name, kind)
+
+    def __len__(self) -> int:
+        return len(self._landmarks) + len(self._intersections) + len(self._names)
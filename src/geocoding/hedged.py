@@ -0,0 +1,130 @@
+"""
+Hedged geocoding
+Races Google and Nominatim address variants under one deadline and keeps the first usable answer
+"""
+
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+import structlog
+from src.utils.rate_limit import RateLimiter
+
+logger = structlog.get_logger("maple_mover.geocoding")
+
+Coords = Tuple[float, float]
+
+@dataclass
+class Attempt:
+    """One way of resolving the address: a provider query for one address variant"""
+    source: str                                      # "google" / "nominatim"
+    query: str
+    fn: Callable[[str, float], Optional[Coords]]     # (query, timeout) -> coords or None
+    limiter: Optional[RateLimiter] = None
+
+@dataclass
+class HedgedResult:
+    coords: Optional[Coords]
+    source: str = ""
+    query: str = ""
+    started: int = 0          # attempts that sent a request
+    elapsed: float = 0.0
+    timed_out: bool = False
+
+class HedgedResolver:
+    """Run geocoding attempts in order, overlapping slow ones
+
+    The first attempt starts at once. The next starts as soon as the
+    previous one misses, or hedge_delay after it started if it is still
+    in flight, with at most max_parallel outstanding; attempts carrying a
+    rate limiter also wait for a free slot. The first answer that
+    passes accept() wins and attempts not yet started are dropped
+    (requests already on the wire finish in the background within the
+    deadline, and their answers are ignored).
+
+    If nothing is accepted, the first answer that was found at all is
+    returned so the caller can still report "outside Toronto" rather
+    than "not found".
+    """
+
+    def __init__(self, accept: Callable[[Coords], bool], deadline: float, hedge_delay: float,
+                 max_parallel: int, request_timeout: float = 10):
+        self.accept = accept
+        self.deadline = deadline
+        self.hedge_delay = hedge_delay
+        self.max_parallel = max(1, max_parallel)
+        self.request_timeout = request_timeout
+
+    def resolve(self, attempts: List[Attempt]) -> HedgedResult:
+        started_at = time.monotonic()
+        end = started_at + self.deadline
+        results: "queue.Queue[Tuple[Attempt, Optional[Coords]]]" = queue.Queue()
+        cancelled = threading.Event()
+        fallback: Optional[Tuple[Attempt, Coords]] = None
+        next_attempt = in_flight = started = 0
+        last_start = started_at
+
+        def run(attempt: Attempt) -> None:
+            coords = None
+            remaining = end - time.monotonic()
+            if not cancelled.is_set() and remaining > 0:
+                try:
+                    coords = attempt.fn(attempt.query, min(self.request_timeout, remaining))
+                except Exception as e:
+                    logger.warning(f"⚠️ Geocoding attempt via {attempt.source} failed for '{attempt.query}': {e}")
+            results.put((attempt, coords))
+
+        def finish(attempt: Optional[Attempt], coords: Optional[Coords], timed_out: bool = False) -> HedgedResult:
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            return HedgedResult(
+                coords=coords,
+                source=attempt.source if attempt else "",
+                query=attempt.query if attempt else "",
+                started=started,
+                elapsed=time.monotonic() - started_at,
+                timed_out=timed_out,
+            )
+
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="geocode")
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                logger.warning(f"⏱️ Geocoding deadline of {self.deadline:.1f}s reached after {started} attempt(s)")
+                return finish(*(fallback or (None, None)), timed_out=True)
+
+            wait = end - now
+            if next_attempt < len(attempts) and in_flight < self.max_parallel:
+                hedge_wait = last_start + self.hedge_delay - now if in_flight else 0.0
+                if hedge_wait <= 0:
+                    attempt = attempts[next_attempt]
+                    slot_wait = attempt.limiter.try_acquire() if attempt.limiter else 0.0
+                    if slot_wait == 0.0:
+                        # Each task gets its own copy so upstream calls count towards the caller's span
+                        executor.submit(contextvars.copy_context().run, run, attempt)
+                        next_attempt += 1
+                        in_flight += 1
+                        started += 1
+                        last_start = now
+                        continue
+                    wait = min(wait, slot_wait)
+                else:
+                    wait = min(wait, hedge_wait)
+            elif in_flight == 0:
+                return finish(*(fallback or (None, None)))
+
+            try:
+                attempt, coords = results.get(timeout=wait)
+            except queue.Empty:
+                continue
+            in_flight -= 1
+            if coords is None:
+                last_start = time.monotonic() - self.hedge_delay  # A miss frees the next attempt right away
+                continue
+            if self.accept(coords):
+                return finish(attempt, coords)
+            if fallback is None:
+                fallback = (attempt, coords)
@@ -0,0 +1,129 @@
+"""
+Offline reverse geocoding
+Labels coordinates with the nearest address point or stop intersection, without a network call
+"""
+
+import csv
+import os
+import threading
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
+import structlog
+from src.config.settings import Settings
+from src.geocoding.gazetteer import Gazetteer
+from src.utils.spatial_index import GridSpatialIndex
+
+logger = structlog.get_logger("maple_mover.geocoding")
+
+# Accepted CSV headers (case-insensitive), first match wins
+ADDRESS_COLUMNS = ("address", "address_full", "full_address")
+NUMBER_COLUMNS = ("address_number", "number", "civic_number")
+STREET_COLUMNS = ("linear_name_full", "street", "street_name")
+LAT_COLUMNS = ("lat", "latitude")
+LON_COLUMNS = ("lon", "lng", "longitude")
+
+@dataclass
+class LocalAddress:
+    label: str
+    lat: float
+    lon: float
+    kind: str          # "address" / "intersection" / "stop"
+    distance_m: float
+
+def _column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    lowered = [h.strip().lower() for h in header]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+def load_address_points(path: str) -> List[Tuple[float, float, str]]:
+    """(lat, lon, address) rows from a CSV with an address (or number + street) and lat/lon columns"""
+    points = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        address, number, street = (_column(header, names) for names in (ADDRESS_COLUMNS, NUMBER_COLUMNS, STREET_COLUMNS))
+        lat, lon = _column(header, LAT_COLUMNS), _column(header, LON_COLUMNS)
+        if lat is None or lon is None or (address is None and (number is None or street is None)):
+            raise ValueError(f"{path}: need address (or number and street) and lat/lon columns, got {header}")
+
+        for row in reader:
+            try:
+                label = row[address] if address is not None else f"{row[number]} {row[street]}"
+                points.append((float(row[lat]), float(row[lon]), label.strip()))
+            except (IndexError, ValueError):
+                continue  # Malformed row
+    return points
+
+class LocalReverseGeocoder:
+    """Nearest-place labels from in-memory grid indexes
+
+    Address points, when a file is configured, label coordinates within
+    ADDRESS_POINT_MAX_DISTANCE_M ("100 Queen St W, Toronto"). Otherwise
+    the nearest stop intersection or named stop from the gazetteer is
+    used ("Spadina Ave & College St, Toronto"), up to
+    REVERSE_GEOCODE_MAX_DISTANCE_M away. Those labels resolve back
+    through the gazetteer, so searching for one needs no network either.
+    Indexes are built on first use.
+    """
+
+    def __init__(self, gazetteer: Gazetteer, address_points_path: Optional[str] = None):
+        self.gazetteer = gazetteer
+        self.address_points_path = address_points_path
+        self._places: Optional[GridSpatialIndex] = None
+        self._addresses: Optional[GridSpatialIndex] = None
+        self._lock = threading.Lock()
+
+    def reverse(self, lat: float, lon: float) -> Optional[LocalAddress]:
+        """Closest known place to the coordinates (None if nothing is close enough)"""
+        places, addresses = self._indexes()
+        if addresses is not None:
+            nearest = addresses.nearest(lat, lon, 1, max_radius_m=Settings.ADDRESS_POINT_MAX_DISTANCE_M)
+            if nearest:
+                distance, point = nearest[0]
+                return replace(point, distance_m=distance)
+
+        nearest = places.nearest(lat, lon, 1, max_radius_m=Settings.REVERSE_GEOCODE_MAX_DISTANCE_M)
+        if not nearest:
+            return None
+        distance, hit = nearest[0]
+        return LocalAddress(f"{hit.name}, Toronto", hit.lat, hit.lon, hit.kind, distance)
+
+    def with_gazetteer(self, gazetteer: Gazetteer) -> "LocalReverseGeocoder":
+        """A geocoder over a rebuilt gazetteer that reuses the address points already loaded"""
+        geocoder = LocalReverseGeocoder(gazetteer, self.address_points_path)
+        with self._lock:
+            if self._places is not None:
+                geocoder._addresses = self._addresses
+                geocoder._places = geocoder._build_places()
+        return geocoder
+
+    def _build_places(self) -> GridSpatialIndex:
+        return GridSpatialIndex.from_points(
+            (hit.lat, hit.lon, hit) for hit, _, _ in self.gazetteer.entries() if hit.kind != "landmark"
+        )
+
+    def _indexes(self) -> Tuple[GridSpatialIndex, Optional[GridSpatialIndex]]:
+        if self._places is None:
+            with self._lock:
+                if self._places is None:
+                    self._addresses = self._load_addresses()
+                    self._places = self._build_places()
+                    logger.info(f"🗺️ Local reverse geocoder ready: {len(self._places)} stop places, "
+                                f"{len(self._addresses) if self._addresses is not None else 0} address points")
+        return self._places, self._addresses
+
+    def _load_addresses(self) -> Optional[GridSpatialIndex]:
+        path = self.address_points_path
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            points = load_address_points(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Address points unavailable, labelling with stop intersections only: {e}")
+            return None
+        return GridSpatialIndex.from_points(
+            ((lat, lon, LocalAddress(f"{label}, Toronto", lat, lon, "address", 0.0)) for lat, lon, label in points),
+            cell_size_m=100.0,
+        )
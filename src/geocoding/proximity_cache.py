@@ -0,0 +1,94 @@
+"""
+Proximity reverse-geocode cache
+Reuses a resolved address for any query within a few metres of it, so GPS jitter still hits
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from src.utils.geo_utils import calculate_distance
+from src.utils.metrics import CACHE_REQUESTS
+from src.utils.spatial_index import KM_PER_DEGREE_LAT
+
+class ProximityCache:
+    """Addresses keyed by location instead of exact coordinates
+
+    A lookup returns the address of the nearest stored point within
+    radius_m. Points are bucketed into cells radius_m on a side
+    (longitude scaled by cos(lat), as in GridSpatialIndex), so a lookup
+    only checks its own cell and the eight around it. Points sit in an
+    OrderedDict in recency order; beyond max_points the least recently
+    used one is evicted. Storing a point within radius_m of an existing
+    one replaces it rather than piling up near-duplicates.
+    """
+
+    def __init__(self, radius_m: float, max_points: int, ref_lat: float = 43.7):
+        self.radius_m = radius_m
+        self.max_points = max_points
+        self.cell_lat = max(radius_m, 1.0) / 1000.0 / KM_PER_DEGREE_LAT
+        self.cell_lon = self.cell_lat / math.cos(math.radians(ref_lat))
+        self._points: "OrderedDict[int, Tuple[float, float, str]]" = OrderedDict()
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def get(self, lat: float, lon: float) -> Optional[str]:
+        """Address of the nearest point within radius_m, or None"""
+        address = None
+        with self._lock:
+            point_id = self._nearest(lat, lon)
+            if point_id is not None:
+                self._points.move_to_end(point_id)
+                address = self._points[point_id][2]
+        CACHE_REQUESTS.inc(cache="reverse_proximity", prefix="reverse_geocode", result="hit" if address else "miss")
+        return address
+
+    def peek(self, lat: float, lon: float) -> Optional[str]:
+        """Like get, but neither counted in the cache metrics nor marked as recently used"""
+        with self._lock:
+            point_id = self._nearest(lat, lon)
+            return self._points[point_id][2] if point_id is not None else None
+
+    def put(self, lat: float, lon: float, address: str) -> None:
+        with self._lock:
+            existing = self._nearest(lat, lon)
+            if existing is not None:
+                self._remove(existing)
+            point_id = self._next_id
+            self._next_id += 1
+            self._points[point_id] = (lat, lon, address)
+            self._cells.setdefault(self._cell_of(lat, lon), set()).add(point_id)
+            while len(self._points) > self.max_points:
+                self._remove(next(iter(self._points)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._points.clear()
+            self._cells.clear()
+
+    def _cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon))
+
+    def _nearest(self, lat: float, lon: float) -> Optional[int]:
+        ci, cj = self._cell_of(lat, lon)
+        best, best_m = None, self.radius_m
+        for i in (ci - 1, ci, ci + 1):
+            for j in (cj - 1, cj, cj + 1):
+                for point_id in self._cells.get((i, j), ()):
+                    point_lat, point_lon, _ = self._points[point_id]
+                    distance_m = calculate_distance(lat, lon, point_lat, point_lon) * 1000
+                    if distance_m <= best_m:
+                        best, best_m = point_id, distance_m
+        return best
+
+    def _remove(self, point_id: int) -> None:
+        lat, lon, _ = self._points.pop(point_id)
+        cell = self._cell_of(lat, lon)
+        bucket = self._cells[cell]
+        bucket.discard(point_id)
+        if not bucket:
+            del self._cells[cell]
@@ -1,18 +1,39 @@
 """
 Geocoding service with Google Maps API fallback, Toronto validation, and caching.
 """
-import requests
 import urllib.parse
 import structlog
 import os
-from typing import Optional, Tuple, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, List
+from src.geocoding.autocomplete import AutocompleteIndex, Suggestion
+from src.geocoding.gazetteer import Gazetteer
+from src.geocoding.hedged import Attempt, HedgedResolver
+from src.geocoding.local_reverse import LocalReverseGeocoder
+from src.geocoding.proximity_cache import ProximityCache
+from src.geocoding.store import get_geocode_store, normalize_query
 from src.utils.cache import cache
+from src.utils.geo_utils import calculate_distance
+from src.utils.metrics import CACHE_REQUESTS
+from src.utils.http_client import transport
+from src.utils.rate_limit import RateLimiter
+from src.utils.single_flight import flights
+from src.utils.tracing import current_span, mark_cache_hit, traced
 from src.config.settings import Settings
 
 logger = structlog.get_logger("maple_mover.geocoding")
 
+# Nominatim's usage policy is per application, so every session shares one limiter
+nominatim_limiter = RateLimiter(Settings.NOMINATIM_MIN_INTERVAL)
+# Nominatim reverse lookups that refine a local label after the page has rendered
+_refine_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reverse-geocode")
+# Queued or running refinements (cache key -> coordinates), at most REVERSE_GEOCODE_REFINE_MAX_PENDING
+_refine_pending: Dict[str, Tuple[float, float]] = {}
+_refine_lock = threading.Lock()
+
 class GeocodingService:
-    def __init__(self):
+    def __init__(self, gazetteer: Optional[Gazetteer] = None):
         # More precise Toronto city bounds (excluding all GTA suburbs)
         self.min_lat, self.max_lat = 43.60, 43.80  # Toronto proper latitude range (more restrictive)
         self.min_lon, self.max_lon = -79.60, -79.20  # Toronto proper longitude range (more restrictive)
@@ -21,71 +42,228 @@ class GeocodingService:
         self.google_api_key = Settings.GOOGLE_MAPS_API_KEY
         self.use_google_api = bool(self.google_api_key)
         
+        # Intersections and landmarks resolved in memory (landmarks only unless built from the stops)
+        self.gazetteer = gazetteer if gazetteer is not None else Gazetteer()
+        # Search-box suggestions over the same places, plus addresses geocoded before
+        self.autocomplete = AutocompleteIndex.from_gazetteer(self.gazetteer)
+        self._recent_addresses_loaded = False
+        # Nearest stop intersection (or address point) labels for coordinates, no network needed
+        self.local_reverse = LocalReverseGeocoder(self.gazetteer, Settings.ADDRESS_POINTS_PATH)
+        # Resolved addresses reused for any query within REVERSE_CACHE_RADIUS_M (GPS jitter)
+        self.reverse_cache = ProximityCache(Settings.REVERSE_CACHE_RADIUS_M, Settings.REVERSE_CACHE_MAX_POINTS)
+        self._reverse_points_loaded = False
+        
         if self.use_google_api:
             logger.info("✅ Google Maps API enabled for geocoding")
         else:
             logger.warning("⚠️ Google Maps API key not found. Using OpenStreetMap Nominatim only.")
     
+    def use_gazetteer(self, gazetteer: Gazetteer) -> None:
+        """Swap in a gazetteer rebuilt from refreshed stops, with the suggestions and local labels derived from it
+
+        Geocoded addresses already suggested are carried over; lookups in
+        flight finish on the previous indexes.
+        """
+        autocomplete = AutocompleteIndex.from_gazetteer(gazetteer)
+        for label, lat, lon in self.autocomplete.addresses():
+            autocomplete.add(label, lat, lon, "address")
+        local_reverse = self.local_reverse.with_gazetteer(gazetteer)
+        self.gazetteer, self.autocomplete, self.local_reverse = gazetteer, autocomplete, local_reverse
+
     # -------------------------------------------------------------------------
     # Address → Coordinates
     # -------------------------------------------------------------------------
+    @traced("geocode")
     def geocode_address(self, address: str) -> Optional[Tuple[float, float]]:
         """Convert address to coordinates with Google Maps API and fallback to Nominatim."""
         if not address or not address.strip():
             return None
 
-        # Check cache first
-        cache_key = f"geocode:{address.strip().lower()}"
-        cached_result = cache.get(cache_key)
+        # Intersections and landmarks never need a network geocoder
+        hit = self.gazetteer.resolve(address)
+        CACHE_REQUESTS.inc(cache="gazetteer", prefix="geocode", result="hit" if hit else "miss")
+        if hit:
+            mark_cache_hit(True)
+            span = current_span()
+            if span:
+                span.set(provider="gazetteer")
+            logger.info(f"✅ Geocoded '{address}' offline as {hit.kind} '{hit.name}': ({hit.lat}, {hit.lon})")
+            return hit.lat, hit.lon
+
+        # Check cache first (memory, then the persistent store)
+        cache_key = f"geocode:{normalize_query(address)}"
+        cached_result = self._cached(cache_key)
+        mark_cache_hit(bool(cached_result))
         if cached_result:
             logger.info(f"✅ Geocoded '{address}' from cache: {cached_result}")
             return cached_result
 
-        # Try Google Maps API first (if available)
+        # Concurrent sessions looking up the same address share one lookup
+        return flights.do(cache_key, lambda: self._geocode_uncached(address, cache_key))
+
+    def _geocode_uncached(self, address: str, cache_key: str) -> Optional[Tuple[float, float]]:
+        """Geocode via Google Maps / Nominatim and cache the result."""
+        # A flight that finished just before this one started may have filled the cache
+        cached_result = cache.get(cache_key)
+        if cached_result:
+            return cached_result
+
+        # Google first (if available), then Nominatim address variants, overlapping
+        # slow attempts instead of waiting out each timeout in turn
+        attempts = []
         if self.use_google_api:
-            coords = self._query_google_maps(address.strip())
-            if coords:
-                cache.set(cache_key, coords, ttl=3600)
-                logger.info(f"✅ Geocoded '{address}' to {coords} using Google Maps API")
-                return coords
-
-        # Fallback to Nominatim with address variants
-        address_variants = self._generate_address_variants(address.strip())
-        
-        for variant in address_variants:
-            coords = self._query_nominatim(variant)
-            if coords:
-                # Cache the result for 1 hour (addresses don't change often)
-                cache.set(cache_key, coords, ttl=3600)
-                logger.info(f"✅ Geocoded '{address}' to {coords} using Nominatim variant: {variant}")
-                return coords
-
-        logger.warning(f"❌ No geocoding results for '{address}'")
+            attempts.append(Attempt("google", address.strip(), self._query_google_maps))
+        attempts.extend(
+            Attempt("nominatim", variant, self._query_nominatim, nominatim_limiter)
+            for variant in self._generate_address_variants(address.strip())
+        )
+        result = self._resolver().resolve(attempts)
+
+        span = current_span()
+        if span:
+            span.set(provider=result.source or None, attempts=result.started, timed_out=result.timed_out)
+
+        if result.coords:
+            self._remember(cache_key, result.coords)
+            if self._within_bounds(*result.coords):
+                self.autocomplete.add(address.strip(), *result.coords, "address")
+            logger.info(f"✅ Geocoded '{address}' to {result.coords} using {result.source} "
+                        f"('{result.query}', {result.started} attempt(s), {result.elapsed:.2f}s)")
+            return result.coords
+
+        logger.warning(f"❌ No geocoding results for '{address}' after {result.started} attempt(s)")
         return None
+
+    def _resolver(self) -> HedgedResolver:
+        return HedgedResolver(
+            accept=lambda coords: self._within_bounds(*coords),
+            deadline=Settings.GEOCODE_DEADLINE,
+            hedge_delay=Settings.GEOCODE_HEDGE_DELAY,
+            max_parallel=Settings.GEOCODE_MAX_PARALLEL,
+        )
     
+    # -------------------------------------------------------------------------
+    # Autocomplete
+    # -------------------------------------------------------------------------
+    def suggest(self, query: str, k: Optional[int] = None) -> List[Suggestion]:
+        """Places matching a partly typed query, with coordinates (no network call)"""
+        if not self._recent_addresses_loaded:
+            self._load_recent_addresses()
+        return self.autocomplete.suggest(query, k or Settings.AUTOCOMPLETE_SUGGESTIONS)
+
+    def match_suggestion(self, text: str) -> Optional[Suggestion]:
+        """The suggestion whose label is exactly the submitted text (ignoring case and spacing), if any"""
+        if not text or not text.strip():
+            return None
+        wanted = normalize_query(text)
+        return next((s for s in self.suggest(text) if normalize_query(s.label) == wanted), None)
+
+    def _load_recent_addresses(self) -> None:
+        """Index the addresses in the persistent store (once, on the first suggestion request)"""
+        self._recent_addresses_loaded = True
+        store = get_geocode_store()
+        if not store:
+            return
+        added = 0
+        for key, stored in store.recent("geocode:", limit=Settings.AUTOCOMPLETE_MAX_ADDRESSES):
+            if self._within_bounds(stored.lat, stored.lon):
+                added += self.autocomplete.add(key.partition(":")[2].title(), stored.lat, stored.lon, "address")
+        logger.info(f"🔎 Added {added} previously geocoded addresses to autocomplete")
+
     # -------------------------------------------------------------------------
     # Coordinates → Address
     # -------------------------------------------------------------------------
+    @traced("reverse_geocode")
     def reverse_geocode(self, lat: float, lon: float) -> Optional[str]:
         """Convert coordinates to readable address with caching."""
-        # Check cache first - use 6 decimal places to allow for small GPS variations
-        cache_key = f"reverse_geocode:{lat:.6f},{lon:.6f}"
-        cached_result = cache.get(cache_key)
+        # Check cache first - any address resolved within a few metres is reused
+        cache_key = self._reverse_cache_key(lat, lon)
+        cached_result = self._cached_address(lat, lon)
+        mark_cache_hit(bool(cached_result))
+        if cached_result:
+            logger.info(f"✅ Reverse geocoded ({lat}, {lon}) from cache: {cached_result}")
+            return cached_result
+
+        return flights.do(cache_key, lambda: self._reverse_geocode_uncached(lat, lon, cache_key))
+
+    @traced("reverse_geocode_local")
+    def reverse_geocode_local(self, lat: float, lon: float) -> Optional[str]:
+        """Address for coordinates without waiting on the network
+
+        A cached Nominatim address is returned as is. Otherwise the nearest
+        stop intersection or address point labels the location and, with
+        REVERSE_GEOCODE_REFINE, Nominatim is asked in the background; its
+        answer lands in the cache for cached_reverse_geocode to pick up.
+        """
+        cache_key = self._reverse_cache_key(lat, lon)
+        cached_result = self._cached_address(lat, lon)
+        mark_cache_hit(bool(cached_result))
         if cached_result:
             logger.info(f"✅ Reverse geocoded ({lat}, {lon}) from cache: {cached_result}")
             return cached_result
 
+        if Settings.REVERSE_GEOCODE_REFINE:
+            self._refine_in_background(lat, lon, cache_key)
+        local = self.local_reverse.reverse(lat, lon)
+        if local:
+            logger.info(f"📍 Labelled ({lat}, {lon}) locally as '{local.label}' ({local.kind}, {local.distance_m:.0f} m)")
+            return local.label
+        return None
+
+    def cached_reverse_geocode(self, lat: float, lon: float) -> Optional[str]:
+        """Previously resolved address for coordinates, or None (no network call)"""
+        return self._cached_address(lat, lon)
+
+    def _refine_in_background(self, lat: float, lon: float, cache_key: str) -> bool:
+        """Queue a Nominatim lookup for the coordinates; False if one is already pending nearby or the queue is full
+
+        Reruns of the same page and GPS jitter would otherwise queue the
+        same lookup over and over behind the one-per-second limiter.
+        """
+        with _refine_lock:
+            if cache_key in _refine_pending or any(
+                calculate_distance(lat, lon, pending_lat, pending_lon) * 1000 <= Settings.REVERSE_CACHE_RADIUS_M
+                for pending_lat, pending_lon in _refine_pending.values()
+            ):
+                return False
+            if len(_refine_pending) >= Settings.REVERSE_GEOCODE_REFINE_MAX_PENDING:
+                logger.debug(f"⏭️ Reverse geocode refinement queue full, skipping ({lat}, {lon})")
+                return False
+            _refine_pending[cache_key] = (lat, lon)
+
+        def run():
+            try:
+                # Waits its turn behind forward geocoding rather than skipping the usage policy
+                if nominatim_limiter.acquire(timeout=Settings.GEOCODE_DEADLINE):
+                    flights.do(cache_key, lambda: self._reverse_geocode_uncached(lat, lon, cache_key))
+            finally:
+                with _refine_lock:
+                    _refine_pending.pop(cache_key, None)
+
+        _refine_executor.submit(run)
+        return True
+
+    @staticmethod
+    def _reverse_cache_key(lat: float, lon: float) -> str:
+        return f"reverse_geocode:{lat:.6f},{lon:.6f}"
+
+    def _reverse_geocode_uncached(self, lat: float, lon: float, cache_key: str) -> Optional[str]:
+        """Reverse geocode via Nominatim and cache the result."""
+        # A nearby lookup may have finished while this one waited; the caller already counted its miss
+        cached_result = self.reverse_cache.peek(lat, lon)
+        if cached_result:
+            return cached_result
+
         url = f"https://nominatim.openstreetmap.org/reverse?lat={lat}&lon={lon}&format=json"
         headers = {"User-Agent": "MapleMover/1.0 (Transit Finder)"}
         try:
-            resp = requests.get(url, headers=headers, timeout=10)
+            resp = transport.get(url, headers=headers, timeout=10)
             resp.raise_for_status()
             data = resp.json()
             address = data.get("display_name", None)
             
             if address:
-                # Cache the result for 1 hour
-                cache.set(cache_key, address, ttl=3600)
+                self._remember(cache_key, (lat, lon), address)
                 logger.info(f"✅ Reverse geocoded ({lat}, {lon}) to: {address}")
             
             return address
@@ -93,10 +271,60 @@ class GeocodingService:
             logger.error(f"Reverse geocoding error: {e}")
             return None
     
+    # -------------------------------------------------------------------------
+    # Helper: two-tier cache
+    # -------------------------------------------------------------------------
+    def _cached(self, cache_key: str, reverse: bool = False):
+        """Memory cache first, then the persistent store (hits are promoted into memory)"""
+        cached_result = cache.get(cache_key)
+        if cached_result:
+            return cached_result
+        store = get_geocode_store()
+        stored = store.get(cache_key) if store else None
+        if stored is None:
+            return None
+        result = stored.address if reverse else (stored.lat, stored.lon)
+        if result:
+            cache.set(cache_key, result, ttl=3600)
+        return result
+
+    def _cached_address(self, lat: float, lon: float) -> Optional[str]:
+        """Address resolved near these coordinates: proximity cache first, then the exact key in the store"""
+        if not self._reverse_points_loaded:
+            self._load_reverse_points()
+        address = self.reverse_cache.get(lat, lon)
+        if address is None:
+            address = self._cached(self._reverse_cache_key(lat, lon), reverse=True)
+            if address:
+                self.reverse_cache.put(lat, lon, address)
+        return address
+
+    def _load_reverse_points(self) -> None:
+        """Seed the proximity cache from the persistent store (once, on the first reverse lookup)"""
+        self._reverse_points_loaded = True
+        store = get_geocode_store()
+        if not store:
+            return
+        entries = store.recent("reverse_geocode:", limit=Settings.REVERSE_CACHE_MAX_POINTS)
+        # Oldest first, so the most recently used end up most recently used here too
+        for _, stored in reversed(entries):
+            if stored.address:
+                self.reverse_cache.put(stored.lat, stored.lon, stored.address)
+        logger.info(f"📍 Loaded {len(self.reverse_cache)} reverse-geocoded points from the geocode store")
+
+    def _remember(self, cache_key: str, coords: Tuple[float, float], address: Optional[str] = None) -> None:
+        """Keep a result for an hour in memory and for GEOCODE_STORE_TTL_DAYS on disk"""
+        cache.set(cache_key, address if address is not None else coords, ttl=3600)
+        if address is not None:
+            self.reverse_cache.put(coords[0], coords[1], address)
+        store = get_geocode_store()
+        if store:
+            store.put(cache_key, coords[0], coords[1], address)
+
     # -------------------------------------------------------------------------
     # Helper: call Google Maps API
     # -------------------------------------------------------------------------
-    def _query_google_maps(self, query: str) -> Optional[Tuple[float, float]]:
+    def _query_google_maps(self, query: str, timeout: float = 10) -> Optional[Tuple[float, float]]:
         """Perform a single geocoding request using Google Maps API with Toronto context."""
         try:
             # Add Toronto context for ambiguous searches
@@ -104,7 +332,7 @@ class GeocodingService:
             encoded = urllib.parse.quote(enhanced_query)
             url = f"https://maps.googleapis.com/maps/api/geocode/json?address={encoded}&key={self.google_api_key}"
             
-            resp = requests.get(url, timeout=10)
+            resp = transport.get(url, timeout=timeout)
             resp.raise_for_status()
             data = resp.json()
             
@@ -246,13 +474,13 @@ class GeocodingService:
         logger.debug(f"Generated {len(unique_variants)} address variants for: {address}")
         return unique_variants
 
-    def _query_nominatim(self, query: str) -> Optional[Tuple[float, float]]:
+    def _query_nominatim(self, query: str, timeout: float = 10) -> Optional[Tuple[float, float]]:
         """Perform a single geocoding request."""
         try:
             encoded = urllib.parse.quote(query)
             url = f"https://nominatim.openstreetmap.org/search?q={encoded}&format=json&limit=1&countrycodes=ca"
             headers = {"User-Agent": "MapleMover/1.0 (Transit Finder)"}
-            resp = requests.get(url, headers=headers, timeout=10)
+            resp = transport.get(url, headers=headers, timeout=timeout)
             resp.raise_for_status()
             data = resp.json()
             if data:
@@ -266,8 +494,12 @@ class GeocodingService:
     # -------------------------------------------------------------------------
     # Toronto bounds validation
     # -------------------------------------------------------------------------
+    @traced("toronto_check")
     def _is_toronto_area(self, lat: float, lon: float) -> bool:
         """Return True if coordinates are within Toronto area."""
-        in_bounds = self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon
+        in_bounds = self._within_bounds(lat, lon)
         logger.info(f"📍 Location ({lat:.6f}, {lon:.6f}) - Toronto bounds check: {in_bounds}")
         return in_bounds
+
+    def _within_bounds(self, lat: float, lon: float) -> bool:
+        return self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon
@@ -0,0 +1,198 @@
+"""
+Persistent geocode store
+SQLite (WAL) tier behind the in-memory cache, shared by every app process on the host and kept across restarts
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import structlog
+from src.config.settings import Settings
+from src.utils.cache import _key_prefix
+from src.utils.metrics import CACHE_REQUESTS
+
+logger = structlog.get_logger("maple_mover.geocoding")
+
+SECONDS_PER_DAY = 24 * 3600
+# A hit refreshes last_used at most this often, so reads don't turn into writes
+TOUCH_INTERVAL = 3600
+# Expired and least-recently-used rows are pruned once per this many writes
+PRUNE_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocodes (
+    key       TEXT PRIMARY KEY,
+    lat       REAL NOT NULL,
+    lon       REAL NOT NULL,
+    address   TEXT,
+    expires   REAL NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS geocodes_last_used ON geocodes (last_used);
+"""
+
+_SPACES = re.compile(r"\s+")
+_AROUND_COMMAS = re.compile(r"\s*,\s*")
+
+def normalize_query(address: str) -> str:
+    """Canonical form of a typed address, so trivially different spellings share an entry
+
+    Case, Unicode forms, runs of whitespace, spacing around commas and
+    trailing punctuation are normalised; words are left alone.
+    """
+    text = unicodedata.normalize("NFKC", address).casefold()
+    text = _AROUND_COMMAS.sub(", ", _SPACES.sub(" ", text))
+    return text.strip(" ,.;")
+
+@dataclass
+class StoredGeocode:
+    lat: float
+    lon: float
+    address: Optional[str] = None
+
+class GeocodeStore:
+    """Long-lived geocode results in one SQLite file
+
+    Keys use the in-memory cache's namespaces ("geocode:<query>",
+    "reverse_geocode:<lat>,<lon>"). Forward lookups store coordinates;
+    reverse lookups also store the formatted address. WAL mode lets
+    several processes read while one writes, and each thread keeps its
+    own connection, so a hit is a single primary-key lookup. Rows expire
+    after ttl_days and the least recently used are dropped beyond
+    max_entries. Errors are logged and treated as misses: the store only
+    ever saves upstream calls, it never fails a lookup.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_days: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.path = path or Settings.GEOCODE_STORE_PATH
+        self.ttl = (ttl_days if ttl_days is not None else Settings.GEOCODE_STORE_TTL_DAYS) * SECONDS_PER_DAY
+        self.max_entries = max_entries if max_entries is not None else Settings.GEOCODE_STORE_MAX_ENTRIES
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; the timeout waits out another process's write lock
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[StoredGeocode]:
+        """Stored result for a key, or None if missing or expired"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT lat, lon, address, last_used FROM geocodes WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is not None and now - row[3] > TOUCH_INTERVAL:
+                conn.execute("UPDATE geocodes SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Geocode store read failed: {e}")
+            row = None
+        CACHE_REQUESTS.inc(cache="geocode_store", prefix=_key_prefix(key), result="hit" if row else "miss")
+        return StoredGeocode(row[0], row[1], row[2]) if row else None
+
+    def put(self, key: str, lat: float, lon: float, address: Optional[str] = None) -> None:
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO geocodes (key, lat, lon, address, expires, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, lat, lon, address, now + self.ttl, now)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Geocode store write failed: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def recent(self, prefix: str, limit: int = 5000) -> List[Tuple[str, StoredGeocode]]:
+        """Unexpired entries under a key prefix ("geocode:"), most recently used first"""
+        try:
+            rows = self._connection().execute(
+                "SELECT key, lat, lon, address FROM geocodes WHERE key >= ? AND key < ? AND expires > ? "
+                "ORDER BY last_used DESC LIMIT ?",
+                (prefix, prefix + "\uffff", time.time(), limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Geocode store read failed: {e}")
+            return []
+        return [(key, StoredGeocode(lat, lon, address)) for key, lat, lon, address in rows]
+
+    def prune(self) -> int:
+        """Drop expired rows, then the least recently used beyond max_entries"""
+        try:
+            conn = self._connection()
+            removed = conn.execute("DELETE FROM geocodes WHERE expires <= ?", (time.time(),)).rowcount
+            excess = self.count() - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM geocodes WHERE key IN (SELECT key FROM geocodes ORDER BY last_used LIMIT ?)", (excess,)
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Geocode store prune failed: {e}")
+            return 0
+        if removed:
+            logger.info(f"🧹 Pruned {removed} geocode store entries")
+        return removed
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+# -----------------------------------------------------------------------------
+# Process-wide store
+# -----------------------------------------------------------------------------
+_store: Optional[GeocodeStore] = None
+_store_checked = False
+_store_lock = threading.Lock()
+
+def get_geocode_store() -> Optional[GeocodeStore]:
+    """Return the shared store, opening it on first use (None if disabled or unusable)"""
+    global _store, _store_checked
+    if _store_checked:
+        return _store
+    with _store_lock:
+        if not _store_checked:
+            if Settings.GEOCODE_STORE_ENABLED:
+                try:
+                    _store = GeocodeStore()
+                    logger.info(f"✅ Geocode store at {_store.path} ({_store.count()} entries)")
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"⚠️ Geocode store unavailable, using the in-memory cache only: {e}")
+                    _store = None
+            _store_checked = True
+        return _store
+
+def reset_geocode_store() -> None:
+    """Forget the shared store so the next call reopens it"""
+    global _store, _store_checked
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = None
+        _store_checked = False
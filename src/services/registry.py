@@ -0,0 +1,124 @@
+"""
+Process-wide service registry
+Builds the heavy services once per server process so Streamlit reruns only touch session state
+"""
+
+import threading
+import structlog
+from typing import Optional
+from src.api.ttc_client import TTCAPIClient
+from src.geocoding.gazetteer import Gazetteer
+from src.geocoding.service import GeocodingService
+from src.utils.routes_cache import get_cache_version
+
+logger = structlog.get_logger("maple_mover.registry")
+
+class ServiceRegistry:
+    """Services that are safe to share across every session
+
+    Holds the TTC client (and through it the routes/stops caches and the
+    spatial index) plus the geocoder, whose gazetteer is built from the
+    same stops. Anything that reads st.session_state
+    or st.query_params stays per-session and does not belong here.
+    """
+
+    def __init__(self):
+        # Read the version first so a refresh during the build triggers another swap
+        self.cache_version = get_cache_version()
+        self.api = TTCAPIClient()
+        self.nextbus = self.api.ttc_service.nextbus_service  # None when NextBus couldn't be imported
+        self.geo = GeocodingService(gazetteer=Gazetteer.from_stops(self.nextbus.stops_cache.values() if self.nextbus else ()))
+        # NextBus caches version the geocoder's stop indexes were built from (see sync_geocoding)
+        self.stops_version = self.nextbus.cache_version if self.nextbus else None
+        logger.info(f"🧰 Service registry built (routes cache version: {self.cache_version})")
+
+    def is_current(self, version: Optional[str]) -> bool:
+        """True if built from this cache version, or its NextBus service wrote that version itself
+
+        A refresh in this process patches the live caches and then saves
+        them; reloading that save would only throw the patched service away.
+        """
+        if version == self.cache_version:
+            return True
+        return self.nextbus is not None and version is not None and self.nextbus.cache_version == version
+
+    def geocoding_is_current(self) -> bool:
+        """False after an in-process route refresh until sync_geocoding has caught up"""
+        return self.nextbus is None or self.stops_version == self.nextbus.cache_version
+
+    def sync_geocoding(self) -> None:
+        """Rebuild the gazetteer, suggestions and local reverse labels from the refreshed stops"""
+        version = self.nextbus.cache_version
+        self.geo.use_gazetteer(Gazetteer.from_stops(list(self.nextbus.stops_cache.values())))
+        self.stops_version = version
+        logger.info(f"🗺️ Geocoding indexes rebuilt from refreshed stops (routes cache version: {version})")
+
+# Process-wide registry, swapped for a fresh one when the routes cache changes
+_registry: Optional[ServiceRegistry] = None
+_registry_lock = threading.Lock()
+_rebuild_thread: Optional[threading.Thread] = None
+_geocoding_sync_thread: Optional[threading.Thread] = None
+
+def get_service_registry() -> ServiceRegistry:
+    """Return the shared registry, rebuilding it if the routes cache was refreshed elsewhere
+
+    Only the first build blocks. When another process rewrites the cache,
+    the new registry is built on a background thread and swapped in when
+    ready; callers keep getting the current one until then.
+    """
+    global _registry, _rebuild_thread
+    registry = _registry
+    version = get_cache_version()
+    if registry is not None and registry.is_current(version):
+        if not registry.geocoding_is_current():
+            _start_geocoding_sync(registry)
+        return registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = ServiceRegistry()
+        elif not _registry.is_current(version) and _rebuild_thread is None:
+            logger.info("🔄 Routes cache refreshed, rebuilding service registry in the background")
+            _rebuild_thread = threading.Thread(target=_rebuild, name="registry-rebuild", daemon=True)
+            _rebuild_thread.start()
+        return _registry
+
+def _rebuild() -> None:
+    global _registry, _rebuild_thread
+    try:
+        registry = ServiceRegistry()
+    except Exception as e:
+        logger.error(f"❌ Service registry rebuild failed: {e}")
+        registry = None
+    with _registry_lock:
+        if registry is not None and _registry is not None:
+            # Sessions mid-rerun keep the old registry until they ask again
+            _registry = registry
+            logger.info("🔄 Service registry hot-swapped")
+        _rebuild_thread = None
+
+def _start_geocoding_sync(registry: ServiceRegistry) -> None:
+    """Catch the registry's geocoder up with an in-process route refresh, on a background thread"""
+    global _geocoding_sync_thread
+    with _registry_lock:
+        if _geocoding_sync_thread is not None:
+            return
+
+        def run():
+            global _geocoding_sync_thread
+            try:
+                registry.sync_geocoding()
+            except Exception as e:
+                logger.error(f"❌ Geocoding index rebuild failed: {e}")
+            finally:
+                with _registry_lock:
+                    _geocoding_sync_thread = None
+
+        _geocoding_sync_thread = threading.Thread(target=run, name="geocoding-sync", daemon=True)
+        _geocoding_sync_thread.start()
+
+def reset_service_registry() -> None:
+    """Drop the shared registry so the next caller builds a new one"""
+    global _registry
+    with _registry_lock:
+        _registry = None
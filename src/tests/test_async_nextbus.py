@@ -0,0 +1,151 @@
+"""
+Tests for the asyncio NextBus client
+Upstream responses come from an httpx.MockTransport
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+httpx = pytest.importorskip("httpx")
+
+from src.api import async_nextbus, dynamic_transit
+from src.api.async_nextbus import AsyncNextBusClient, run_sync
+from src.api.dynamic_transit import NextBusTransitService, TransitStop
+from src.config.settings import Settings
+from src.api.vehicle_poller import VehicleLocationPoller
+from src.api.prediction_cache import prediction_cache
+
+
+class TestAsyncNextBusClient:
+    """Test concurrent fan-out and parsing parity with the sync service"""
+
+    def setup_method(self):
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        prediction_cache.clear()
+        self.service = NextBusTransitService()
+        self.service.routes_cache = {"506": object()}
+        self.service.stops_cache = {
+            "1001": TransitStop("1001", "s1", "College St / Spadina Ave", 43.6578, -79.4003, ["506"]),
+            "1002": TransitStop("1002", "s2", "College St / Huron St", 43.6581, -79.3985, ["506"]),
+        }
+        self.service._build_spatial_index()
+
+        self.poller = VehicleLocationPoller(self.service.api_url, self.service.agency)
+        self._patch.setattr(self.poller, "start", lambda: None)
+        self._patch.setattr(async_nextbus, "get_vehicle_poller", lambda *_: self.poller)
+
+        self.requests = []
+        self.lock = threading.Lock()
+
+        def handler(request):
+            command = request.url.params.get("command")
+            with self.lock:
+                self.requests.append(command)
+            if command == "vehicleLocations":
+                return httpx.Response(200, json={"vehicle": [{"id": "4401", "lat": "43.6579", "lon": "-79.4010", "heading": "90", "routeTag": "506"}], "lastTime": {"time": "1"}})
+            if command == "predictionsForMultiStops":
+                return httpx.Response(200, json={"predictions": [
+                    {"routeTag": "506", "routeTitle": "506-Carlton", "stopTag": "s1",
+                     "direction": {"title": "East", "prediction": [{"minutes": "3", "seconds": "180", "vehicle": "4401"}]}},
+                    {"routeTag": "506", "routeTitle": "506-Carlton", "stopTag": "s2",
+                     "direction": {"title": "East", "prediction": [{"minutes": "4", "seconds": "240", "vehicle": "4401"}]}},
+                ]})
+            return httpx.Response(404)
+
+        self.client = AsyncNextBusClient(self.service)
+        self.client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def teardown_method(self):
+        run_sync(self.client.aclose())
+        prediction_cache.clear()
+        self._patch.undo()
+
+    def test_transit_data_for_location(self):
+        """Predictions and vehicles are fetched together and attached per stop"""
+        data = run_sync(self.client.get_transit_data_for_location(43.6579, -79.3995))
+        assert [row["stop_id"] for row in data] == ["1001", "1002"]
+        by_stop = {row["stop_id"]: row for row in data}
+        prediction = by_stop["1001"]["predictions"][0]
+        assert prediction["arrival_minutes"] == 3.0
+        assert prediction["vehicle_lat"] == 43.6579
+        assert sorted(self.requests) == ["predictionsForMultiStops", "vehicleLocations"]
+
+    def test_second_search_is_served_from_cache(self):
+        """A repeat search within the fresh window makes no prediction request"""
+        run_sync(self.client.get_transit_data_for_location(43.6579, -79.3995))
+        run_sync(self.client.get_transit_data_for_location(43.6579, -79.3995))
+        assert self.requests.count("predictionsForMultiStops") == 1
+
+    def test_concurrent_searches_keep_their_own_distances(self):
+        """Two locations searched at once each get distances from their own point"""
+        async def both():
+            return await asyncio.gather(
+                self.client.get_transit_data_for_location(43.6578, -79.4003),
+                self.client.get_transit_data_for_location(43.6581, -79.3985),
+            )
+
+        at_spadina, at_huron = run_sync(both())
+        assert [(row["stop_id"], round(row["distance"])) for row in at_spadina] == [("1001", 0), ("1002", 149)]
+        assert [(row["stop_id"], round(row["distance"])) for row in at_huron] == [("1002", 0), ("1001", 149)]
+        assert self.service.stops_cache["1001"].distance_meters == 0.0  # Shared stops are never written to
+
+    def test_identical_requests_are_coalesced(self):
+        """Concurrent gets of the same URL share one upstream request"""
+        url = f"{self.service.api_url}?command=vehicleLocations&a=ttc&t=0"
+
+        async def burst():
+            return await asyncio.gather(*(self.client._get_json(url) for _ in range(5)))
+
+        results = run_sync(burst())
+        assert len(results) == 5
+        assert self.requests == ["vehicleLocations"]
+
+    def test_run_sync_deadline_cancels_a_hung_search(self):
+        """A coroutine that outlives its deadline raises in the caller and is cancelled on the loop"""
+        cancelled = threading.Event()
+
+        async def hang():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(concurrent.futures.TimeoutError):
+            run_sync(hang(), timeout=0.05)
+        assert cancelled.wait(1)
+
+    def test_stop_spanning_chunks_matches_sync_path(self):
+        """A failed chunk falls back for its own routes only, exactly as the sync path does"""
+        self._patch.setattr(Settings, "NEXTBUS_MAX_STOPS_PER_REQUEST", 1)  # Stop 1001's two routes can't share a request
+        stop = TransitStop("1001", "s1", "College St / Spadina Ave", 43.6578, -79.4003, ["506", "510"])
+
+        def prediction(route_tag, minutes):
+            return {"routeTag": route_tag, "routeTitle": route_tag, "stopTag": "s1",
+                    "direction": {"title": "East", "prediction": [{"minutes": str(minutes), "seconds": str(minutes * 60)}]}}
+
+        def handler(request):
+            command = request.url.params.get("command")
+            if command == "predictionsForMultiStops":
+                route_tag = request.url.params.get("stops").split("|")[0]
+                return httpx.Response(503) if route_tag == "506" else httpx.Response(200, json={"predictions": prediction(route_tag, 6)})
+            # The per-stop feed always carries every route at the stop
+            return httpx.Response(200, json={"predictions": [prediction("506", 3), prediction("510", 6)]})
+
+        run_sync(self.client.aclose())
+        self.client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        predictions = run_sync(self.client.get_predictions_for_stops([stop], {}))
+        assert sorted((p["route_tag"], p["arrival_minutes"]) for p in predictions["1001"]) == [("506", 3.0), ("510", 6.0)]
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,121 @@
+"""
+Tests for search-box autocomplete
+"""
+
+import random
+import statistics
+import time
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.geocoding.autocomplete import AutocompleteIndex
+from src.geocoding.gazetteer import Gazetteer
+
+STOPS = [
+    SimpleNamespace(title="Spadina Ave At College St", lat=43.6579, lon=-79.4003),
+    SimpleNamespace(title="College St At Spadina Ave", lat=43.6581, lon=-79.3999),
+    SimpleNamespace(title="Spadina Ave At Queen St West", lat=43.6486, lon=-79.3962),
+    SimpleNamespace(title="Spadina Station", lat=43.6672, lon=-79.4037),
+    SimpleNamespace(title="St Clair Ave West At Yonge St", lat=43.6875, lon=-79.3945),
+    SimpleNamespace(title="College St At Bathurst St", lat=43.6567, lon=-79.4066),
+]
+
+@pytest.fixture
+def index():
+    return AutocompleteIndex.from_gazetteer(Gazetteer.from_stops(STOPS))
+
+
+class TestAutocomplete:
+    """Prefix matches first, trigram matches for typos, always with coordinates"""
+
+    def test_prefix_of_last_word(self, index):
+        labels = [s.label for s in index.suggest("spadina col")]
+        assert labels[0] == "Spadina Ave & College St"
+        assert "Spadina Ave & Queen St West" not in labels  # Needs both streets
+
+        suggestion = index.suggest("College / Spad")[0]
+        assert suggestion.label == "Spadina Ave & College St"
+        assert (suggestion.lat, suggestion.lon) == pytest.approx((43.658, -79.4001))
+        assert suggestion.kind == "intersection"
+
+    def test_single_prefix_ranks_and_limits(self, index):
+        suggestions = index.suggest("spa", k=3)
+        assert len(suggestions) == 3
+        assert all("Spadina" in s.label for s in suggestions)
+
+    def test_saint_and_landmark_aliases(self, index):
+        assert index.suggest("st clair yon")[0].label == "St Clair Ave West & Yonge St"
+        assert index.suggest("rom")[0].label == "Royal Ontario Museum"
+        assert index.suggest("cn tow")[0].kind == "landmark"
+
+    def test_typos_fall_back_to_trigrams(self, index):
+        assert index.suggest("spadna colege")[0].label == "Spadina Ave & College St"
+        assert index.suggest("casa lome")[0].label == "Casa Loma"
+
+    def test_nothing_for_noise(self, index):
+        assert index.suggest("") == []
+        assert index.suggest("qqqq zzzz") == []
+
+    def test_added_addresses_are_suggested_once(self, index):
+        assert index.add("100 King St W", 43.6486, -79.3817, "address")
+        assert not index.add("100 king street west", 43.6486, -79.3817, "address")
+        assert index.suggest("100 ki")[0].label == "100 King St W"
+
+    def test_sub_millisecond_on_a_city_sized_index(self):
+        rng = random.Random(7)
+        streets = [f"{rng.choice('bcdfghklmnprstvw')}{rng.choice('aeiou')}{rng.choice('lmnrst')}"
+                   f"{rng.choice('aeiou')}{rng.choice('dknrs')}{suffix}"
+                   for suffix in ("", "ton", "ley", "wood", "field") for _ in range(120)]
+        stops = [SimpleNamespace(title=f"{a} Ave At {b} St", lat=43.7 + rng.random() / 10, lon=-79.4 + rng.random() / 10)
+                 for a, b in (rng.sample(streets, 2) for _ in range(12000))]
+        index = AutocompleteIndex.from_gazetteer(Gazetteer.from_stops(stops))
+        assert len(index) > 9000
+
+        queries = [name[:n] for name in rng.sample(streets, 100) for n in (1, 3, 6)]
+        queries += [f"{a} {b[:2]}" for a, b in (rng.sample(streets, 2) for _ in range(100))]
+        queries += [f"{a[:-1]}x {b}" for a, b in (rng.sample(streets, 2) for _ in range(100))]  # Typos
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.suggest(query)
+            timings.append(time.perf_counter() - started)
+
+        assert statistics.median(timings) < 0.001
+
+
+class TestGeocodingServiceSuggest:
+    """The service suggests places and addresses from the persistent store without a network call"""
+
+    def test_stored_addresses_are_suggested(self, monkeypatch, tmp_path):
+        from src.geocoding import service as geocoding
+        from src.geocoding.store import GeocodeStore
+
+        store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+        store.put("geocode:220 yonge st", 43.6544, -79.3807)
+        store.put("geocode:1 main st, vancouver", 49.28, -123.12)  # Outside Toronto
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+        geo = geocoding.GeocodingService(gazetteer=Gazetteer.from_stops(STOPS))
+
+        assert geo.suggest("220 yon")[0].label == "220 Yonge St"
+        assert geo.suggest("1 main") == []
+        assert geo.suggest("spadina col")[0].kind == "intersection"
+
+    def test_exact_label_matches_a_suggestion(self, monkeypatch, tmp_path):
+        from src.geocoding import service as geocoding
+        from src.geocoding.store import GeocodeStore
+
+        store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+        store.put("geocode:220 yonge st", 43.6544, -79.3807)
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+        geo = geocoding.GeocodingService(gazetteer=Gazetteer.from_stops(STOPS))
+
+        match = geo.match_suggestion("  spadina station ")
+        assert match and match.label == "Spadina Station" and (match.lat, match.lon) == (43.6672, -79.4037)
+        assert geo.match_suggestion("220 YONGE ST").label == "220 Yonge St"
+        assert geo.match_suggestion("spadina sta") is None  # Only a prefix: geocode as typed
+        assert geo.match_suggestion("") is None
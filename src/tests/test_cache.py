@@ -0,0 +1,97 @@
+"""
+Tests for the bounded LRU + TTL cache
+"""
+
+import threading
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils import cache as cache_module
+from src.utils.cache import LRUTTLCache
+
+
+class TestLRUTTLCache:
+    """Test eviction, expiry and locking"""
+
+    def setup_method(self):
+        self.now = 1000.0
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(cache_module.time, "time", lambda: self.now)
+
+    def teardown_method(self):
+        self._patch.undo()
+
+    def test_get_set_clear_size(self):
+        """Same API as the old SimpleCache"""
+        cache = LRUTTLCache(max_entries=10)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("missing") is None
+        assert cache.size() == 1
+        cache.clear()
+        assert cache.size() == 0
+        assert cache.memory_usage() == 0
+
+    def test_ttl_expiry_without_reads(self):
+        """Expired keys are dropped on the next operation even if never read"""
+        cache = LRUTTLCache(max_entries=10)
+        cache.set("short", 1, ttl=5)
+        cache.set("long", 2, ttl=60)
+        self.now += 10
+        cache.set("other", 3)
+        assert cache.size() == 2
+        assert cache.get("short") is None
+        assert cache.get("long") == 2
+
+    def test_overwrite_resets_ttl(self):
+        """Re-setting a key uses the new expiry, not the stale heap record"""
+        cache = LRUTTLCache(max_entries=10)
+        cache.set("k", 1, ttl=5)
+        cache.set("k", 2, ttl=60)
+        self.now += 10
+        assert cache.get("k") == 2
+
+    def test_lru_eviction_by_count(self):
+        """Least recently used entry is evicted first"""
+        cache = LRUTTLCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_eviction_by_memory(self):
+        """Entries are evicted once the approximate byte limit is exceeded"""
+        cache = LRUTTLCache(max_entries=100, max_bytes=2000)
+        for i in range(10):
+            cache.set(f"k{i}", "x" * 500)
+        assert cache.memory_usage() <= 2000
+        assert cache.get("k9") is not None
+        assert cache.get("k0") is None
+
+    def test_concurrent_access(self):
+        """Many threads can set and get without corrupting the cache"""
+        cache = LRUTTLCache(max_entries=50)
+
+        def worker(n):
+            for i in range(500):
+                cache.set(f"{n}:{i}", i)
+                cache.get(f"{n}:{i - 1}")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert cache.size() == 50
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,79 @@
+"""
+Tests for the offline gazetteer
+"""
+
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.geocoding.gazetteer import Gazetteer, normalize_street
+
+STOPS = [
+    SimpleNamespace(title="Spadina Ave At College St", lat=43.6579, lon=-79.4003),
+    SimpleNamespace(title="Spadina Ave At College St North Side", lat=43.6583, lon=-79.4005),
+    SimpleNamespace(title="College St At Spadina Ave (East Side)", lat=43.6581, lon=-79.3999),
+    SimpleNamespace(title="St Clair Ave West At Yonge St", lat=43.6875, lon=-79.3945),
+    SimpleNamespace(title="Queen St West At Spadina Ave", lat=43.6486, lon=-79.3962),
+    SimpleNamespace(title="Spadina Station", lat=43.6672, lon=-79.4037),
+]
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer.from_stops(STOPS)
+
+
+class TestGazetteer:
+    """Intersections, stop names and landmarks resolve without a network call"""
+
+    def test_normalize_street(self):
+        assert normalize_street("King St W") == normalize_street("king street west") == "king"
+        assert normalize_street("Spadina Avenue") == "spadina"
+        assert normalize_street("St. Clair Ave E") == "saint clair"
+
+    @pytest.mark.parametrize("query", [
+        "Spadina / College",
+        "college & spadina",
+        "Spadina Avenue and College Street",
+        "Spadina Ave at College St, Toronto, ON",
+        "SPADINA/COLLEGE, Toronto, ON M5T 2J1",
+    ])
+    def test_intersections(self, gazetteer, query):
+        hit = gazetteer.resolve(query)
+        assert hit.kind == "intersection"
+        assert hit.name == "Spadina Ave & College St"
+        assert (hit.lat, hit.lon) == (43.6581, -79.4003)  # Median of the corner stops
+
+    def test_saint_streets_and_directions(self, gazetteer):
+        assert gazetteer.resolve("Yonge / St Clair").kind == "intersection"
+        assert gazetteer.resolve("Queen St E & Spadina").lat == 43.6486
+
+    def test_landmarks_and_stop_names(self, gazetteer):
+        assert gazetteer.resolve("CN Tower").name == "CN Tower"
+        assert gazetteer.resolve("union station, toronto").name == "Union Station"
+        assert gazetteer.resolve("Eaton Center").name == "Eaton Centre"
+        assert gazetteer.resolve("ROM").name == "Royal Ontario Museum"
+        assert gazetteer.resolve("Spadina Station").kind == "stop"
+
+    @pytest.mark.parametrize("query", [
+        "",
+        "100 King St W",                      # Street address
+        "Spadina / Bloor",                     # Unknown intersection
+        "Union Station, Unit 5",               # Extra detail after the comma
+        "the ROM gift shop",                   # Landmark name inside a longer query
+    ])
+    def test_everything_else_goes_to_the_geocoders(self, gazetteer, query):
+        assert gazetteer.resolve(query) is None
+
+    def test_geocoding_service_skips_the_network(self, monkeypatch):
+        from src.geocoding import service as geocoding
+        geo = geocoding.GeocodingService(gazetteer=Gazetteer.from_stops(STOPS))
+        monkeypatch.setattr(geocoding.HedgedResolver, "resolve", lambda *args: pytest.fail("network geocoder called"))
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: pytest.fail("store consulted"))
+
+        assert geo.geocode_address("Spadina / College") == (43.6581, -79.4003)
+        assert geo.geocode_address("Yorkdale") == (43.7255, -79.4522)
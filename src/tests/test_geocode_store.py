@@ -0,0 +1,112 @@
+"""
+Tests for the persistent geocode store
+"""
+
+import subprocess
+import time
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.geocoding import service as geocoding
+from src.geocoding.store import GeocodeStore, normalize_query
+from src.utils.cache import cache
+
+UNION = (43.6452, -79.3806)
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "geocode.sqlite3")
+
+
+class TestGeocodeStore:
+    """Entries persist, expire, stay bounded and are shared between processes"""
+
+    def test_normalize_query(self):
+        assert normalize_query("  100 King St W ,Toronto.  ") == "100 king st w, toronto"
+        assert normalize_query("UNION   Station") == normalize_query("union station")
+        assert normalize_query("Ｕｎｉｏｎ Station") == "union station"  # Full-width forms
+
+    def test_round_trip_survives_reopen(self, store_path):
+        store = GeocodeStore(store_path)
+        store.put("geocode:union station", *UNION)
+        store.put("reverse_geocode:43.645200,-79.380600", *UNION, address="Union Station, Front Street West, Toronto")
+        store.close()
+
+        reopened = GeocodeStore(store_path)
+        assert (reopened.get("geocode:union station").lat, reopened.get("geocode:union station").lon) == UNION
+        assert reopened.get("reverse_geocode:43.645200,-79.380600").address.startswith("Union Station")
+        assert reopened.get("geocode:nowhere") is None
+
+    def test_expired_entries_are_misses_and_pruned(self, store_path):
+        store = GeocodeStore(store_path, ttl_days=-1)
+        store.put("geocode:old", *UNION)
+        assert store.get("geocode:old") is None
+        assert store.prune() == 1
+        assert store.count() == 0
+
+    def test_least_recently_used_pruned_beyond_limit(self, store_path, monkeypatch):
+        from src.geocoding import store as store_module
+        monkeypatch.setattr(store_module, "TOUCH_INTERVAL", 0)
+        store = GeocodeStore(store_path, max_entries=2)
+        for key in ("geocode:a", "geocode:b", "geocode:c"):
+            store.put(key, *UNION)
+            time.sleep(0.01)
+        store.get("geocode:a")  # Now the most recently used
+
+        store.prune()
+        assert store.count() == 2
+        assert store.get("geocode:a") is not None
+        assert store.get("geocode:b") is None
+
+    def test_shared_between_processes(self, store_path):
+        store = GeocodeStore(store_path)
+        script = (
+            "import sys; sys.path.insert(0, sys.argv[1]);"
+            "from src.geocoding.store import GeocodeStore;"
+            "GeocodeStore(sys.argv[2]).put('geocode:cn tower', 43.6426, -79.3871)"
+        )
+        subprocess.run([sys.executable, "-c", script, PROJECT_ROOT, store_path], check=True, timeout=60)
+
+        hit = store.get("geocode:cn tower")
+        assert (hit.lat, hit.lon) == (43.6426, -79.3871)
+        with open(store_path + "-wal", "rb"):
+            pass  # WAL journal in use
+
+    def test_hits_are_fast(self, store_path):
+        store = GeocodeStore(store_path)
+        store.put("geocode:union station", *UNION)
+        store.get("geocode:union station")
+
+        started = time.perf_counter()
+        for _ in range(1000):
+            store.get("geocode:union station")
+        per_hit = (time.perf_counter() - started) / 1000
+        assert per_hit < 0.0005
+
+
+class TestGeocodingServiceStore:
+    """A restart (empty memory cache) is served from the store without upstream calls"""
+
+    def test_geocode_and_reverse_served_from_store(self, store_path, monkeypatch):
+        store = GeocodeStore(store_path)
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+        geo = geocoding.GeocodingService()
+        geo.use_google_api = False
+        monkeypatch.setattr(geo, "_query_nominatim", lambda query, timeout=10: UNION)
+
+        address = "Union Station (store test)"
+        assert geo.geocode_address(address) == UNION
+        assert store.get(f"geocode:{normalize_query(address)}") is not None
+
+        # Simulate a restart: memory tier gone, upstream unreachable
+        cache.clear()
+        monkeypatch.setattr(geo, "_query_nominatim", lambda query, timeout=10: pytest.fail("upstream called"))
+        assert geo.geocode_address("  union station (STORE test) ") == UNION
+
+        store.put("reverse_geocode:43.645200,-79.380600", *UNION, address="Union Station, Toronto")
+        assert geo.reverse_geocode(*UNION) == "Union Station, Toronto"
@@ -0,0 +1,131 @@
+"""
+Tests for hedged geocoding and the Nominatim rate limiter
+"""
+
+import threading
+import time
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.geocoding.hedged import Attempt, HedgedResolver
+from src.utils.rate_limit import RateLimiter
+
+UNION = (43.6452, -79.3806)
+MISSISSAUGA = (43.5890, -79.6441)
+
+def in_toronto(coords):
+    return 43.60 <= coords[0] <= 43.80 and -79.60 <= coords[1] <= -79.20
+
+def fake(answer=None, delay=0.0, calls=None):
+    """A provider query that sleeps, records the call and returns a fixed answer"""
+    def query(q, timeout):
+        if calls is not None:
+            calls.append((q, time.monotonic(), timeout))
+        time.sleep(min(delay, timeout))
+        return answer if delay <= timeout else None
+    return query
+
+def resolver(deadline=2.0, hedge_delay=0.05, max_parallel=3):
+    return HedgedResolver(accept=in_toronto, deadline=deadline, hedge_delay=hedge_delay, max_parallel=max_parallel)
+
+
+class TestHedgedResolver:
+    """Attempts overlap, the first accepted answer wins and the deadline holds"""
+
+    def test_slow_attempt_is_hedged_by_the_next(self):
+        attempts = [Attempt("google", "a", fake(UNION, delay=1.0)), Attempt("nominatim", "b", fake(UNION, delay=0.05))]
+        result = resolver().resolve(attempts)
+
+        assert result.coords == UNION
+        assert (result.source, result.query) == ("nominatim", "b")
+        assert result.elapsed < 0.5
+
+    def test_misses_advance_immediately_and_later_attempts_are_dropped(self):
+        calls = []
+        attempts = [Attempt("nominatim", q, fake(answer, calls=calls))
+                    for q, answer in (("a", None), ("b", None), ("c", UNION), ("d", UNION), ("e", UNION))]
+        result = resolver(hedge_delay=1.0, max_parallel=1).resolve(attempts)
+
+        assert result.query == "c"
+        assert result.elapsed < 0.5  # No hedge delay after a miss
+        assert [q for q, _, _ in calls] == ["a", "b", "c"]
+
+    def test_out_of_area_answer_is_only_a_fallback(self):
+        attempts = [Attempt("google", "a", fake(MISSISSAUGA)), Attempt("nominatim", "b", fake(UNION, delay=0.02))]
+        assert resolver().resolve(attempts).coords == UNION
+
+        only_outside = [Attempt("google", "a", fake(MISSISSAUGA)), Attempt("nominatim", "b", fake(None))]
+        result = resolver().resolve(only_outside)
+        assert result.coords == MISSISSAUGA
+        assert result.source == "google"
+        assert result.started == 2
+
+    def test_overall_deadline(self):
+        calls = []
+        attempts = [Attempt("nominatim", str(i), fake(UNION, delay=5.0, calls=calls)) for i in range(10)]
+        started = time.monotonic()
+        result = resolver(deadline=0.3, hedge_delay=0.05, max_parallel=3).resolve(attempts)
+
+        assert result.coords is None
+        assert result.timed_out
+        assert time.monotonic() - started < 0.6
+        assert result.started == 3  # Capped by max_parallel
+        # Per-request timeouts never outlive the deadline
+        assert all(timeout <= 0.3 for _, _, timeout in calls)
+
+    def test_rate_limited_attempts_are_spaced(self):
+        calls = []
+        limiter = RateLimiter(0.1)
+        attempts = [Attempt("nominatim", str(i), fake(None, calls=calls), limiter) for i in range(4)]
+        result = resolver(hedge_delay=0.0).resolve(attempts)
+
+        assert result.coords is None and result.started == 4
+        gaps = [b[1] - a[1] for a, b in zip(calls, calls[1:])]
+        assert all(gap >= 0.09 for gap in gaps)
+
+
+class TestRateLimiter:
+    """Slots are spaced min_interval apart across threads"""
+
+    def test_try_acquire(self):
+        limiter = RateLimiter(0.2)
+        assert limiter.try_acquire() == 0.0
+        assert 0.0 < limiter.try_acquire() <= 0.2
+
+    def test_acquire_across_threads(self):
+        limiter = RateLimiter(0.05)
+        stamps = []
+        threads = [threading.Thread(target=lambda: (limiter.acquire(), stamps.append(time.monotonic()))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stamps.sort()
+        assert all(b - a >= 0.045 for a, b in zip(stamps, stamps[1:]))
+        assert limiter.acquire(timeout=0.0) is False
+
+
+class TestGeocodingService:
+    """geocode_address goes through the hedged resolver"""
+
+    def test_geocode_address_uses_first_toronto_variant(self, monkeypatch, tmp_path):
+        from src.geocoding import service as geocoding
+        from src.geocoding.store import GeocodeStore
+        from src.utils.cache import cache
+
+        store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+        monkeypatch.setattr(geocoding, "nominatim_limiter", RateLimiter(0.0))
+        geo = geocoding.GeocodingService()
+        geo.use_google_api = False
+        answers = {"100 King St W, Toronto, Ontario, Canada": UNION}
+        monkeypatch.setattr(geo, "_query_nominatim", lambda query, timeout=10: answers.get(query))
+
+        address = "100 King St W, Unit 5 hedged-test"
+        assert geo.geocode_address(address) == UNION
+        assert cache.get(f"geocode:{address.lower()}") == UNION
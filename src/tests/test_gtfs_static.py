@@ -0,0 +1,310 @@
+"""
+Tests for the GTFS static schedule store
+"""
+
+import tracemalloc
+import zipfile
+import pytest
+import sys
+import os
+from datetime import date, datetime
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api.gtfs_static import GTFSSchedule, import_gtfs_zip, parse_gtfs_time
+from src.api.ttc_data_sources import GTFSStaticClient, UnifiedTTCService
+
+FEED = {
+    "stops.txt": (
+        "stop_id,stop_code,stop_name,stop_lat,stop_lon\n"
+        "s1,425,King St West at Bay St,43.6486,-79.3817\n"
+        "s2,1001,Union Station,43.6452,-79.3806\n"
+        "s3,,Far Away Stop,43.7960,-79.3486\n"
+    ),
+    "routes.txt": (
+        "route_id,route_short_name,route_long_name,route_type\n"
+        "r504,504,King,0\n"
+        "r6,6,Bay,3\n"
+    ),
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WKDY,1,1,1,1,1,0,0,20260101,20261231\n"
+        "SAT,0,0,0,0,0,1,0,20260101,20261231\n"
+    ),
+    "calendar_dates.txt": (
+        "service_id,date,exception_type\n"
+        "WKDY,20261012,2\n"   # Thanksgiving Monday: no weekday service...
+        "SAT,20261012,1\n"    # ...Saturday schedule instead
+    ),
+    "trips.txt": (
+        "route_id,service_id,trip_id,trip_headsign\n"
+        "r504,WKDY,t1,East - 504 King towards Broadview\n"
+        "r504,WKDY,t2,East - 504 King towards Broadview\n"
+        "r6,WKDY,t3,North - 6 Bay towards Dupont\n"
+        "r504,WKDY,t4,East - 504 King towards Broadview\n"
+        "r504,SAT,t5,East - 504 King towards Broadview\n"
+    ),
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "t1,08:05:00,08:05:00,s1,1\n"
+        "t1,08:09:00,08:09:00,s2,2\n"
+        "t2,08:20:00,08:20:00,s1,1\n"
+        "t3,08:12:00,08:12:00,s1,1\n"
+        "t4,24:30:00,24:30:00,s1,1\n"
+        "t5,09:00:00,09:00:00,s1,1\n"
+        "t2,,,s2,2\n"
+    ),
+}
+
+def write_large_feed(path, trips, stops_per_trip=40, stop_count=500):
+    """Synthetic feed whose stop_times.txt grows with `trips` (a handful of distinct times)"""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in ("routes.txt", "calendar.txt", "calendar_dates.txt"):
+            zf.writestr(name, FEED[name])
+        zf.writestr("stops.txt", "stop_id,stop_name,stop_lat,stop_lon\n" + "".join(
+            f"s{i},Stop {i},{43.6 + i * 1e-4:.6f},{-79.4 + i * 1e-4:.6f}\n" for i in range(stop_count)))
+        zf.writestr("trips.txt", "route_id,service_id,trip_id,trip_headsign\n" + "".join(
+            f"r504,{'WKDY' if t % 3 else 'SAT'},t{t},East\n" for t in range(trips)))
+        lines = ["trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"]
+        for t in range(trips):
+            for k in range(stops_per_trip):
+                seconds = 6 * 3600 + (t % 48) * 900 + k * 60
+                hhmmss = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:00"
+                lines.append(f"t{t},{hhmmss},{hhmmss},s{(t * 7 + k) % stop_count},{k}\n")
+        zf.writestr("stop_times.txt", "".join(lines))
+    return str(path)
+
+def write_all_day_feed(path):
+    """One stop with a 504 departure every 10 minutes, every day (lookups work at any wall-clock time)"""
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("stops.txt", "stop_id,stop_code,stop_name,stop_lat,stop_lon\ns1,1001,King St West at Bay St,43.6486,-79.3817\n")
+        zf.writestr("routes.txt", FEED["routes.txt"])
+        zf.writestr("calendar.txt", "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+                                    "ALL,1,1,1,1,1,1,1,20200101,20351231\n")
+        zf.writestr("trips.txt", "route_id,service_id,trip_id,trip_headsign\n" + "".join(
+            f"r504,ALL,t{t},East\n" for t in range(168)))
+        zf.writestr("stop_times.txt", "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n" + "".join(
+            f"t{t},{t // 6:02d}:{t % 6 * 10:02d}:00,{t // 6:02d}:{t % 6 * 10:02d}:00,s1,1\n" for t in range(168)))
+    return str(path)
+
+@pytest.fixture
+def feed_path(tmp_path):
+    path = tmp_path / "ttc_gtfs.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, content in FEED.items():
+            zf.writestr(name, content)
+    return str(path)
+
+
+class TestGTFSSchedule:
+    """Test import, indexing and scheduled-departure lookups"""
+
+    def test_parse_gtfs_time(self):
+        assert parse_gtfs_time("08:05:00") == 8 * 3600 + 5 * 60
+        assert parse_gtfs_time("24:30:00") == 24 * 3600 + 30 * 60
+        assert parse_gtfs_time(" ") == -1
+
+    def test_next_departures_merge_routes_in_time_order(self, feed_path):
+        schedule = import_gtfs_zip(feed_path)
+        assert schedule.stop_count == 3
+        assert schedule.departure_count == 6  # untimed stop_time skipped
+
+        departures = schedule.next_departures("s1", when=datetime(2026, 10, 14, 8, 0), limit=3)
+        assert [(d.route_short_name, d.minutes_away) for d in departures] == [("504", 5.0), ("6", 12.0), ("504", 20.0)]
+        assert departures[1].headsign == "North - 6 Bay towards Dupont"
+
+        # Stop codes (NextBus stop ids) resolve to the same stop
+        assert schedule.next_departures("425", when=datetime(2026, 10, 14, 8, 0), limit=1)[0].minutes_away == 5.0
+        assert schedule.next_departures("unknown") == []
+
+    def test_after_midnight_trips_belong_to_previous_day(self, feed_path):
+        schedule = import_gtfs_zip(feed_path)
+        # Wednesday 00:20 still sees Tuesday's 24:30 trip
+        departures = schedule.next_departures("s1", when=datetime(2026, 10, 14, 0, 20), limit=1)
+        assert departures[0].minutes_away == 10.0
+        assert departures[0].departure_seconds == 24 * 3600 + 30 * 60
+
+    def test_calendar_exceptions(self, feed_path):
+        schedule = import_gtfs_zip(feed_path)
+        services = list(schedule.service_ids)
+        assert {services[i] for i in schedule.active_services(date(2026, 10, 13))} == {"WKDY"}
+        assert {services[i] for i in schedule.active_services(date(2026, 10, 12))} == {"SAT"}
+
+        holiday = schedule.next_departures("s1", when=datetime(2026, 10, 12, 8, 0), limit=3)
+        assert [d.departure_seconds for d in holiday] == [9 * 3600]
+
+    def test_save_and_load_round_trip(self, feed_path, tmp_path):
+        schedule = import_gtfs_zip(feed_path)
+        path = str(tmp_path / "schedule.npz")
+        schedule.save(path)
+        loaded = GTFSSchedule.load(path)
+
+        when = datetime(2026, 10, 14, 8, 0)
+        assert loaded.next_departures("s1", when=when) == schedule.next_departures("s1", when=when)
+        assert loaded.feed_info["source"] == "ttc_gtfs.zip"
+        assert [str(loaded.route_short_names[r]) for r in loaded.routes_for_stop("s1")] == ["504", "6"]
+
+    def test_chunked_import_matches_single_pass(self, tmp_path):
+        path = write_large_feed(tmp_path / "large.zip", trips=300)
+        whole = import_gtfs_zip(path)
+        chunked = import_gtfs_zip(path, chunk_rows=777)
+
+        for name in ("stop_key_offsets", "key_service", "key_offsets", "dep_seconds", "dep_trip"):
+            assert (getattr(whole, name) == getattr(chunked, name)).all(), name
+        assert chunked.feed_info["stop_times_rows"] == 300 * 40
+        assert chunked.feed_info["stop_times_rows_per_sec"] > 0
+
+        # Every stop's run is sorted by (service, time)
+        for key in range(len(chunked.key_service)):
+            times = chunked.dep_seconds[chunked.key_offsets[key]:chunked.key_offsets[key + 1]]
+            assert (times[:-1] <= times[1:]).all()
+
+    def test_import_memory_does_not_scale_with_feed(self, tmp_path):
+        small = write_large_feed(tmp_path / "small.zip", trips=100)
+        large = write_large_feed(tmp_path / "large.zip", trips=500)
+
+        peaks = []
+        for path in (small, large):
+            tracemalloc.start()
+            try:
+                import_gtfs_zip(path, chunk_rows=1000)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        # 16,000 more rows; only the 12 bytes/row of output arrays may grow
+        # (holding the rows as Python objects would cost well over 100 bytes each)
+        extra_rows = (500 - 100) * 40
+        assert peaks[1] - peaks[0] < extra_rows * 40
+
+    def test_client_returns_nextbus_shaped_rows(self, feed_path):
+        client = GTFSStaticClient(import_gtfs_zip(feed_path))
+        rows = client.get_transit_data_for_location(43.6486, -79.3817, radius_m=700, when=datetime(2026, 10, 14, 8, 0))
+
+        assert [row['stop_name'] for row in rows] == ["King St West at Bay St", "Union Station"]
+        first = rows[0]
+        assert first['stop_id'] == "425"
+        assert first['data_source'] == "gtfs_static"
+        assert first['predictions'][0]['route_tag'] == "504"
+        assert first['predictions'][0]['route_title'] == "504-King"
+        assert first['predictions'][0]['arrival_minutes'] == 5.0
+
+        assert [stop['stop_id'] for stop in client.get_stops_nearby(43.6486, -79.3817, radius=0.2)] == ["s1"]
+        assert {route['route_short_name'] for route in client.get_routes_for_stop("s1")} == {"504", "6"}
+
+    def test_client_without_feed_is_empty(self, tmp_path, monkeypatch):
+        from src.api import gtfs_static
+        from src.config.settings import Settings
+        monkeypatch.setattr(Settings, "GTFS_ZIP_PATH", str(tmp_path / "missing.zip"))
+        monkeypatch.setattr(Settings, "GTFS_SCHEDULE_CACHE", str(tmp_path / "missing.npz"))
+        gtfs_static.reset_gtfs_schedule()
+        try:
+            client = GTFSStaticClient()
+            assert not client.available()
+            assert client.get_transit_data_for_location(43.6486, -79.3817) == []
+        finally:
+            gtfs_static.reset_gtfs_schedule()
+
+    def test_request_path_never_imports(self, feed_path, tmp_path, monkeypatch):
+        """A feed without saved tables is imported on a background thread; lookups get None until it lands"""
+        import threading
+        from src.api import gtfs_static
+        from src.config.settings import Settings
+        monkeypatch.setattr(Settings, "GTFS_ZIP_PATH", str(feed_path))
+        monkeypatch.setattr(Settings, "GTFS_SCHEDULE_CACHE", str(tmp_path / "schedule.npz"))
+        monkeypatch.setattr(Settings, "GTFS_SCHEDULE_CHECK_INTERVAL", 0)
+        release = threading.Event()
+        importing_threads = []
+
+        def slow_import(path, **kwargs):
+            importing_threads.append(threading.current_thread())
+            release.wait(5)
+            return import_gtfs_zip(path, **kwargs)
+
+        monkeypatch.setattr(gtfs_static, "import_gtfs_zip", slow_import)
+        gtfs_static.reset_gtfs_schedule()
+        try:
+            assert gtfs_static.get_gtfs_schedule() is None
+            assert gtfs_static.get_gtfs_schedule() is None  # Still importing: no second import started
+            release.set()
+            gtfs_static._import_thread.join(5)
+
+            schedule = gtfs_static.get_gtfs_schedule()
+            assert schedule is not None and schedule.stop_count == 3
+            assert importing_threads and threading.current_thread() not in importing_threads
+            assert len(importing_threads) == 1
+        finally:
+            release.set()
+            gtfs_static.reset_gtfs_schedule()
+
+    def test_feed_imported_later_is_picked_up(self, feed_path, tmp_path, monkeypatch):
+        """No tables at first; once import_gtfs.py writes them the next check loads them"""
+        from src.api import gtfs_static
+        from src.config.settings import Settings
+        cache_path = str(tmp_path / "schedule.npz")
+        monkeypatch.setattr(Settings, "GTFS_ZIP_PATH", str(tmp_path / "missing.zip"))
+        monkeypatch.setattr(Settings, "GTFS_SCHEDULE_CACHE", cache_path)
+        monkeypatch.setattr(Settings, "GTFS_SCHEDULE_CHECK_INTERVAL", 0)
+        gtfs_static.reset_gtfs_schedule()
+        try:
+            assert gtfs_static.get_gtfs_schedule() is None
+            import_gtfs_zip(feed_path).save(cache_path)
+            assert gtfs_static.get_gtfs_schedule().stop_count == 3
+        finally:
+            gtfs_static.reset_gtfs_schedule()
+
+
+class TestRealtimeOutageFallback:
+    """UnifiedTTCService serves the schedule when NextBus lists stops but has no predictions"""
+
+    def setup_method(self):
+        import requests
+        from src.api import dynamic_transit
+        from src.api.dynamic_transit import TransitStop
+        from src.api.prediction_cache import prediction_cache
+        from src.api.vehicle_poller import VehicleLocationPoller
+        from src.utils.http_client import transport
+
+        def outage(url, **kwargs):
+            raise requests.ConnectionError("NextBus is down")
+
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        self._patch.setattr(dynamic_transit, "HTTPX_AVAILABLE", False)  # Sync path goes through the shared transport
+        self._patch.setattr(transport, "get", outage)
+        poller = VehicleLocationPoller("http://nextbus.invalid", "ttc")
+        self._patch.setattr(poller, "get_vehicles", lambda: {})
+        self._patch.setattr(dynamic_transit, "get_vehicle_poller", lambda *args: poller)
+        prediction_cache.clear()
+
+        self.service = UnifiedTTCService()
+        nextbus = self.service.nextbus_service
+        nextbus.routes_cache = {"504": object()}
+        nextbus.stops_cache = {"1001": TransitStop("1001", "1001", "King St West At Bay St", 43.6486, -79.3817, ["504"])}
+        nextbus._build_spatial_index()
+
+    def teardown_method(self):
+        from src.api.prediction_cache import prediction_cache
+        prediction_cache.clear()
+        self._patch.undo()
+
+    def test_nextbus_failure_falls_back_to_schedule(self, tmp_path):
+        self.service.gtfs = GTFSStaticClient(import_gtfs_zip(write_all_day_feed(tmp_path / "ttc_gtfs.zip")))
+        rows = self.service.get_transit_data_for_location(43.6486, -79.3817)
+
+        assert [row['stop_id'] for row in rows] == ["1001"]
+        assert rows[0]['data_source'] == "gtfs_static"
+        assert rows[0]['predictions'] and rows[0]['predictions'][0]['route_tag'] == "504"
+
+    def test_stops_kept_when_schedule_has_nothing(self):
+        self._patch.setattr(self.service.gtfs, "get_transit_data_for_location", lambda *args, **kwargs: [])
+        rows = self.service.get_transit_data_for_location(43.6486, -79.3817)
+        assert [(row['stop_id'], row['data_source'], row['predictions']) for row in rows] == [("1001", "nextbus", [])]
+
+    def test_live_predictions_skip_schedule(self):
+        live = [{'stop_id': "1001", 'predictions': [{'route_tag': "504"}], 'data_source': "nextbus"}]
+        self._patch.setattr(self.service.nextbus_service, "get_transit_data_for_location", lambda *args, **kwargs: live)
+        self._patch.setattr(self.service.gtfs, "get_transit_data_for_location",
+                            lambda *args, **kwargs: pytest.fail("schedule consulted while NextBus is up"))
+        assert self.service.get_transit_data_for_location(43.6486, -79.3817) == live
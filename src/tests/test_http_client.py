@@ -0,0 +1,105 @@
+"""
+Tests for the shared HTTP transport
+Uses a local HTTP server so connection reuse can be observed
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.http_client import HTTPTransport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.active -= 1
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPTransport:
+    """Test pooling, timeouts and counters"""
+
+    def setup_method(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/feed"
+        self.transport = HTTPTransport(pool_maxsize=4, max_per_host=4, connect_timeout=1, read_timeout=2)
+
+    def teardown_method(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        """Sequential requests share one kept-alive connection"""
+        for _ in range(5):
+            assert self.transport.get(self.url).json() == {"ok": True}
+        host = f"127.0.0.1:{self.server.server_port}"
+        stats = self.transport.stats()[host]
+        assert stats['requests'] == 5
+        assert stats['connections'] == 1
+        assert stats['reused'] == 4
+
+    def test_async_requests_share_limit_and_counters(self):
+        """aget holds the same per-host semaphore as get and shows up in stats()"""
+        httpx = pytest.importorskip("httpx")
+        transport = HTTPTransport(pool_maxsize=4, max_per_host=2, connect_timeout=1, read_timeout=2)
+        _Handler.delay, _Handler.peak = 0.05, 0
+
+        async def burst():
+            async with httpx.AsyncClient() as client:
+                sync_request = asyncio.to_thread(transport.get, self.url)
+                responses = await asyncio.gather(sync_request, *(transport.aget(client, self.url) for _ in range(5)))
+                return [response.json() for response in responses]
+
+        try:
+            assert asyncio.run(burst()) == [{"ok": True}] * 6
+            stats = transport.stats()[f"127.0.0.1:{self.server.server_port}"]
+        finally:
+            _Handler.delay = 0.0
+            transport.close()
+        assert _Handler.peak <= 2
+        assert stats['requests'] == 6
+        assert 2 <= stats['connections'] <= 3  # One urllib3 socket, at most two httpx ones
+
+    def test_timeout_normalisation(self):
+        """A bare timeout is the read timeout; connect comes from settings"""
+        assert self.transport._timeout(None) == (1, 2)
+        assert self.transport._timeout(15) == (1, 15)
+        assert self.transport._timeout((2, 3)) == (2, 3)
+
+    def test_gzip_is_negotiated(self):
+        """Requests advertise gzip support"""
+        assert "gzip" in self.transport.session.headers["Accept-Encoding"]
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,137 @@
+"""
+Tests for offline reverse geocoding
+"""
+
+import threading
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.geocoding.gazetteer import Gazetteer
+from src.geocoding.local_reverse import LocalReverseGeocoder, load_address_points
+
+STOPS = [
+    SimpleNamespace(title="Spadina Ave At College St", lat=43.6579, lon=-79.4003),
+    SimpleNamespace(title="College St At Spadina Ave", lat=43.6581, lon=-79.3999),
+    SimpleNamespace(title="Spadina Ave At Queen St West", lat=43.6486, lon=-79.3962),
+    SimpleNamespace(title="Spadina Station", lat=43.6672, lon=-79.4037),
+]
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer.from_stops(STOPS)
+
+
+class TestLocalReverseGeocoder:
+    """Nearest address point first, then the nearest stop place"""
+
+    def test_nearest_intersection(self, gazetteer):
+        local = LocalReverseGeocoder(gazetteer).reverse(43.6583, -79.4010)
+
+        assert local.label == "Spadina Ave & College St, Toronto"
+        assert local.kind == "intersection"
+        assert 50 < local.distance_m < 100
+        # The label resolves back offline
+        assert gazetteer.resolve(local.label).kind == "intersection"
+
+    def test_named_stop_and_landmarks_skipped(self, gazetteer):
+        geocoder = LocalReverseGeocoder(gazetteer)
+        assert geocoder.reverse(43.6670, -79.4035).label == "Spadina Station, Toronto"
+        # Next to the CN Tower, but the closest stop place is 1 km away
+        assert geocoder.reverse(43.6426, -79.3871) is None
+
+    def test_address_points_win_when_close(self, gazetteer, tmp_path):
+        path = tmp_path / "address_points.csv"
+        path.write_text("ADDRESS_NUMBER,LINEAR_NAME_FULL,LATITUDE,LONGITUDE\n"
+                        "399,College St,43.6578,-79.4006\n"
+                        "oops,bad row,,\n")
+        geocoder = LocalReverseGeocoder(gazetteer, str(path))
+
+        near = geocoder.reverse(43.6579, -79.4007)
+        assert (near.label, near.kind) == ("399 College St, Toronto", "address")
+        # Beyond ADDRESS_POINT_MAX_DISTANCE_M the intersection is used
+        assert geocoder.reverse(43.6486, -79.3965).kind == "intersection"
+
+    def test_address_point_columns(self, tmp_path):
+        path = tmp_path / "points.csv"
+        path.write_text("address,lat,lng\n1 Yonge St,43.6424,-79.3745\n")
+        assert load_address_points(str(path)) == [(43.6424, -79.3745, "1 Yonge St")]
+
+        path.write_text("name,x,y\nfoo,1,2\n")
+        with pytest.raises(ValueError):
+            load_address_points(str(path))
+
+    def test_unreadable_address_file_falls_back(self, gazetteer, tmp_path):
+        path = tmp_path / "points.csv"
+        path.write_text("name,x,y\n")
+        assert LocalReverseGeocoder(gazetteer, str(path)).reverse(43.6579, -79.4003).kind == "intersection"
+
+
+class TestGeocodingServiceLocalReverse:
+    """reverse_geocode_local never waits on Nominatim and refines in the background"""
+
+    def test_local_label_then_refined_address(self, monkeypatch, tmp_path):
+        from src.geocoding import service as geocoding
+        from src.geocoding.store import GeocodeStore
+        from src.utils.rate_limit import RateLimiter
+
+        store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+        monkeypatch.setattr(geocoding, "nominatim_limiter", RateLimiter(0.0))
+        geo = geocoding.GeocodingService(gazetteer=Gazetteer.from_stops(STOPS))
+
+        release = threading.Event()
+        refined = "Spadina Avenue, Kensington Market, Old Toronto, Toronto"
+        def slow_nominatim(lat, lon, cache_key):
+            release.wait(5)
+            geo._remember(cache_key, (lat, lon), refined)
+            return refined
+        monkeypatch.setattr(geo, "_reverse_geocode_uncached", slow_nominatim)
+
+        lat, lon = 43.658123, -79.400456
+        assert geo.reverse_geocode_local(lat, lon) == "Spadina Ave & College St, Toronto"
+        assert geo.cached_reverse_geocode(lat, lon) is None
+
+        release.set()
+        geocoding._refine_executor.submit(lambda: None).result(timeout=5)  # Drain the worker
+        assert geo.cached_reverse_geocode(lat, lon) == refined
+        assert geo.reverse_geocode_local(lat, lon) == refined
+
+    def test_refinements_are_deduplicated_and_bounded(self, monkeypatch, tmp_path):
+        from src.config.settings import Settings
+        from src.geocoding import service as geocoding
+        from src.geocoding.store import GeocodeStore
+        from src.utils.rate_limit import RateLimiter
+
+        store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+        monkeypatch.setattr(geocoding, "nominatim_limiter", RateLimiter(0.0))
+        monkeypatch.setattr(Settings, "REVERSE_GEOCODE_REFINE_MAX_PENDING", 2)
+        geo = geocoding.GeocodingService(gazetteer=Gazetteer.from_stops(STOPS))
+
+        release = threading.Event()
+        looked_up = []
+        def slow_nominatim(lat, lon, cache_key):
+            release.wait(5)
+            looked_up.append((lat, lon))
+            return None
+        monkeypatch.setattr(geo, "_reverse_geocode_uncached", slow_nominatim)
+
+        try:
+            assert geo._refine_in_background(43.658123, -79.400456, geo._reverse_cache_key(43.658123, -79.400456))
+            for _ in range(3):  # Reruns of the same page
+                geo.reverse_geocode_local(43.658123, -79.400456)
+            geo.reverse_geocode_local(43.658150, -79.400500)  # GPS jitter, ~5 m away
+            geo.reverse_geocode_local(43.648600, -79.396200)  # Another place: queued
+            geo.reverse_geocode_local(43.667200, -79.403700)  # Queue full: skipped
+            assert len(geocoding._refine_pending) == 2
+        finally:
+            release.set()
+            geocoding._refine_executor.submit(lambda: None).result(timeout=5)  # Drain the worker
+
+        assert looked_up == [(43.658123, -79.400456), (43.6486, -79.3962)]
+        assert geocoding._refine_pending == {}
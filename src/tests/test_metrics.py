@@ -0,0 +1,120 @@
+"""
+Tests for the metrics registry and its HTTP endpoint
+"""
+
+import pytest
+import requests
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.nextbus_stub import NextBusStub
+from src.utils.cache import LRUTTLCache
+from src.utils.http_client import HTTPTransport
+from src.utils.metrics import (
+    CACHE_REQUESTS, UPSTREAM_REQUESTS, MetricsRegistry, MetricsServer, registry, upstream_labels
+)
+from src.utils.tracing import span
+
+
+class TestMetrics:
+    """Test metric types, exposition format and instrumentation points"""
+
+    def test_counter_gauge_histogram_exposition(self):
+        metrics = MetricsRegistry()
+        requests_total = metrics.counter("test_requests_total", "Requests", ("command",))
+        requests_total.inc(command="routeList")
+        requests_total.inc(2, command="routeList")
+        metrics.gauge("test_age_seconds", "Age").set_function(lambda: 4.5)
+        latency = metrics.histogram("test_latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+        latency.observe(0.05, stage="search")
+        latency.observe(0.5, stage="search")
+        latency.observe(3.0, stage="search")
+
+        text = metrics.render()
+        assert "# TYPE test_requests_total counter" in text
+        assert 'test_requests_total{command="routeList"} 3' in text
+        assert "test_age_seconds 4.5" in text
+        assert 'test_latency_seconds_bucket{stage="search",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{stage="search",le="1"} 2' in text
+        assert 'test_latency_seconds_bucket{stage="search",le="+Inf"} 3' in text
+        assert 'test_latency_seconds_count{stage="search"} 3' in text
+        assert 'test_latency_seconds_sum{stage="search"} 3.55' in text
+
+    def test_registry_rejects_conflicting_definitions(self):
+        metrics = MetricsRegistry()
+        counter = metrics.counter("test_total", "Things", ("kind",))
+        assert metrics.counter("test_total", "Things", ("kind",)) is counter
+        with pytest.raises(ValueError):
+            metrics.gauge("test_total", "Things", ("kind",))
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+
+    def test_upstream_labels(self):
+        assert upstream_labels("https://retro.umoiq.com/service/publicJSONFeed?command=predictions&a=ttc") == ("nextbus", "predictions")
+        assert upstream_labels("https://nominatim.openstreetmap.org/reverse?lat=1&lon=2") == ("nominatim", "reverse")
+        assert upstream_labels("https://maps.googleapis.com/maps/api/geocode/json?address=x") == ("google", "geocode")
+        assert upstream_labels("http://127.0.0.1:8000/other") == ("127.0.0.1", "")
+
+    def test_cache_lookups_counted_by_prefix(self):
+        cache = LRUTTLCache(name="test_prefix_cache")
+        cache.set("geocode:union station", (43.64, -79.38))
+        cache.get("geocode:union station")
+        cache.get("geocode:nowhere")
+        cache.get("unprefixed")
+
+        assert CACHE_REQUESTS.value(cache="test_prefix_cache", prefix="geocode", result="hit") == 1
+        assert CACHE_REQUESTS.value(cache="test_prefix_cache", prefix="geocode", result="miss") == 1
+        assert CACHE_REQUESTS.value(cache="test_prefix_cache", prefix="other", result="miss") == 1
+        assert registry.get("maple_mover_cache_entries").value(cache="test_prefix_cache") == 1
+
+    def test_transport_and_stages_recorded_and_served(self):
+        before = UPSTREAM_REQUESTS.value(upstream="nextbus", command="routeList", outcome="ok")
+        stages = registry.get("maple_mover_stage_duration_seconds")
+        stage_count = stages.count(stage="test_stage")
+
+        with NextBusStub() as stub:
+            transport = HTTPTransport()
+            with span("test_stage"):
+                transport.get(f"{stub.url}?command=routeList&a=ttc").raise_for_status()
+            transport.close()
+
+        assert UPSTREAM_REQUESTS.value(upstream="nextbus", command="routeList", outcome="ok") == before + 1
+        assert stages.count(stage="test_stage") == stage_count + 1
+
+        server = MetricsServer(host="127.0.0.1", port=0).start()
+        try:
+            response = requests.get(f"http://127.0.0.1:{server.port}/metrics", timeout=5)
+            missing = requests.get(f"http://127.0.0.1:{server.port}/nope", timeout=5)
+        finally:
+            server.stop()
+
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert 'maple_mover_upstream_requests_total{upstream="nextbus",command="routeList",outcome="ok"}' in response.text
+        assert 'maple_mover_stage_duration_seconds_count{stage="test_stage"}' in response.text
+        assert missing.status_code == 404
+
+    def test_failed_bind_is_not_retried(self, monkeypatch):
+        """A taken port is tried once per process, not on every rerun"""
+        from src.utils import metrics
+        from src.config.settings import Settings
+
+        taken = MetricsServer(host="127.0.0.1", port=0).start()
+        attempts = []
+        real_start = MetricsServer.start
+        monkeypatch.setattr(MetricsServer, "start", lambda server: attempts.append(server) or real_start(server))
+        monkeypatch.setattr(Settings, "METRICS_ENABLED", True)
+        monkeypatch.setattr(Settings, "METRICS_PORT", taken.port)
+        monkeypatch.setattr(metrics, "_server", None)
+        monkeypatch.setattr(metrics, "_server_failed", False)
+        try:
+            assert metrics.start_metrics_server() is None
+            assert metrics.start_metrics_server() is None
+        finally:
+            taken.stop()
+
+        assert len(attempts) == 1
+        assert attempts[0].host == "127.0.0.1"  # Loopback unless METRICS_HOST opts in to more
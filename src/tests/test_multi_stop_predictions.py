@@ -0,0 +1,180 @@
+"""
+Tests for batched predictionsForMultiStops requests
+Chunking by URL length, splitting responses per stop and the per-stop fallback
+"""
+
+import json
+import pytest
+import requests
+import sys
+import os
+from urllib.parse import parse_qs, urlsplit
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api import dynamic_transit
+from src.api.dynamic_transit import NextBusTransitService, TransitStop
+from src.config.settings import Settings
+from src.utils.http_client import transport
+
+
+def _response(url, status, payload=None):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = json.dumps(payload or {}).encode()
+    return response
+
+def _prediction_obj(route_tag, stop_tag, minutes):
+    return {'routeTag': route_tag, 'routeTitle': f"{route_tag}-Route", 'stopTag': stop_tag,
+            'direction': {'title': 'East', 'prediction': {'minutes': str(minutes), 'seconds': str(minutes * 60), 'vehicle': '4401'}}}
+
+
+class TestMultiStopPredictions:
+    """Test chunk boundaries, per-stop splitting and fallback"""
+
+    def setup_method(self):
+        self.requests = []
+        self.responses = {}  # command -> callable(params) returning (status, payload)
+
+        def get(url, timeout=None, **kwargs):
+            params = parse_qs(urlsplit(url).query)
+            self.requests.append((params['command'][0], params))
+            status, payload = self.responses[params['command'][0]](params)
+            if status is None:
+                raise requests.ConnectionError("NextBus is down")
+            return _response(url, status, payload)
+
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        self._patch.setattr(transport, "get", get)
+        self.service = NextBusTransitService()
+        self.stops = [
+            TransitStop("1001", "s1", "College St / Spadina Ave", 43.6578, -79.4003, ["506", "510"]),
+            TransitStop("1002", "s2", "College St / Huron St", 43.6581, -79.3985, ["506"]),
+            TransitStop("1003", "s3", "Spadina Ave / Nassau St", 43.6550, -79.4000, ["510"]),
+        ]
+
+    def teardown_method(self):
+        self._patch.undo()
+
+    def _pair_length(self, route_tag, stop):
+        return len("&stops=") + len(route_tag) + 3 + len(stop.stop_code)
+
+    def test_chunks_respect_pair_limit(self, monkeypatch):
+        """No chunk carries more pairs than NEXTBUS_MAX_STOPS_PER_REQUEST; pairs stay in order"""
+        monkeypatch.setattr(Settings, "NEXTBUS_MAX_STOPS_PER_REQUEST", 2)
+        chunks = self.service._chunk_multi_stop_pairs(self.stops)
+        pairs = [(stop.stop_id, route_tag) for chunk in chunks for stop, route_tag in chunk]
+
+        assert [len(chunk) for chunk in chunks] == [2, 2]
+        assert pairs == [("1001", "506"), ("1001", "510"), ("1002", "506"), ("1003", "510")]
+
+    def test_chunks_respect_url_length(self, monkeypatch):
+        """A pair that would push the URL past the limit starts a new chunk; the encoded URL fits"""
+        base = len(f"{self.service.api_url}?command=predictionsForMultiStops&a={self.service.agency}")
+        limit = base + self._pair_length("506", self.stops[0]) + self._pair_length("510", self.stops[0])
+        monkeypatch.setattr(Settings, "NEXTBUS_MAX_URL_LENGTH", limit)
+
+        chunks = self.service._chunk_multi_stop_pairs(self.stops)
+        assert [len(chunk) for chunk in chunks] == [2, 2]  # Exactly at the limit still fits
+        for chunk in chunks:
+            stops_params = "".join(f"&stops={route_tag}%7C{stop.stop_code}" for stop, route_tag in chunk)
+            assert base + len(stops_params) <= limit
+
+        monkeypatch.setattr(Settings, "NEXTBUS_MAX_URL_LENGTH", limit - 1)
+        assert [len(chunk) for chunk in self.service._chunk_multi_stop_pairs(self.stops)] == [1, 1, 1, 1]
+
+    def test_stop_without_routes_makes_no_request(self):
+        """Stops with no routes produce no pairs and an empty result"""
+        lonely = TransitStop("1009", "s9", "Nowhere", 43.7, -79.4, [])
+        assert self.service._chunk_multi_stop_pairs([lonely]) == []
+        assert self.service._fetch_predictions_for_stops([lonely], {}) == {"1009": []}
+        assert self.requests == []
+
+    def test_batched_response_is_split_per_stop(self):
+        """One request; each prediction object lands on the stop and route it was asked for"""
+        self.responses['predictionsForMultiStops'] = lambda params: (200, {'predictions': [
+            _prediction_obj("506", "s1", 3),
+            _prediction_obj("510", "s1", 6),
+            _prediction_obj("506", "s2", 4),
+            _prediction_obj("510", "s2", 9),  # Not requested: 510 doesn't serve s2
+        ]})
+        predictions = self.service._fetch_predictions_for_stops(self.stops, {})
+
+        assert [command for command, _ in self.requests] == ['predictionsForMultiStops']
+        assert sorted(self.requests[0][1]['stops']) == ["506|s1", "506|s2", "510|s1", "510|s3"]
+        by_stop = {stop_id: sorted((p['route_tag'], p['arrival_minutes']) for p in preds) for stop_id, preds in predictions.items()}
+        assert by_stop == {"1001": [("506", 3.0), ("510", 6.0)], "1002": [("506", 4.0)], "1003": []}
+        assert all(p['stop_id'] == "1001" for p in predictions["1001"])
+
+    def test_single_object_response(self):
+        """NextBus returns a bare object instead of a list for a single result"""
+        self.responses['predictionsForMultiStops'] = lambda params: (200, {'predictions': _prediction_obj("506", "s2", 4)})
+        predictions = self.service._fetch_predictions_for_stops(self.stops[1:2], {})
+        assert [p['arrival_minutes'] for p in predictions["1002"]] == [4.0]
+
+    def test_chunks_are_merged(self, monkeypatch):
+        """Predictions for one stop split across chunks are combined"""
+        monkeypatch.setattr(Settings, "NEXTBUS_MAX_STOPS_PER_REQUEST", 1)
+        self.responses['predictionsForMultiStops'] = lambda params: (200, {'predictions': [
+            _prediction_obj(*params['stops'][0].split("|"), 5)
+        ]})
+        predictions = self.service._fetch_predictions_for_stops(self.stops[:1], {})
+
+        assert len(self.requests) == 2
+        assert sorted(p['route_tag'] for p in predictions["1001"]) == ["506", "510"]
+
+    def test_failed_batch_falls_back_per_stop(self):
+        """A failed batch is retried one stop at a time; a stop that still fails is left out"""
+        self.responses['predictionsForMultiStops'] = lambda params: (503, None)
+
+        def per_stop(params):
+            stop_id = params['stopId'][0]
+            if stop_id == "1003":
+                return (None, None)
+            return (200, {'predictions': _prediction_obj("506", {"1001": "s1", "1002": "s2"}[stop_id], 2)})
+
+        self.responses['predictions'] = per_stop
+        predictions = self.service._fetch_predictions_for_stops(self.stops, {})
+
+        assert sorted(params['stopId'][0] for command, params in self.requests if command == 'predictions') == ["1001", "1002", "1003"]
+        assert [p['arrival_minutes'] for p in predictions["1001"]] == [2.0]
+        assert [p['arrival_minutes'] for p in predictions["1002"]] == [2.0]
+        assert "1003" not in predictions  # Failed: not reported (or cached) as "no arrivals"
+
+    def test_stop_pairs_share_a_chunk(self, monkeypatch):
+        """A stop's routes never straddle a chunk boundary when the whole stop fits in one request"""
+        monkeypatch.setattr(Settings, "NEXTBUS_MAX_STOPS_PER_REQUEST", 3)
+        chunks = self.service._chunk_multi_stop_pairs(self.stops[1:] + self.stops[:1])
+        assert [[(stop.stop_id, route_tag) for stop, route_tag in chunk] for chunk in chunks] == [
+            [("1002", "506"), ("1003", "510")],
+            [("1001", "506"), ("1001", "510")],
+        ]
+
+    @pytest.mark.parametrize("fallback_ok", [True, False])
+    def test_stop_spanning_chunks_with_one_failure(self, monkeypatch, fallback_ok):
+        """Only the failed chunk's routes are refetched; the other chunk's predictions are kept once"""
+        monkeypatch.setattr(Settings, "NEXTBUS_MAX_STOPS_PER_REQUEST", 1)  # Stop 1001's two routes can't share a request
+
+        def batch(params):
+            route_tag, stop_tag = params['stops'][0].split("|")
+            if route_tag == "506":
+                return (503, None)
+            return (200, {'predictions': _prediction_obj(route_tag, stop_tag, 6)})
+
+        self.responses['predictionsForMultiStops'] = batch
+        # The per-stop feed always carries every route at the stop
+        self.responses['predictions'] = lambda params: (200, {'predictions': [
+            _prediction_obj("506", "s1", 3), _prediction_obj("510", "s1", 6),
+        ]}) if fallback_ok else (None, None)
+        predictions = self.service._fetch_predictions_for_stops(self.stops[:1], {})
+
+        routes = sorted((p['route_tag'], p['arrival_minutes']) for p in predictions["1001"])
+        assert routes == ([("506", 3.0), ("510", 6.0)] if fallback_ok else [("510", 6.0)])
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,84 @@
+"""
+Tests for the local NextBus stub server
+The real service is driven end to end against synthetic and recorded payloads
+"""
+
+import json
+import pytest
+import requests
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.nextbus_stub import NextBusStub, RecordedFixtures, fixture_key
+from src.api import dynamic_transit
+from src.api.dynamic_transit import NextBusTransitService
+from src.api.prediction_cache import prediction_cache
+from src.api.vehicle_poller import VehicleLocationPoller
+
+
+class TestNextBusStub:
+    """Test replay, fault injection and the service against the stub"""
+
+    def setup_method(self):
+        self.stub = NextBusStub().start()
+        self._patch = pytest.MonkeyPatch()
+        prediction_cache.clear()
+
+    def teardown_method(self):
+        self.stub.stop()
+        prediction_cache.clear()
+        self._patch.undo()
+
+    def test_service_against_synthetic_network(self):
+        """Discovery and a nearby search run fully offline"""
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        self._patch.setattr(dynamic_transit, "save_routes_cache", lambda *args: True)
+        poller = VehicleLocationPoller(self.stub.url, "ttc")
+        self._patch.setattr(poller, "start", lambda: None)
+        self._patch.setattr(dynamic_transit, "get_vehicle_poller", lambda *_: poller)
+
+        service = NextBusTransitService()
+        service.api_url = self.stub.url
+        service.discover_all_routes(max_workers=4)
+        assert len(service.routes_cache) > 20
+
+        data = service._get_transit_data_for_location_sync(43.6452, -79.3806)
+        assert 0 < len(data) <= 10
+        assert any(row['predictions'] for row in data)
+        stats = self.stub.stats()
+        assert stats['routeList'] == 1
+        assert stats['predictionsForMultiStops'] >= 1
+
+    def test_error_rate(self):
+        """error_rate=1 answers every request with 503"""
+        self.stub.error_rate = 1.0
+        response = requests.get(f"{self.stub.url}?command=routeList&a=ttc", timeout=5)
+        assert response.status_code == 503
+        assert self.stub.stats()['errors'] == 1
+
+    def test_recorded_fixture_replay(self, tmp_path):
+        """Recorded multi-stop responses also answer differently chunked requests"""
+        path = str(tmp_path / "nextbus.json")
+        fixtures = RecordedFixtures(path)
+        multi = [('command', 'predictionsForMultiStops'), ('a', 'ttc'), ('stops', '504|k1'), ('stops', '506|c1')]
+        fixtures.record(multi, {'predictions': [
+            {'routeTag': '504', 'stopTag': 'k1', 'direction': {'prediction': []}},
+            {'routeTag': '506', 'stopTag': 'c1', 'direction': {'prediction': []}},
+        ]})
+        fixtures.record([('command', 'vehicleLocations'), ('a', 'ttc'), ('t', '0')], {'vehicle': []})
+
+        replay = RecordedFixtures(path)
+        assert json.load(open(path))['version'] == 1
+        single = replay.lookup([('command', 'predictionsForMultiStops'), ('a', 'ttc'), ('stops', '506|c1')])
+        assert [p['stopTag'] for p in single['predictions']] == ['c1']
+        # vehicleLocations replays regardless of t=
+        assert replay.lookup([('command', 'vehicleLocations'), ('a', 'ttc'), ('t', '123')]) == {'vehicle': []}
+        assert fixture_key([('command', 'routeConfig'), ('a', 'ttc'), ('r', '504')]) == "command=routeConfig&r=504"
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
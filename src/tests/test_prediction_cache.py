@@ -0,0 +1,147 @@
+"""
+Tests for the stale-while-revalidate prediction cache
+"""
+
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api import prediction_cache as prediction_cache_module
+from src.api.prediction_cache import PredictionCache
+
+
+def _prediction(seconds, vehicle_id="4401"):
+    return {'route_tag': '506', 'arrival_seconds': float(seconds), 'arrival_minutes': float(seconds // 60),
+            'vehicle_id': vehicle_id, 'vehicle_lat': 0, 'vehicle_lon': 0, 'vehicle_heading': 0}
+
+
+class TestPredictionCache:
+    """Test fresh/stale windows, time adjustment and refresh claims"""
+
+    def setup_method(self):
+        self.now = 1000.0
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(prediction_cache_module.time, "time", lambda: self.now)
+        self.cache = PredictionCache(fresh_seconds=15, stale_seconds=90, max_stops=100)
+
+    def teardown_method(self):
+        self._patch.undo()
+
+    def test_miss_then_fresh(self):
+        """Unknown stops are misses; fresh ones are served without refresh"""
+        served, misses, stale = self.cache.serve(["1001"], {})
+        assert (served, misses, stale) == ({}, ["1001"], [])
+
+        self.cache.put("1001", [_prediction(300)])
+        self.now += 5
+        served, misses, stale = self.cache.serve(["1001"], {})
+        assert misses == [] and stale == []
+        assert served["1001"][0]['arrival_seconds'] == 295
+
+    def test_stale_is_adjusted_and_claimed_once(self):
+        """Stale answers are time-shifted and handed out for refresh only once"""
+        self.cache.put("1001", [_prediction(30), _prediction(300)])
+        self.now += 40
+        served, misses, stale = self.cache.serve(["1001"], {"4401": {"lat": "43.65", "lon": "-79.38", "heading": "90"}})
+        assert stale == ["1001"]
+        assert len(served["1001"]) == 1  # the 30 s arrival has already happened
+        assert served["1001"][0]['arrival_seconds'] == 260
+        assert served["1001"][0]['arrival_minutes'] == 4.0
+        assert served["1001"][0]['vehicle_lat'] == 43.65
+
+        _, _, stale_again = self.cache.serve(["1001"], {})
+        assert stale_again == []
+        self.cache.release(["1001"])
+        _, _, stale_released = self.cache.serve(["1001"], {})
+        assert stale_released == ["1001"]
+
+    def test_expired_entries_are_misses(self):
+        """Past the stale window the entry is dropped"""
+        self.cache.put("1001", [_prediction(300)])
+        self.now += 91
+        served, misses, _ = self.cache.serve(["1001"], {})
+        assert served == {} and misses == ["1001"]
+
+    def test_cached_lists_are_not_mutated(self):
+        """Serving returns copies, so the stored answer keeps its original times"""
+        original = [_prediction(300)]
+        self.cache.put("1001", original)
+        self.now += 20
+        self.cache.serve(["1001"], {})
+        assert original[0]['arrival_seconds'] == 300
+
+
+
+class _InlineExecutor:
+    """Runs background refreshes immediately so their outcome can be asserted"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class TestFailedFetchesAreNotCached:
+    """An upstream failure must not be stored as "no arrivals" """
+
+    def setup_method(self):
+        import requests
+        from src.api import dynamic_transit
+        from src.api.dynamic_transit import NextBusTransitService, TransitStop
+        from src.utils.http_client import transport
+
+        self.now = 1000.0
+        self.fail = False
+        self.calls = 0
+
+        def get(url, **kwargs):
+            self.calls += 1
+            if self.fail:
+                raise requests.ConnectionError("NextBus is down")
+            response = requests.Response()
+            response.status_code = 200
+            response._content = (b'{"predictions": {"routeTag": "506", "stopTag": "s1", '
+                                 b'"direction": {"title": "East", "prediction": {"minutes": "5", "seconds": "300", "vehicle": "4401"}}}}')
+            return response
+
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(prediction_cache_module.time, "time", lambda: self.now)
+        self._patch.setattr(prediction_cache_module, "_refresh_executor", _InlineExecutor())
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        self._patch.setattr(transport, "get", get)
+        prediction_cache_module.prediction_cache.clear()
+
+        self.service = NextBusTransitService()
+        self.stops = [TransitStop("1001", "s1", "College St / Spadina Ave", 43.6578, -79.4003, ["506"])]
+
+    def teardown_method(self):
+        prediction_cache_module.prediction_cache.clear()
+        self._patch.undo()
+
+    def test_failed_miss_is_not_cached(self):
+        """A failed first fetch returns nothing and the next search retries"""
+        self.fail = True
+        assert self.service.get_predictions_for_stops(self.stops, {}) == {}
+        _, misses, _ = prediction_cache_module.prediction_cache.serve(["1001"], {})
+        assert misses == ["1001"]
+
+    def test_stale_entry_survives_failed_refresh(self):
+        """A failed background refresh keeps serving the last good answer"""
+        first = self.service.get_predictions_for_stops(self.stops, {})
+        assert first["1001"][0]['arrival_seconds'] == 300
+
+        self.fail = True
+        self.now += 30  # Stale: served and refreshed (the refresh fails)
+        calls = self.calls
+        assert self.service.get_predictions_for_stops(self.stops, {})["1001"][0]['arrival_seconds'] == 270
+        assert self.calls > calls
+
+        self.now += 30
+        served = self.service.get_predictions_for_stops(self.stops, {})
+        assert served["1001"][0]['arrival_seconds'] == 240
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
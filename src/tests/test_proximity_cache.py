@@ -0,0 +1,126 @@
+"""
+Tests for the proximity reverse-geocode cache
+"""
+
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.geocoding.proximity_cache import ProximityCache
+
+UNION = (43.645200, -79.380600)
+QUEENS_PARK = (43.662100, -79.392300)
+METRE_LAT = 1 / 111_320  # degrees of latitude per metre
+
+def north(point, metres):
+    return point[0] + metres * METRE_LAT, point[1]
+
+
+class TestProximityCache:
+    """Lookups within the radius hit, the nearest point wins and the LRU bound holds"""
+
+    def test_jitter_within_radius_hits(self):
+        cache = ProximityCache(radius_m=25, max_points=10)
+        cache.put(*UNION, "Union Station")
+
+        assert cache.get(*UNION) == "Union Station"
+        assert cache.get(*north(UNION, 20)) == "Union Station"
+        assert cache.get(UNION[0], UNION[1] + 0.0002) == "Union Station"  # ~16 m east
+        assert cache.get(*north(UNION, 30)) is None
+
+    def test_hits_across_cell_boundaries(self):
+        cache = ProximityCache(radius_m=25, max_points=10)
+        # Step through several cell widths; each query is 15 m from the stored point
+        for step in range(10):
+            point = north(UNION, step * 7)
+            cache.clear()
+            cache.put(*point, "here")
+            assert cache.get(*north(point, 15)) == "here"
+            assert cache.get(*north(point, -15)) == "here"
+
+    def test_nearest_point_wins_and_nearby_puts_replace(self):
+        cache = ProximityCache(radius_m=25, max_points=10)
+        cache.put(*UNION, "a")
+        cache.put(*north(UNION, 40), "b")
+        assert cache.get(*north(UNION, 22)) == "b"
+        assert cache.get(*north(UNION, 18)) == "a"
+
+        cache.put(*north(UNION, 5), "a2")
+        assert len(cache) == 2
+        assert cache.get(*UNION) == "a2"
+
+    def test_least_recently_used_evicted(self):
+        cache = ProximityCache(radius_m=25, max_points=2)
+        cache.put(*UNION, "a")
+        cache.put(*north(UNION, 100), "b")
+        cache.get(*UNION)                        # "a" is now the most recent
+        cache.put(*north(UNION, 200), "c")
+
+        assert len(cache) == 2
+        assert cache.get(*north(UNION, 100)) is None
+        assert cache.get(*UNION) == "a"
+
+    def test_zero_radius_is_exact(self):
+        cache = ProximityCache(radius_m=0, max_points=10)
+        cache.put(*UNION, "a")
+        assert cache.get(*UNION) == "a"
+        assert cache.get(*north(UNION, 1)) is None
+
+
+class TestGeocodingServiceReverseCache:
+    """Repeat visits near a resolved point cost no upstream call, across restarts too"""
+
+    def test_nearby_lookups_skip_nominatim(self, monkeypatch, tmp_path):
+        from src.geocoding import service as geocoding
+        from src.geocoding.store import GeocodeStore
+
+        store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+        calls = []
+
+        class Response:
+            def raise_for_status(self):
+                pass
+            def json(self):
+                return {"display_name": "Queen's Park, Toronto"}
+
+        monkeypatch.setattr(geocoding.transport, "get", lambda url, **kwargs: calls.append(url) or Response())
+
+        geo = geocoding.GeocodingService()
+        assert geo.reverse_geocode(*QUEENS_PARK).startswith("Queen's Park")
+        assert geo.reverse_geocode(*north(QUEENS_PARK, 10)).startswith("Queen's Park")
+        assert len(calls) == 1
+
+        # A fresh service (new process) seeds its cache from the store
+        restarted = geocoding.GeocodingService()
+        assert restarted.reverse_geocode(*north(QUEENS_PARK, -12)).startswith("Queen's Park")
+        assert len(calls) == 1
+
+    def test_miss_is_counted_once(self, monkeypatch, tmp_path):
+        from src.geocoding import service as geocoding
+        from src.geocoding.store import GeocodeStore
+        from src.utils.metrics import CACHE_REQUESTS
+
+        store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+        monkeypatch.setattr(geocoding, "get_geocode_store", lambda: store)
+
+        class Response:
+            def raise_for_status(self):
+                pass
+            def json(self):
+                return {"display_name": "Union Station, Toronto"}
+
+        monkeypatch.setattr(geocoding.transport, "get", lambda url, **kwargs: Response())
+
+        labels = dict(cache="reverse_proximity", prefix="reverse_geocode")
+        misses = CACHE_REQUESTS.value(result="miss", **labels)
+        hits = CACHE_REQUESTS.value(result="hit", **labels)
+        geo = geocoding.GeocodingService()
+        geo.reverse_geocode(*UNION)
+        geo.reverse_geocode(*UNION)
+
+        assert CACHE_REQUESTS.value(result="miss", **labels) == misses + 1
+        assert CACHE_REQUESTS.value(result="hit", **labels) == hits + 1
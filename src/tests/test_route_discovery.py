@@ -0,0 +1,126 @@
+"""
+Tests for concurrent route discovery
+Upstream responses come from a fake shared transport
+"""
+
+import json
+import random
+import threading
+import time
+import types
+import pytest
+import requests
+import sys
+import os
+from urllib.parse import parse_qs, urlsplit
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api import dynamic_transit
+from src.api.dynamic_transit import NextBusTransitService
+from src.config.settings import Settings
+from src.utils.http_client import transport
+
+
+def _response(url, status, payload=None):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = json.dumps(payload or {}).encode()
+    return response
+
+
+class TestRouteDiscovery:
+    """Test concurrent routeConfig fan-out, retries and partial failures"""
+
+    def setup_method(self):
+        # 12 routes; every stop is shared by two neighbouring routes
+        self.tags = [str(500 + i) for i in range(12)]
+        self.configs = {
+            tag: {'route': {'tag': tag, 'stop': [
+                {'stopId': str(1000 + i + k), 'tag': f"s{i + k}", 'title': f"Stop {i + k}",
+                 'lat': str(43.6 + (i + k) * 1e-3), 'lon': str(-79.4 + (i + k) * 1e-3)}
+                for k in range(2)
+            ]}}
+            for i, tag in enumerate(self.tags)
+        }
+        self.failures = {}  # route tag -> number of failures before it succeeds (-1: always fails)
+        self.attempts = {}
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        self._patch.setattr(dynamic_transit, "save_routes_cache", lambda *args: True)
+        self._patch.setattr(transport, "get", self._get)
+        # Record backoff delays instead of sleeping; jitter fixed at its midpoint
+        self._patch.setattr(dynamic_transit, "time", types.SimpleNamespace(time=time.time, sleep=self.sleeps.append))
+        self._patch.setattr(dynamic_transit, "random", types.SimpleNamespace(uniform=lambda low, high: 1.0, randrange=random.randrange))
+
+    def teardown_method(self):
+        self._patch.undo()
+
+    def _get(self, url, timeout=None, **kwargs):
+        params = parse_qs(urlsplit(url).query)
+        if params['command'] == ['routeList']:
+            return _response(url, 200, {'route': [{'tag': tag, 'title': f"{tag}-Route"} for tag in self.tags]})
+
+        tag = params['r'][0]
+        with self.lock:
+            self.attempts[tag] = self.attempts.get(tag, 0) + 1
+            attempt = self.attempts[tag]
+        time.sleep(random.uniform(0, 0.005))  # Shuffle completion order across workers
+        failures = self.failures.get(tag, 0)
+        if failures < 0 or attempt <= failures:
+            raise requests.ConnectionError(f"route {tag} unavailable")
+        return _response(url, 200, self.configs[tag])
+
+    def _discover(self, max_workers):
+        service = NextBusTransitService()
+        service.discover_all_routes(max_workers=max_workers)
+        return service
+
+    @staticmethod
+    def _snapshot(service):
+        return (
+            [(tag, route.title, [stop.stop_id for stop in route.stops]) for tag, route in service.routes_cache.items()],
+            [(stop.stop_id, stop.stop_code, stop.title, stop.lat, stop.lon, stop.routes) for stop in service.stops_cache.values()],
+            service.route_stops_cache,
+        )
+
+    def test_concurrent_matches_serial(self):
+        """Fanned-out discovery builds exactly the caches a serial run does"""
+        serial = self._discover(max_workers=1)
+        concurrent = self._discover(max_workers=8)
+
+        assert list(serial.routes_cache) == self.tags
+        assert self._snapshot(concurrent) == self._snapshot(serial)
+        assert concurrent.routes_cache['501'].stops[0] is concurrent.routes_cache['500'].stops[1]
+        assert len(concurrent.spatial_index) == len(serial.stops_cache) == 13
+
+    def test_transient_failures_are_retried_with_backoff(self):
+        """A route that fails twice is retried with doubling delays and still discovered"""
+        self.failures['503'] = 2
+        service = self._discover(max_workers=4)
+
+        assert self.attempts['503'] == 3
+        assert '503' in service.routes_cache
+        base = Settings.ROUTE_DISCOVERY_BACKOFF
+        assert sorted(self.sleeps) == [base, base * 2]
+
+    def test_failed_route_does_not_drop_others(self):
+        """A route that never answers is skipped; every other route is kept"""
+        self.failures['505'] = -1
+        service = self._discover(max_workers=4)
+
+        assert self.attempts['505'] == Settings.ROUTE_DISCOVERY_RETRIES + 1
+        assert list(service.routes_cache) == [tag for tag in self.tags if tag != '505']
+        # Stops of the failed route are still known through their other route
+        assert service.stops_cache['1005'].routes == ['504']
+        assert service.stops_cache['1006'].routes == ['506']
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,89 @@
+"""
+Tests for incremental route-config refresh
+"""
+
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api import dynamic_transit
+from src.api.dynamic_transit import NextBusTransitService
+
+
+def _config(route_tag, stops):
+    return {'route': {'tag': route_tag, 'stop': [
+        {'stopId': stop_id, 'tag': f"t{stop_id}", 'title': title, 'lat': str(lat), 'lon': str(lon)}
+        for stop_id, title, lat, lon in stops
+    ]}}
+
+
+class TestRouteRefresh:
+    """refresh_routes patches the caches instead of rediscovering"""
+
+    def setup_method(self):
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        self._patch.setattr(dynamic_transit, "save_routes_cache", lambda *args: True)
+
+        self.route_list = [{'tag': '504', 'title': '504-King'}, {'tag': '506', 'title': '506-Carlton'}]
+        self.configs = {
+            '504': _config('504', [('1', 'King / Bay', 43.6486, -79.3795), ('2', 'King / Yonge', 43.6490, -79.3777)]),
+            '506': _config('506', [('3', 'College / Spadina', 43.6578, -79.4003)]),
+        }
+        self.fetched = []
+
+        self.service = NextBusTransitService()
+        self._patch.setattr(self.service, "_get_routes", lambda: {'route': self.route_list})
+        self._patch.setattr(self.service, "_get_route_config", self._get_route_config)
+        self.service.discover_all_routes(max_workers=1)
+        self.fetched.clear()
+
+    def teardown_method(self):
+        self._patch.undo()
+
+    def _get_route_config(self, route_tag, retries=0):
+        self.fetched.append(route_tag)
+        return self.configs.get(route_tag)
+
+    def test_only_new_routes_and_slice_are_fetched(self):
+        """A new route is fetched; with slice 0 existing ones are not"""
+        self.route_list.append({'tag': '510', 'title': '510-Spadina'})
+        self.configs['510'] = _config('510', [('3', 'College / Spadina', 43.6578, -79.4003), ('4', 'Spadina / Queen', 43.6486, -79.3960)])
+
+        old_stop = self.service.stops_cache['3']
+        summary = self.service.refresh_routes(slice_size=0, max_workers=1)
+        assert summary == {'added': 1, 'removed': 0, 'refreshed': 0}
+        assert self.fetched == ['510']
+        assert self.service.route_stops_cache['3'] == ['506', '510']
+        assert self.service.stops_cache['3'].routes == ['506', '510']
+        assert old_stop.routes == ['506']  # Searches on the old caches see unchanged stops
+        assert self.service.routes_cache['506'].stops[0] is self.service.stops_cache['3']
+        nearest = self.service.spatial_index.nearest(43.6486, -79.3960, 1)
+        assert nearest[0][1].stop_id == '4'
+
+    def test_rotating_slice_covers_every_route(self):
+        """Successive slices of one route cycle through all existing routes"""
+        self.service.refresh_routes(slice_size=1, max_workers=1)
+        self.service.refresh_routes(slice_size=1, max_workers=1)
+        assert sorted(self.fetched) == ['504', '506']
+
+    def test_removed_route_and_moved_stop(self):
+        """Dropped routes lose their orphan stops; changed stops are replaced"""
+        self.route_list[:] = [{'tag': '504', 'title': '504-King'}]
+        self.configs['504'] = _config('504', [('1', 'King / Bay (moved)', 43.6487, -79.3796), ('2', 'King / Yonge', 43.6490, -79.3777)])
+
+        summary = self.service.refresh_routes(slice_size=5, max_workers=1)
+        assert summary == {'added': 0, 'removed': 1, 'refreshed': 1}
+        assert '506' not in self.service.routes_cache
+        assert '3' not in self.service.stops_cache
+        assert self.service.stops_cache['1'].title == 'King / Bay (moved)'
+        assert self.service.routes_cache['504'].stops[0] is self.service.stops_cache['1']
+        assert len(self.service.spatial_index) == 2
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,118 @@
+"""
+Tests for the columnar routes cache format
+A save/load round trip must reproduce the caches with shared stop objects
+"""
+
+import json
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils import routes_cache
+from src.utils.routes_cache import TransitStop, RouteInfo, encode_routes_cache, decode_routes_cache
+
+
+def _sample_caches():
+    stops = {
+        "1001": TransitStop("1001", "s1", "Spadina Ave / College St", 43.6578, -79.4003, []),
+        "1002": TransitStop("1002", "s2", "Queen's Park Cres É", 43.6600, -79.3900, []),
+        "1003": TransitStop("1003", "s3", "King St / Bay St", 43.6486, -79.3795, []),
+    }
+    route_stops = {"1001": ["506", "510"], "1002": ["506"], "1003": ["504"]}
+    for stop_id, stop in stops.items():
+        stop.routes = route_stops[stop_id]
+    routes = {
+        "506": RouteInfo("506", "506-Carlton", [stops["1001"], stops["1002"]]),
+        "510": RouteInfo("510", "510-Spadina", [stops["1001"]]),
+        "504": RouteInfo("504", "504-King", [stops["1003"]]),
+    }
+    return routes, stops, route_stops
+
+
+class TestColumnarRoutesCache:
+    """Test encode/decode and on-disk round trip"""
+
+    def test_round_trip(self):
+        """Decoded caches match the originals"""
+        routes, stops, route_stops = _sample_caches()
+        data = encode_routes_cache(routes, stops, route_stops, "2026-01-01T00:00:00")
+        new_routes, new_stops, new_route_stops, timestamp = decode_routes_cache(data)
+
+        assert timestamp == "2026-01-01T00:00:00"
+        assert new_route_stops == route_stops
+        assert {k: v.to_dict() for k, v in new_stops.items()} == {k: v.to_dict() for k, v in stops.items()}
+        assert {k: v.to_dict() for k, v in new_routes.items()} == {k: v.to_dict() for k, v in routes.items()}
+
+    def test_routes_share_stop_objects(self):
+        """A stop served by several routes is one object, not a copy per route"""
+        data = encode_routes_cache(*_sample_caches(), "t")
+        new_routes, new_stops, _, _ = decode_routes_cache(data)
+        assert new_routes["506"].stops[0] is new_stops["1001"]
+        assert new_routes["510"].stops[0] is new_stops["1001"]
+
+    def test_rejects_other_formats(self):
+        """Non-columnar data is refused"""
+        with pytest.raises(ValueError):
+            decode_routes_cache(b"not a cache file")
+
+    def test_save_and_mmap_load(self, tmp_path, monkeypatch):
+        """save_routes_cache writes the binary file and load_routes_cache maps it back"""
+        monkeypatch.setattr(routes_cache, "redis_client", None)
+        monkeypatch.setattr(routes_cache, "CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(routes_cache, "ROUTES_CACHE_BINARY", str(tmp_path / "routes_cache.bin"))
+        monkeypatch.setattr(routes_cache, "ROUTES_CACHE_PICKLE", str(tmp_path / "routes_cache.pkl"))
+
+        routes, stops, route_stops = _sample_caches()
+        assert routes_cache.save_routes_cache(routes, stops, route_stops)
+        assert routes_cache.cache_exists()
+
+        new_routes, new_stops, new_route_stops, (lats, lons) = routes_cache.load_routes_cache()
+        assert set(new_routes) == set(routes)
+        assert new_stops["1002"].title == "Queen's Park Cres É"
+        assert new_route_stops == route_stops
+        assert lats.tolist() == [stop.lat for stop in new_stops.values()]
+        assert not lats.flags.writeable and not lons.flags.owndata  # Views of the read-only map
+
+    def test_spatial_index_reads_mapped_columns(self, tmp_path, monkeypatch):
+        """The service's spatial index is built over the mapped lat/lon columns, not copies"""
+        from src.api import dynamic_transit
+        monkeypatch.setattr(routes_cache, "redis_client", None)
+        monkeypatch.setattr(routes_cache, "CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(routes_cache, "ROUTES_CACHE_BINARY", str(tmp_path / "routes_cache.bin"))
+        monkeypatch.setattr(routes_cache, "ROUTES_CACHE_PICKLE", str(tmp_path / "routes_cache.pkl"))
+        routes_cache.save_routes_cache(*_sample_caches())
+
+        loaded = routes_cache.load_routes_cache()
+        monkeypatch.setattr(dynamic_transit, "load_routes_cache", lambda: loaded)
+        monkeypatch.setattr(dynamic_transit, "get_cache_age", lambda: 0)
+        service = dynamic_transit.NextBusTransitService()
+
+        assert np.shares_memory(service.spatial_index.lats, loaded[3][0])
+        assert [stop.stop_id for _, stop in service.find_nearby_stops(43.6578, -79.4003, 100)] == ["1001"]
+
+    def test_cache_age_from_redis_version(self, monkeypatch):
+        """With Redis there is no file to stat; the age comes from the saved version timestamp"""
+        from datetime import datetime, timedelta
+        saved = (datetime.now() - timedelta(days=8, hours=1)).isoformat()
+
+        class FakeRedis:
+            def get(self, key):
+                return saved.encode() if key == routes_cache.REDIS_VERSION_KEY else None
+
+        monkeypatch.setattr(routes_cache, "redis_client", FakeRedis())
+        assert routes_cache.get_cache_age() == 8
+
+    def test_no_per_query_columns_are_stored(self):
+        """Only static stop data is written (no per-search distance column)"""
+        data = encode_routes_cache(*_sample_caches(), "t")
+        header = json.loads(data[8:8 + int.from_bytes(data[4:8], 'little')])
+        assert "stop_distance" not in header['sections']
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
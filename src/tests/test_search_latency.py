@@ -0,0 +1,37 @@
+"""
+Tests for the search latency benchmark's reporting helpers
+"""
+
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.search_latency import CASES, _percentile, compare
+
+
+class TestSearchLatencyReport:
+    """Test percentiles and baseline comparison"""
+
+    def test_percentile_nearest_rank(self):
+        samples = list(range(1, 101))
+        assert _percentile(samples, 50) == 50
+        assert _percentile(samples, 95) == 95
+        assert _percentile(samples, 99) == 99
+        assert _percentile([7.0], 99) == 7.0
+
+    def test_compare_flags_p95_regressions_only(self):
+        baseline = {'results': {'find_transit': {'downtown': {'p95_ms': 100.0}, 'seneca_hill': {'p95_ms': 100.0}}}}
+        current = {'results': {'find_transit': {
+            'downtown': {'p95_ms': 125.0},
+            'seneca_hill': {'p95_ms': 105.0},
+            'union_station': {'p95_ms': 500.0},  # not in the baseline
+        }}}
+
+        assert compare(current, baseline, threshold=0.10) == ["find_transit/downtown"]
+
+    def test_cases_cover_documented_locations(self):
+        assert {"downtown", "union_station", "scarborough_marblemount", "seneca_hill"} <= set(CASES)
+        for lat, lon in CASES.values():
+            assert 43.58 < lat < 43.86 and -79.64 < lon < -79.11
@@ -0,0 +1,130 @@
+"""
+Tests for the process-wide service registry
+The registry is built once and only rebuilt when the routes cache version changes
+"""
+
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api import dynamic_transit
+from src.api.dynamic_transit import NextBusTransitService
+from src.geocoding import service as geocoding
+from src.geocoding.gazetteer import Gazetteer
+from src.services import registry as registry_module
+
+
+def _config(route_tag, stops):
+    return {'route': {'tag': route_tag, 'stop': [
+        {'stopId': stop_id, 'tag': f"t{stop_id}", 'title': title, 'lat': str(lat), 'lon': str(lon)}
+        for stop_id, title, lat, lon in stops
+    ]}}
+
+
+class TestServiceRegistry:
+    """Test shared registry reuse and hot-swap"""
+
+    def setup_method(self):
+        self.version = "v1"
+        self.builds = 0
+        self.route_list = [{'tag': '504', 'title': '504-King'}]
+        self.configs = {'504': _config('504', [('1', 'King / Bay', 43.6486, -79.3795)])}
+
+        def fake_init(registry):
+            self.builds += 1
+            registry.cache_version = registry_module.get_cache_version()
+            registry.nextbus = NextBusTransitService()
+            registry.nextbus._get_routes = lambda: {'route': self.route_list}
+            registry.nextbus._get_route_config = lambda route_tag, retries=0: self.configs.get(route_tag)
+            registry.nextbus.discover_all_routes(max_workers=1)
+            registry.geo = geocoding.GeocodingService(gazetteer=Gazetteer.from_stops(registry.nextbus.stops_cache.values()))
+            registry.stops_version = registry.nextbus.cache_version
+
+        def save(*args):
+            self.saves += 1
+            self.version = f"saved-{self.saves}"
+            return True
+
+        self.saves = 0
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(registry_module, "get_cache_version", lambda: self.version)
+        self._patch.setattr(dynamic_transit, "get_cache_version", lambda: self.version)
+        self._patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        self._patch.setattr(dynamic_transit, "save_routes_cache", save)
+        self._patch.setattr(registry_module.ServiceRegistry, "__init__", fake_init)
+        self._patch.setattr(geocoding, "get_geocode_store", lambda: None)
+        registry_module.reset_service_registry()
+
+    def teardown_method(self):
+        self._wait_for_rebuild()
+        registry_module.reset_service_registry()
+        self._patch.undo()
+
+    @staticmethod
+    def _wait_for_rebuild():
+        for thread in (registry_module._rebuild_thread, registry_module._geocoding_sync_thread):
+            if thread is not None:
+                thread.join(5)
+
+    def test_registry_is_shared(self):
+        """Repeated calls (reruns) return the same registry"""
+        first = registry_module.get_service_registry()
+        assert registry_module.get_service_registry() is first
+        assert self.builds == 1
+
+    def test_registry_hot_swaps_on_cache_refresh(self):
+        """A cache rewritten elsewhere builds a fresh registry in the background"""
+        first = registry_module.get_service_registry()
+        self.version = "v2"
+        assert registry_module.get_service_registry() is first  # Served while the rebuild runs
+        self._wait_for_rebuild()
+        second = registry_module.get_service_registry()
+        assert second is not first
+        assert second.cache_version == "v2"
+        assert registry_module.get_service_registry() is second
+        assert self.builds == 2
+
+    def test_own_route_refresh_keeps_registry(self):
+        """Saving an in-process refresh doesn't rebuild the registry and discard the patch"""
+        first = registry_module.get_service_registry()
+        old_stop = first.nextbus.stops_cache['1']
+
+        self.route_list.append({'tag': '510', 'title': '510-Spadina'})
+        self.configs['504'] = _config('504', [('1', 'King / Bay', 43.6486, -79.3795), ('2', 'King / Spadina', 43.6455, -79.3951)])
+        self.configs['510'] = _config('510', [('1', 'King / Bay', 43.6486, -79.3795), ('2', 'King / Spadina', 43.6455, -79.3951)])
+        first.nextbus.refresh_routes(slice_size=1, max_workers=1)
+
+        assert self.version == first.nextbus.cache_version != first.cache_version
+        assert registry_module.get_service_registry() is first
+        assert registry_module._rebuild_thread is None
+        assert self.builds == 1
+        assert sorted(first.nextbus.stops_cache['1'].routes) == ['504', '510']
+        assert old_stop.routes == ['504']  # Live stop objects are replaced, not edited
+
+    def test_refreshed_stops_reach_the_geocoder(self):
+        """A stop added by an in-process refresh becomes resolvable, suggestible and a local label"""
+        self._patch.setattr(geocoding.Settings, "REVERSE_GEOCODE_REFINE", False)  # No Nominatim lookups
+        first = registry_module.get_service_registry()
+        first.geo.autocomplete.add("220 Yonge St", 43.6544, -79.3807, "address")
+        assert first.geo.gazetteer.resolve("King and Spadina") is None
+
+        self.configs['504'] = _config('504', [('1', 'King / Bay', 43.6486, -79.3795), ('2', 'King St West At Spadina Ave', 43.6455, -79.3951)])
+        first.nextbus.refresh_routes(slice_size=1, max_workers=1)
+        assert registry_module.get_service_registry() is first
+        self._wait_for_rebuild()
+
+        assert first.geocoding_is_current()
+        hit = first.geo.gazetteer.resolve("King and Spadina")
+        assert hit and (hit.lat, hit.lon) == (43.6455, -79.3951)
+        assert first.geo.suggest("king spad")[0].label == hit.name
+        assert first.geo.suggest("220 yon")[0].label == "220 Yonge St"  # Geocoded addresses survive the rebuild
+        assert first.geo.reverse_geocode_local(43.6455, -79.3951).startswith(hit.name)
+        assert self.builds == 1
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,76 @@
+"""
+Tests for single-flight request coalescing
+"""
+
+import threading
+import time
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Concurrent callers of one key share a single call"""
+
+    def _run_concurrently(self, group, key, fn, n=8):
+        results, errors = [], []
+        barrier = threading.Barrier(n)
+
+        def worker():
+            barrier.wait()
+            try:
+                results.append(group.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results, errors
+
+    def test_concurrent_calls_coalesce(self):
+        """Eight concurrent callers trigger one upstream call"""
+        group = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"stop": "425"}
+
+        results, errors = self._run_concurrently(group, "predictions:425", fetch)
+        assert len(calls) == 1
+        assert errors == []
+        assert results == [{"stop": "425"}] * 8
+        assert group.in_flight() == 0
+
+    def test_errors_reach_every_waiter(self):
+        """An exception in the leader is raised in all callers"""
+        group = SingleFlight()
+
+        def fetch():
+            time.sleep(0.1)
+            raise RuntimeError("upstream down")
+
+        results, errors = self._run_concurrently(group, "geocode:union", fetch)
+        assert results == []
+        assert len(errors) == 8
+        assert all(isinstance(e, RuntimeError) for e in errors)
+
+    def test_sequential_calls_are_not_cached(self):
+        """Once a flight lands the next call runs fn again"""
+        group = SingleFlight()
+        assert group.do("k", lambda: 1) == 1
+        assert group.do("k", lambda: 2) == 2
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,102 @@
+# File: tests/test_spatial_index.py
+"""
+Maple Mover - Spatial Index Tests
+Grid index results must match a brute-force haversine scan
+"""
+
+import random
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.geo_utils import calculate_distance, calculate_distances, calculate_distance_matrix
+from src.utils.spatial_index import GridSpatialIndex
+
+
+class TestGridSpatialIndex:
+    """Test suite for GridSpatialIndex"""
+
+    def setup_method(self):
+        """Scatter stops over roughly the Toronto bounding box"""
+        rng = random.Random(42)
+        self.points = [
+            (rng.uniform(43.58, 43.85), rng.uniform(-79.64, -79.12), f"stop_{i}")
+            for i in range(3000)
+        ]
+        self.index = GridSpatialIndex.from_points(self.points)
+
+    def _brute_force(self, lat, lon):
+        return sorted(
+            (calculate_distance(lat, lon, p_lat, p_lon) * 1000, item)
+            for p_lat, p_lon, item in self.points
+        )
+
+    @pytest.mark.parametrize("lat,lon", [
+        (43.6452, -79.3806),   # Union Station
+        (43.7764, -79.2318),   # Scarborough Town Centre
+        (43.7942, -79.3487),   # Seneca Hill
+        (43.5900, -79.6300),   # corner of the box
+    ])
+    def test_within_radius_matches_brute_force(self, lat, lon):
+        """Every point inside the radius is found, in distance order"""
+        expected = [(d, item) for d, item in self._brute_force(lat, lon) if d <= 700]
+        result = self.index.within_radius(lat, lon, 700)
+        assert [item for _, item in result] == [item for _, item in expected]
+
+    @pytest.mark.parametrize("lat,lon", [
+        (43.6452, -79.3806),
+        (43.7764, -79.2318),
+        (43.5700, -79.6500),   # just outside the box, ring has to grow
+    ])
+    def test_nearest_matches_brute_force(self, lat, lon):
+        """k-nearest query returns the same k points as a full scan"""
+        expected = self._brute_force(lat, lon)[:10]
+        result = self.index.nearest(lat, lon, 10)
+        assert [item for _, item in result] == [item for _, item in expected]
+
+    def test_nearest_respects_max_radius(self):
+        """Nothing beyond max_radius_m is returned, even if fewer than k"""
+        result = self.index.nearest(43.6452, -79.3806, 50, max_radius_m=300)
+        assert all(distance <= 300 for distance, _ in result)
+        expected = [d for d, _ in self._brute_force(43.6452, -79.3806) if d <= 300]
+        assert len(result) == min(50, len(expected))
+
+    def test_empty_index(self):
+        """Queries on an empty index return nothing"""
+        index = GridSpatialIndex.from_points([])
+        assert index.nearest(43.65, -79.38, 5) == []
+        assert index.within_radius(43.65, -79.38, 500) == []
+
+
+class TestVectorizedDistances:
+    """Vectorized haversine must agree with the scalar version"""
+
+    def setup_method(self):
+        rng = random.Random(7)
+        self.lats = np.array([rng.uniform(43.58, 43.85) for _ in range(200)])
+        self.lons = np.array([rng.uniform(-79.64, -79.12) for _ in range(200)])
+
+    def test_calculate_distances(self):
+        """One-to-many distances match calculate_distance"""
+        result = calculate_distances(43.6532, -79.3832, self.lats, self.lons)
+        expected = [calculate_distance(43.6532, -79.3832, la, lo) for la, lo in zip(self.lats, self.lons)]
+        assert np.allclose(result, expected, atol=1e-9)
+
+    def test_calculate_distance_matrix(self):
+        """Pairwise matrix matches calculate_distance for every pair"""
+        matrix = calculate_distance_matrix(self.lats[:5], self.lons[:5], self.lats, self.lons)
+        assert matrix.shape == (5, 200)
+        for i in range(5):
+            for j in range(0, 200, 37):
+                assert matrix[i, j] == pytest.approx(
+                    calculate_distance(self.lats[i], self.lons[i], self.lats[j], self.lons[j]), abs=1e-9
+                )
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,116 @@
+"""
+Tests for per-stage request tracing
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+from structlog.testing import capture_logs
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.nextbus_stub import NextBusStub
+from src.api import dynamic_transit
+from src.api.async_nextbus import run_sync
+from src.api.dynamic_transit import NextBusTransitService
+from src.api.prediction_cache import prediction_cache
+from src.api.vehicle_poller import VehicleLocationPoller
+from src.utils.tracing import current_span, detached, mark_cache_hit, record_upstream_call, span, traced
+
+
+class TestTracing:
+    """Test span nesting, counters and the per-request summary"""
+
+    def test_nested_spans_roll_up_upstream_calls(self):
+        with span("search") as root:
+            with span("geocode"):
+                mark_cache_hit(False)
+                record_upstream_call()
+            with span("find_transit"):
+                with span("predictions") as predictions:
+                    record_upstream_call(2)
+
+        assert root.upstream_calls == 3
+        assert predictions.upstream_calls == 2
+        assert [child.stage for child in root.children] == ["geocode", "find_transit"]
+        assert root.children[0].cache_hit is False
+        assert set(root.stages()) == {"geocode", "find_transit", "predictions"}
+        assert current_span() is None
+
+    def test_summary_logged_once_per_request(self):
+        with capture_logs() as logs:
+            with span("search", source="manual"):
+                with span("render_map"):
+                    pass
+
+        summaries = [log for log in logs if log.get("slowest_stage")]
+        assert len(summaries) == 1
+        summary = summaries[0]
+        assert summary["stage"] == "search"
+        assert summary["source"] == "manual"
+        assert "render_map" in summary["stages"]
+        stage_lines = [log for log in logs if log["log_level"] == "debug"]
+        assert {log["stage"] for log in stage_lines} == {"search", "render_map"}
+        assert all("duration_ms" in log and "upstream_calls" in log for log in stage_lines)
+
+    def test_traced_decorator_and_errors(self):
+        @traced("sync_stage")
+        def sync_stage():
+            return current_span().stage
+
+        @traced("async_stage")
+        async def async_stage():
+            return current_span().stage
+
+        @traced("failing")
+        def failing():
+            raise ValueError("boom")
+
+        with span("search") as root:
+            assert sync_stage() == "sync_stage"
+            assert asyncio.run(async_stage()) == "async_stage"
+            with pytest.raises(ValueError):
+                failing()
+
+        assert root.children[-1].fields["error"] == "ValueError"
+
+    def test_context_follows_run_sync_and_detached_is_not_counted(self):
+        async def fetch():
+            record_upstream_call()
+            with detached():
+                record_upstream_call()
+
+        with span("search") as root:
+            run_sync(fetch())
+        assert root.upstream_calls == 1
+
+    def test_search_against_stub_counts_upstream_calls(self):
+        patch = pytest.MonkeyPatch()
+        patch.setattr(dynamic_transit, "load_routes_cache", lambda: (None, None, None, None))
+        patch.setattr(dynamic_transit, "save_routes_cache", lambda *args, **kwargs: True)
+        prediction_cache.clear()
+        try:
+            with NextBusStub() as stub:
+                poller = VehicleLocationPoller(stub.url, "ttc")
+                patch.setattr(dynamic_transit, "get_vehicle_poller", lambda *_: poller)
+                service = NextBusTransitService()
+                service.api_url = stub.url
+                service.discover_all_routes()
+                service._get_all_vehicle_locations()
+                stub.reset_stats()
+
+                with span("search") as root:
+                    service._get_transit_data_for_location_sync(43.6532, -79.3832)
+                served = stub.stats().get("predictionsForMultiStops", 0)
+        finally:
+            poller.stop()
+            patch.undo()
+            prediction_cache.clear()
+
+        assert root.upstream_calls == served > 0
+        assert {"find_nearby_stops", "vehicles", "predictions"} <= set(root.stages())
+        cache_hits = {child.stage: child.cache_hit for child in root.children}
+        assert cache_hits["vehicles"] is True
+        assert cache_hits["predictions"] is False
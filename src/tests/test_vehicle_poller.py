@@ -0,0 +1,171 @@
+"""
+Tests for the shared vehicle-location poller
+The transport is stubbed; time is controlled by the test
+"""
+
+import json
+import pytest
+import requests
+import sys
+import os
+from urllib.parse import parse_qs, urlsplit
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api import vehicle_poller as vehicle_poller_module
+from src.api.vehicle_poller import VehicleLocationPoller
+from src.utils.http_client import transport
+
+
+def _vehicle(vehicle_id, lat, secs_since_report=0, route_tag="506"):
+    return {'id': vehicle_id, 'lat': str(lat), 'lon': "-79.40", 'heading': "90", 'routeTag': route_tag,
+            'secsSinceReport': str(secs_since_report)}
+
+
+class TestVehicleLocationPoller:
+    """Test incremental merge, expiry and snapshots"""
+
+    def setup_method(self):
+        self.now = 1_000_000.0
+        self.feeds = []     # Responses handed out in order: dict payload or None (network error)
+        self.since = []     # t= of every request
+
+        def get(url, timeout=None, **kwargs):
+            self.since.append(int(parse_qs(urlsplit(url).query)['t'][0]))
+            payload = self.feeds.pop(0)
+            if payload is None:
+                raise requests.ConnectionError("NextBus is down")
+            response = requests.Response()
+            response.status_code = 200
+            response.url = url
+            response._content = json.dumps(payload).encode()
+            return response
+
+        self._patch = pytest.MonkeyPatch()
+        self._patch.setattr(transport, "get", get)
+        self._patch.setattr(vehicle_poller_module.time, "time", lambda: self.now)
+        self.poller = VehicleLocationPoller("http://nextbus.invalid/service", "ttc", interval=10, max_age=120)
+        self._patch.setattr(self.poller, "start", lambda: None)  # No background thread
+
+    def teardown_method(self):
+        self._patch.undo()
+
+    def test_incremental_polls_send_last_time_and_merge(self):
+        """First poll is the full feed; later ones pass lastTime as t= and update in place"""
+        self.feeds = [
+            {'vehicle': [_vehicle("4401", 43.650), _vehicle("4402", 43.660)], 'lastTime': {'time': "1700000000000"}},
+            {'vehicle': _vehicle("4401", 43.655), 'lastTime': {'time': "1700000010000"}},  # Bare object: one vehicle
+        ]
+        assert self.poller.poll_once()
+        self.now += 10
+        assert self.poller.poll_once()
+
+        assert self.since == [0, 1700000000000]
+        assert self.poller.next_since() == 1700000010000
+        vehicles = self.poller.snapshot()
+        assert vehicles["4401"]['lat'] == "43.655"
+        assert vehicles["4402"]['lat'] == "43.66"  # Not in the incremental response, kept
+
+    def test_silent_vehicles_expire(self):
+        """A vehicle that stops reporting is dropped after max_age; secsSinceReport counts"""
+        self.feeds = [
+            {'vehicle': [_vehicle("4401", 43.650), _vehicle("4402", 43.660, secs_since_report=100)], 'lastTime': {'time': "1"}},
+            {'vehicle': [_vehicle("4401", 43.651)], 'lastTime': {'time': "2"}},
+            {'vehicle': [_vehicle("4401", 43.652)], 'lastTime': {'time': "3"}},
+        ]
+        self.poller.poll_once()
+        self.now += 30  # 4402 last reported 130 s ago
+        self.poller.poll_once()
+        assert set(self.poller.snapshot()) == {"4401"}
+
+        self.now += 60
+        self.poller.poll_once()
+        assert set(self.poller.snapshot()) == {"4401"}
+
+    def test_full_feed_after_long_outage(self):
+        """Failed polls keep the table; past max_age the next poll starts over with t=0"""
+        self.feeds = [
+            {'vehicle': [_vehicle("4401", 43.650)], 'lastTime': {'time': "5"}},
+            None,
+            {'vehicle': [_vehicle("4403", 43.670)], 'lastTime': {'time': "9"}},
+        ]
+        self.poller.poll_once()
+        self.now += 10
+        assert not self.poller.poll_once()
+        assert set(self.poller.snapshot()) == {"4401"}
+
+        self.now += 200
+        self.poller.poll_once()
+        assert self.since == [0, 5, 0]
+        assert set(self.poller.snapshot()) == {"4403"}  # Full feed replaces the table
+
+    def test_snapshot_is_a_copy(self):
+        """Snapshots don't change under the caller when later polls land"""
+        self.feeds = [
+            {'vehicle': [_vehicle("4401", 43.650)], 'lastTime': {'time': "1"}},
+            {'vehicle': [_vehicle("4401", 43.700), _vehicle("4402", 43.660)], 'lastTime': {'time': "2"}},
+        ]
+        self.poller.poll_once()
+        before = self.poller.snapshot()
+        self.poller.poll_once()
+
+        assert set(before) == {"4401"} and before["4401"]['lat'] == "43.65"
+        assert set(self.poller.snapshot()) == {"4401", "4402"}
+
+    def test_get_vehicles_polls_once_when_empty(self):
+        """The first caller waits for the full feed; later callers read the table"""
+        self.feeds = [{'vehicle': [_vehicle("4401", 43.650)], 'lastTime': {'time': "1"}}]
+        assert not self.poller.has_data()
+        assert self.poller.age() == float('inf')
+
+        assert set(self.poller.get_vehicles()) == {"4401"}
+        assert set(self.poller.get_vehicles()) == {"4401"}
+        assert self.since == [0]
+        assert self.poller.has_data()
+        self.now += 4
+        assert self.poller.age() == 4
+
+    def test_outage_costs_searches_one_wait(self):
+        """A failed first feed is tried once; later callers get the empty table and leave retries to the thread"""
+        self.feeds = [None]
+        assert self.poller.get_vehicles() == {}
+        assert self.poller.get_vehicles() == {}
+        assert self.since == [0]
+
+        self.feeds = [{'vehicle': [_vehicle("4401", 43.650)], 'lastTime': {'time': "1"}}]
+        self.poller.poll_once()  # The background thread's retry
+        assert set(self.poller.get_vehicles()) == {"4401"}
+
+    def test_concurrent_callers_wait_for_the_first_poll(self):
+        """Callers arriving while the first feed is in flight wait for it instead of fetching again"""
+        import threading
+        started, release = threading.Event(), threading.Event()
+        real_poll = self.poller.poll_once
+
+        def slow_poll(**kwargs):
+            started.set()
+            release.wait(5)
+            return real_poll(**kwargs)
+
+        self._patch.setattr(self.poller, "poll_once", slow_poll)
+        self.feeds = [{'vehicle': [_vehicle("4401", 43.650)], 'lastTime': {'time': "1"}}]
+        results = {}
+        first = threading.Thread(target=lambda: results.setdefault("first", self.poller.get_vehicles()))
+        first.start()
+        assert started.wait(5)
+        second = threading.Thread(target=lambda: results.setdefault("second", self.poller.get_vehicles()))
+        second.start()
+        second.join(0.1)
+        assert second.is_alive()  # Waiting on the first caller, not polling
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        assert set(results["first"]) == set(results["second"]) == {"4401"}
+        assert self.since == [0]
+
+
+if __name__ == "__main__":
+    # Run tests if executed directly
+    pytest.main([__file__, "-v"])
@@ -8,6 +8,8 @@ from src.ui.layouts import LayoutComponents
 from src.ui.forms import FormComponents
 from src.ui.transit import TransitComponents
 from src.utils.cache import cache
+from src.utils.metrics import cache_hit_ratio, upstream_request_counts
+from src.utils.tracing import traced
 
 class UIComponents:
     """Main UI components coordinator"""
@@ -34,17 +36,31 @@ class UIComponents:
     # -------------------------------------------------------------------------
     # Search / Input Interface
     # -------------------------------------------------------------------------
-    def render_search_interface(self):
+    def render_search_interface(self, suggest=None):
         """Render the main search interface"""
-        return self.forms.render_search_interface()
+        return self.forms.render_search_interface(suggest)
+
+    def use_suggestion(self, suggestion):
+        """Search at a suggestion's coordinates instead of geocoding its label"""
+        self.forms.use_suggestion(suggestion)
+
+    def show_detected_location(self, geo, lat, lon, source):
+        """Use a detected location, labelled locally until Nominatim's address lands"""
+        return self.forms.show_detected_location(geo, lat, lon, source)
+
+    def apply_refined_address(self, geo):
+        """Swap a detected location's local label for the refined address once it is cached"""
+        self.forms.apply_refined_address(geo)
 
     # -------------------------------------------------------------------------
     # Transit / Results
     # -------------------------------------------------------------------------
+    @traced("render_transit_results")
     def render_transit_results(self, transit_data):
         """Render transit options results"""
         self.transit.render_transit_results(transit_data)
 
+    @traced("render_map")
     def render_map(self, lat, lon, transit_data):
         """Render map with transit options"""
         self.transit.render_map(lat, lon, transit_data)
@@ -111,6 +127,9 @@ class UIComponents:
     def render_performance_info(self):
         """Render performance and cache information"""
         cache_size = cache.size()
+        hit_ratio = cache_hit_ratio()
+        hit_rate = f"{hit_ratio:.0%}" if hit_ratio is not None else "—"
+        upstream_calls = int(sum(upstream_request_counts().values()))
         
         st.markdown("""
         <div style="background: linear-gradient(135deg, #F8FAFC, #F1F5F9); 
@@ -189,7 +208,7 @@ class UIComponents:
             """, unsafe_allow_html=True)
         
         with col2:
-            st.markdown("""
+            st.markdown(f"""
             <div style="background: white; padding: 1.5rem; border-radius: 8px; 
                         border: 1px solid #E5E7EB; margin-bottom: 1rem;">
                 <h5 style="color: #374151; margin-bottom: 1rem; font-weight: 600;">
@@ -202,6 +221,9 @@ class UIComponents:
                     <div style="color: #6B7280; font-size: 0.9rem;">
                         entries cached
                     </div>
+                    <div style="color: #6B7280; font-size: 0.8rem; margin-top: 0.5rem;">
+                        {hit_rate} hit rate · {upstream_calls} upstream calls
+                    </div>
                 </div>
             </div>
             """, unsafe_allow_html=True)
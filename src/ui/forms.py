@@ -5,7 +5,14 @@ import streamlit as st
 import streamlit.components.v1 as components
 
 class FormComponents:
-    def render_search_interface(self):
+    def render_search_interface(self, suggest=None):
+        """Search bar, buttons and, when suggest is given, place suggestions for the typed text
+
+        st.text_input only reruns the script on Enter or blur, so suggestions show up for the
+        submitted text rather than as you type. Submitted text that is exactly a suggestion's
+        label is resolved from it by the pages (GeocodingService.match_suggestion), and picking
+        another suggestion takes its coordinates; neither calls a geocoder.
+        """
         # --- PAGE TITLE ---
         st.markdown("""
         <div style="text-align:center; margin-bottom:1.5rem;">
@@ -26,6 +33,17 @@ class FormComponents:
             label_visibility="collapsed",
             key="search_input",
         )
+
+        # Suggestions for what was typed; picking one skips geocoding entirely
+        if suggest and address and address.strip() and address != detected_address:
+            for i, suggestion in enumerate(suggest(address)):
+                st.button(
+                    f"📍 {suggestion.label}",
+                    key=f"suggestion_{i}",
+                    on_click=self._pick_suggestion,
+                    args=(suggestion,),
+                    use_container_width=True,
+                )
         
         # Add JavaScript for Enter key detection
         st.markdown("""
@@ -100,3 +118,47 @@ class FormComponents:
         #     """, unsafe_allow_html=True)
 
         return address
+
+    def _pick_suggestion(self, suggestion):
+        """Button callback: runs before the rerun, so the search input can still be set"""
+        self.use_suggestion(suggestion)
+        st.session_state["search_input"] = suggestion.label
+
+    def use_suggestion(self, suggestion):
+        """Search at a suggestion's coordinates (safe after the search bar is drawn)"""
+        st.session_state.user_lat = suggestion.lat
+        st.session_state.user_lon = suggestion.lon
+        st.session_state.search_address = suggestion.label
+        st.session_state.location_source = "suggestion"
+        st.session_state.search_requested = False
+
+    def show_detected_location(self, geo, lat, lon, source):
+        """Use a detected location and label it in the search bar without waiting on Nominatim
+
+        The label is local (nearest stop or address point); apply_refined_address swaps in the
+        refined address on a later rerun. Call before render_search_interface: the search input
+        can't be written once it has been drawn.
+        """
+        addr = geo.reverse_geocode_local(lat, lon)
+        if addr:
+            st.session_state.search_address = addr
+            st.session_state["search_input"] = addr
+        st.session_state.refine_address = (lat, lon, addr)
+        st.session_state.location_source = source
+        st.session_state.user_lat = lat
+        st.session_state.user_lon = lon
+        return addr
+
+    def apply_refined_address(self, geo):
+        """Replace a detected location's local label with the refined address, unless the user edited it"""
+        pending = st.session_state.get("refine_address")
+        if not pending:
+            return
+        lat, lon, label = pending
+        refined = geo.cached_reverse_geocode(lat, lon)
+        if not refined:
+            return
+        st.session_state.refine_address = None
+        if refined != label and (st.session_state.get("search_input") or None) == label:
+            st.session_state.search_address = refined
+            st.session_state["search_input"] = refined
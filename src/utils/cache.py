@@ -1,71 +1,175 @@
 # File: src/utils/cache.py
 """
-Simple in-memory cache for geocoding and TTC data
+Bounded in-memory cache for geocoding and TTC data
 """
 
+import heapq
+import itertools
+import sys
+import threading
 import time
-from typing import Dict, Any, Optional
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 import structlog
+from src.config.settings import Settings
+from src.utils.metrics import CACHE_REQUESTS, registry
 
 logger = structlog.get_logger("maple_mover.cache")
 
-class SimpleCache:
-    """Simple in-memory cache with TTL support"""
-    
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._default_ttl = 300  # 5 minutes default
-    
+def _approx_size(value: Any, _depth: int = 0) -> int:
+    """Rough size of a cached value in bytes (containers are walked a few levels deep)"""
+    size = sys.getsizeof(value)
+    if _depth >= 3:
+        return size
+    if isinstance(value, dict):
+        size += sum(_approx_size(k, _depth + 1) + _approx_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_approx_size(item, _depth + 1) for item in value)
+    return size
+
+def _key_prefix(key: str) -> str:
+    """Metrics label for a key: the part before the first colon (geocode, predictions, ...)"""
+    prefix, sep, _ = key.partition(":")
+    return prefix if sep else "other"
+
+class LRUTTLCache:
+    """Thread-safe in-memory cache with TTL, LRU eviction and size limits
+
+    Entries live in an OrderedDict kept in recency order, so the least
+    recently used entry is always first. Expiry times go into a min-heap;
+    each get/set pops only the entries that are already due, so expired
+    keys are dropped even if nobody reads them again. Overwritten entries
+    leave stale heap records behind, which are skipped when popped and
+    compacted away once they outnumber live entries.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None, default_ttl: int = 300,
+                 name: str = "default"):
+        self.name = name  # metrics label
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._default_ttl = default_ttl  # 5 minutes default
+        self.max_entries = max_entries if max_entries is not None else Settings.CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes if max_bytes is not None else Settings.CACHE_MAX_BYTES
+        _instances.add(self)
+
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if not expired"""
-        if key not in self._cache:
-            return None
-            
-        entry = self._cache[key]
-        if time.time() > entry['expires_at']:
-            # Expired, remove from cache
-            del self._cache[key]
-            logger.debug(f"Cache expired for key: {key}")
-            return None
-            
-        logger.debug(f"Cache hit for key: {key}")
-        return entry['value']
-    
+        with self._lock:
+            self._expire(time.time())
+            entry = self._cache.get(key)
+            if entry is None:
+                CACHE_REQUESTS.inc(cache=self.name, prefix=_key_prefix(key), result="miss")
+                return None
+
+            self._cache.move_to_end(key)
+            CACHE_REQUESTS.inc(cache=self.name, prefix=_key_prefix(key), result="hit")
+            logger.debug(f"Cache hit for key: {key}")
+            return entry['value']
+
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Set value in cache with TTL"""
+        """Set value in cache with TTL, evicting least recently used entries if over limits"""
         if ttl is None:
             ttl = self._default_ttl
-            
-        expires_at = time.time() + ttl
-        self._cache[key] = {
-            'value': value,
-            'expires_at': expires_at,
-            'created_at': time.time()
-        }
+
+        now = time.time()
+        expires_at = now + ttl
+        size = _approx_size(key) + _approx_size(value)
+
+        with self._lock:
+            self._expire(now)
+            self._remove(key)
+
+            self._cache[key] = {
+                'value': value,
+                'expires_at': expires_at,
+                'created_at': now,
+                'size': size
+            }
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, next(self._seq), key))
+
+            self._evict()
+            if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+                self._compact_heap()
         logger.debug(f"Cached key: {key} (TTL: {ttl}s)")
-    
+
     def clear(self) -> None:
         """Clear all cached entries"""
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
         logger.info("Cache cleared")
-    
+
     def size(self) -> int:
         """Get number of cached entries"""
-        return len(self._cache)
-    
+        with self._lock:
+            return len(self._cache)
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by cached entries"""
+        with self._lock:
+            return self._bytes
+
     def cleanup_expired(self) -> int:
         """Remove expired entries and return count"""
-        now = time.time()
-        expired_keys = [k for k, v in self._cache.items() if now > v['expires_at']]
-        
-        for key in expired_keys:
-            del self._cache[key]
-            
-        logger.debug(f"Cleaned up {len(expired_keys)} expired entries")
-        return len(expired_keys)
+        with self._lock:
+            removed = self._expire(time.time())
+        logger.debug(f"Cleaned up {removed} expired entries")
+        return removed
 
-# Global cache instance
-cache = SimpleCache()
+    def _remove(self, key: str) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry['size']
 
+    def _expire(self, now: float) -> int:
+        """Pop every due heap record, dropping entries whose expiry still matches"""
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, _, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            if entry is not None and entry['expires_at'] == expires_at:
+                self._remove(key)
+                removed += 1
+                logger.debug(f"Cache expired for key: {key}")
+        return removed
 
+    def _evict(self) -> None:
+        """Drop least recently used entries until within max_entries and max_bytes"""
+        while self._cache and (len(self._cache) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._cache.popitem(last=False)
+            self._bytes -= entry['size']
+            logger.debug(f"Cache evicted LRU key: {key}")
 
+    def _compact_heap(self) -> None:
+        self._expiry_heap = [
+            (entry['expires_at'], next(self._seq), key) for key, entry in self._cache.items()
+        ]
+        heapq.heapify(self._expiry_heap)
+
+# Live caches, for the size gauges below
+_instances: "weakref.WeakSet[LRUTTLCache]" = weakref.WeakSet()
+
+def _sizes_by_name(measure) -> Dict[Tuple[str], int]:
+    sizes: Dict[Tuple[str], int] = {}
+    for instance in list(_instances):
+        sizes[(instance.name,)] = sizes.get((instance.name,), 0) + measure(instance)
+    return sizes
+
+registry.gauge("maple_mover_cache_entries", "Entries held per cache", ("cache",)).set_function(
+    lambda: _sizes_by_name(LRUTTLCache.size))
+registry.gauge("maple_mover_cache_bytes", "Approximate bytes held per cache", ("cache",)).set_function(
+    lambda: _sizes_by_name(LRUTTLCache.memory_usage))
+
+# Backwards-compatible name
+SimpleCache = LRUTTLCache
+
+# Global cache instance
+cache = LRUTTLCache()
@@ -0,0 +1,163 @@
+"""
+Shared HTTP transport for upstream APIs (NextBus, Nominatim, Google)
+One pooled keep-alive session per process with per-host concurrency limits
+"""
+
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import structlog
+from src.config.settings import Settings
+from src.utils.metrics import registry, record_upstream
+from src.utils.tracing import record_upstream_call
+
+logger = structlog.get_logger("maple_mover.http")
+
+Timeout = Union[float, Tuple[float, float]]
+
+class HTTPTransport:
+    """Pooled requests.Session shared by every upstream client
+
+    Connections are kept alive and reused per host (urllib3 pool of
+    HTTP_POOL_MAXSIZE). Each host also gets a semaphore of
+    HTTP_MAX_PER_HOST so a burst of sessions can't open an unbounded
+    number of sockets to one upstream. gzip/deflate is always negotiated.
+
+    The asyncio NextBus client sends its requests through aget(), so the
+    same per-host semaphores bound sync and async traffic together and
+    stats() counts both.
+    """
+
+    def __init__(self, pool_maxsize: Optional[int] = None, max_per_host: Optional[int] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None):
+        self.pool_maxsize = pool_maxsize if pool_maxsize is not None else Settings.HTTP_POOL_MAXSIZE
+        self.max_per_host = max_per_host if max_per_host is not None else Settings.HTTP_MAX_PER_HOST
+        self.connect_timeout = connect_timeout if connect_timeout is not None else Settings.HTTP_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout if read_timeout is not None else Settings.HTTP_READ_TIMEOUT
+
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self._adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.pool_maxsize)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._requests: Dict[str, int] = defaultdict(int)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._async_connections: Dict[str, int] = defaultdict(int)
+
+    def _limit_for(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return limit
+
+    def _timeout(self, timeout: Optional[Timeout]) -> Tuple[float, float]:
+        """A bare number is treated as the read timeout; connect uses the configured value"""
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.connect_timeout, timeout)
+
+    def get(self, url: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """GET through the shared pool (same signature as requests.get)"""
+        host = urlsplit(url).netloc
+        record_upstream_call()
+        with self._limit_for(host):
+            started = time.perf_counter()
+            ok = False
+            try:
+                response = self.session.get(url, timeout=self._timeout(timeout), **kwargs)
+                ok = response.status_code < 500
+                return response
+            except requests.RequestException:
+                with self._lock:
+                    self._errors[host] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._requests[host] += 1
+                record_upstream(url, time.perf_counter() - started, ok)
+
+    async def aget(self, client: Any, url: str, **kwargs) -> Any:
+        """GET through an httpx.AsyncClient under the same per-host limit and counters as get()
+
+        The semaphore is shared with blocking callers, so it is polled
+        instead of waited on to keep the event loop free.
+        """
+        host = urlsplit(url).netloc
+        record_upstream_call()
+        limit = self._limit_for(host)
+        delay = 0.005
+        while not limit.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+        async def trace(event_name: str, info: Dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                with self._lock:
+                    self._async_connections[host] += 1
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await client.get(url, extensions={"trace": trace}, **kwargs)
+            ok = response.status_code < 500
+            return response
+        except Exception:
+            with self._lock:
+                self._errors[host] += 1
+            raise
+        finally:
+            limit.release()
+            with self._lock:
+                self._requests[host] += 1
+            record_upstream(url, time.perf_counter() - started, ok)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-host request, connection and reuse counters (sync and async traffic combined)
+
+        connections is the number of TCP(+TLS) connections urllib3 and
+        httpx opened; every request beyond that reused a kept-alive
+        connection.
+        """
+        connections: Dict[str, int] = defaultdict(int)
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            connections[host] += pool.num_connections
+
+        with self._lock:
+            for host, count in self._async_connections.items():
+                connections[host] += count
+            hosts = set(self._requests) | set(connections)
+            return {
+                host: {
+                    'requests': self._requests.get(host, 0),
+                    'errors': self._errors.get(host, 0),
+                    'connections': connections.get(host, 0),
+                    'reused': max(0, self._requests.get(host, 0) - connections.get(host, 0)),
+                }
+                for host in sorted(hosts)
+            }
+
+    def close(self) -> None:
+        self.session.close()
+
+# Process-wide transport, shared by every session and service instance
+transport = HTTPTransport()
+
+registry.gauge(
+    "maple_mover_upstream_connections", "TCP connections opened per upstream host", ("host",)
+).set_function(lambda: {(host, ): stats['connections'] for host, stats in transport.stats().items()})
@@ -0,0 +1,308 @@
+"""
+Process metrics in the Prometheus text format
+Counters, gauges and histograms, served on a separate lightweight HTTP port
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+import structlog
+from src.config.settings import Settings
+
+logger = structlog.get_logger("maple_mover.metrics")
+
+# Seconds; covers a warm in-memory lookup up to a slow upstream timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """Current value per label set, either set directly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], object]) -> None:
+        """Compute the value(s) on every scrape
+
+        For an unlabelled gauge the callback returns a number; for a labelled
+        one it returns {label values tuple: number}.
+        """
+        self._function = function
+
+    def value(self, **labels) -> Optional[float]:
+        return dict(self._collect()).get(self._key(labels))
+
+    def _collect(self) -> List[Tuple[LabelValues, float]]:
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception as e:
+                logger.warning(f"⚠️ Metric callback for {self.name} failed: {e}")
+                return []
+            if result is None:
+                return []
+            if not isinstance(result, dict):
+                return [((), result)]
+            return sorted((tuple(str(v) for v in key), value) for key, value in result.items())
+        with self._lock:
+            return sorted(self._values.items())
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in self._collect()]
+
+class Histogram(_Metric):
+    """Bucketed observations (cumulative buckets, sum and count) per label set"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+ overflow), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics; get-or-create so modules can register on import without clashing"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labels: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} already registered as a different type or label set")
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labels, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# Process-wide registry, shared by every session and service instance
+registry = MetricsRegistry()
+
+UPSTREAM_REQUESTS = registry.counter(
+    "maple_mover_upstream_requests_total", "HTTP requests to upstream APIs", ("upstream", "command", "outcome"))
+UPSTREAM_SECONDS = registry.histogram(
+    "maple_mover_upstream_request_seconds", "Upstream request latency", ("upstream", "command"))
+CACHE_REQUESTS = registry.counter(
+    "maple_mover_cache_requests_total", "In-memory cache lookups by key prefix", ("cache", "prefix", "result"))
+ROUTES_CACHE_LOAD_SECONDS = registry.histogram(
+    "maple_mover_routes_cache_load_seconds", "Time to load the routes cache", ("source",))
+STAGE_SECONDS = registry.histogram(
+    "maple_mover_stage_duration_seconds", "Search pipeline stage latency (find_nearby_stops, predictions, search, ...)", ("stage",))
+
+def upstream_labels(url: str) -> Tuple[str, str]:
+    """(upstream, command) for an outgoing request URL
+
+    NextBus commands come from the command= parameter, Nominatim and
+    Google from the path (search / reverse / geocode).
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if "nominatim" in host:
+        return "nominatim", parts.path.strip("/").split("/")[0] or "search"
+    if host.endswith("googleapis.com"):
+        segments = [segment for segment in parts.path.split("/") if segment]
+        return "google", segments[-2] if len(segments) >= 2 else "unknown"
+    command = parse_qs(parts.query).get("command")
+    if command:
+        return "nextbus", command[0]
+    return host or "unknown", ""
+
+def record_upstream(url: str, seconds: float, ok: bool) -> None:
+    upstream, command = upstream_labels(url)
+    UPSTREAM_REQUESTS.inc(upstream=upstream, command=command, outcome="ok" if ok else "error")
+    UPSTREAM_SECONDS.observe(seconds, upstream=upstream, command=command)
+
+def cache_hit_ratio(cache: Optional[str] = None) -> Optional[float]:
+    """Hits / lookups since start, for one cache or all of them (None before any lookup)"""
+    hits = lookups = 0
+    with CACHE_REQUESTS._lock:
+        for (name, _prefix, result), count in CACHE_REQUESTS._values.items():
+            if cache is None or name == cache:
+                lookups += count
+                hits += count if result == "hit" else 0
+    return hits / lookups if lookups else None
+
+def upstream_request_counts() -> Dict[str, float]:
+    """Requests since start per upstream (nextbus, nominatim, google, ...)"""
+    totals: Dict[str, float] = {}
+    with UPSTREAM_REQUESTS._lock:
+        for (upstream, _command, _outcome), count in UPSTREAM_REQUESTS._values.items():
+            totals[upstream] = totals.get(upstream, 0) + count
+    return totals
+
+class MetricsServer:
+    """GET /metrics on its own port, off the Streamlit server"""
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, metrics: MetricsRegistry = registry):
+        self.host = host if host is not None else Settings.METRICS_HOST
+        self.port = port if port is not None else Settings.METRICS_PORT
+        self.metrics = metrics
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MetricsServer":
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if urlsplit(self.path).path not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the app log
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logger.info(f"📈 Metrics available at http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# Process-wide server, started once no matter how many sessions call it
+_server: Optional[MetricsServer] = None
+_server_failed = False  # The bind failed once; reruns don't retry it
+_server_lock = threading.Lock()
+
+def start_metrics_server() -> Optional[MetricsServer]:
+    """Start the metrics endpoint if enabled (idempotent; None if disabled or the port is taken)"""
+    global _server, _server_failed
+    if not Settings.METRICS_ENABLED:
+        return None
+    with _server_lock:
+        if _server is None and not _server_failed:
+            try:
+                _server = MetricsServer().start()
+            except OSError as e:
+                # Another worker process on this host already serves the port
+                _server_failed = True
+                logger.warning(f"⚠️ Metrics server not started on port {Settings.METRICS_PORT}: {e}")
+        return _server
@@ -0,0 +1,40 @@
+"""
+Client-side rate limiting
+Keeps requests to a rate-limited upstream (Nominatim: 1 request/second) spaced out across threads
+"""
+
+import threading
+import time
+
+class RateLimiter:
+    """Minimum spacing between requests, shared by every thread in the process
+
+    try_acquire never blocks, so a caller juggling several things (like the
+    hedged geocoder) can wait on its own terms; acquire blocks for callers
+    that have nothing better to do.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take the slot if it is free (returns 0.0); otherwise seconds until it will be"""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_slot:
+                self._next_slot = now + self.min_interval
+                return 0.0
+            return self._next_slot - now
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Block until a slot is taken (False if that would take longer than timeout)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
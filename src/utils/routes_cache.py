@@ -4,12 +4,17 @@ Saves routes to disk or Redis to avoid re-discovering on every app start
 """
 
 import json
+import mmap
 import os
 import pickle
+import tempfile
+import time
+import numpy as np
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import structlog
+from src.utils.metrics import ROUTES_CACHE_LOAD_SECONDS
 
 # Try to import Redis
 try:
@@ -22,14 +27,20 @@ except ImportError:
 logger = structlog.get_logger("routes_cache")
 
 CACHE_DIR = "cache"
-ROUTES_CACHE_FILE = os.path.join(CACHE_DIR, "routes_cache.json")
-ROUTES_CACHE_PICKLE = os.path.join(CACHE_DIR, "routes_cache.pkl")
+ROUTES_CACHE_FILE = os.path.join(CACHE_DIR, "routes_cache.json")  # legacy, no longer written
+ROUTES_CACHE_PICKLE = os.path.join(CACHE_DIR, "routes_cache.pkl")  # legacy, still readable
+ROUTES_CACHE_BINARY = os.path.join(CACHE_DIR, "routes_cache.bin")
+
+# Columnar binary format: MAGIC, u32 header length, JSON header, then 8-byte aligned arrays
+BINARY_MAGIC = b"MMRC"
+BINARY_VERSION = 1
 
 # Redis configuration
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_DB = int(os.getenv("REDIS_DB", "0"))
 REDIS_KEY = "maple_mover:routes_cache"
+REDIS_VERSION_KEY = "maple_mover:routes_cache:version"
 
 # Initialize Redis client
 redis_client = None
@@ -104,31 +115,192 @@ class RouteInfo:
             stops=[TransitStop.from_dict(stop) for stop in data['stops']]
         )
 
+
+# -----------------------------------------------------------------------------
+# Columnar binary format
+#
+# Stops are stored as parallel arrays (lat, lon and string tables for id, code
+# and title); strings are one UTF-8 blob plus n+1 byte offsets. Route -> stops
+# and stop -> routes are CSR adjacency lists (ptr[n+1] into an index array),
+# so every RouteInfo references the same TransitStop objects on load instead
+# of carrying its own copies. The lat/lon columns are handed out as read-only
+# views of the mapped file, so the spatial index built over them shares the
+# page cache with every other worker process.
+#
+# Only the raw bytes are shared: decode still builds every TransitStop and
+# route list in each process, because the services, gazetteer and UI all
+# work on stops_cache / routes_cache dicts of objects. Loading is therefore
+# a linear decode (tens of milliseconds for a TTC-sized network), not a
+# zero-cost map.
+# -----------------------------------------------------------------------------
+
+def _encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode strings as (offsets uint32[n+1], utf-8 blob uint8)"""
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+def _decode_strings(offsets: np.ndarray, blob: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+def _csr(rows: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Build (ptr uint32[n+1], idx uint32) from per-row index lists"""
+    ptr = np.zeros(len(rows) + 1, dtype=np.uint32)
+    ptr[1:] = np.cumsum([len(row) for row in rows], dtype=np.uint64)
+    idx = np.fromiter((i for row in rows for i in row), dtype=np.uint32, count=int(ptr[-1]))
+    return ptr, idx
+
+def encode_routes_cache(routes_cache: Dict, stops_cache: Dict, route_stops_cache: Dict, timestamp: str) -> bytes:
+    """Serialize the routes/stops caches into the columnar binary format"""
+    stop_ids = list(stops_cache)
+    stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+    stops = [stops_cache[stop_id] for stop_id in stop_ids]
+
+    # Real routes first; tags only seen in route_stops_cache follow them
+    route_tags = list(routes_cache)
+    route_index = {tag: i for i, tag in enumerate(route_tags)}
+    for tags in route_stops_cache.values():
+        for tag in tags:
+            if tag not in route_index:
+                route_index[tag] = len(route_tags)
+                route_tags.append(tag)
+
+    route_rows = [
+        [stop_index[stop.stop_id] for stop in routes_cache[tag].stops if stop.stop_id in stop_index]
+        for tag in routes_cache
+    ]
+    stop_rows = [[route_index[tag] for tag in route_stops_cache.get(stop_id, [])] for stop_id in stop_ids]
+
+    arrays = {}
+    arrays['stop_lat'] = np.array([stop.lat for stop in stops], dtype=np.float64)
+    arrays['stop_lon'] = np.array([stop.lon for stop in stops], dtype=np.float64)
+    arrays['stop_id_off'], arrays['stop_id_blob'] = _encode_strings(stop_ids)
+    arrays['stop_code_off'], arrays['stop_code_blob'] = _encode_strings([stop.stop_code for stop in stops])
+    arrays['stop_title_off'], arrays['stop_title_blob'] = _encode_strings([stop.title for stop in stops])
+    arrays['route_tag_off'], arrays['route_tag_blob'] = _encode_strings(route_tags)
+    arrays['route_title_off'], arrays['route_title_blob'] = _encode_strings([routes_cache[tag].title for tag in routes_cache])
+    arrays['route_stop_ptr'], arrays['route_stop_idx'] = _csr(route_rows)
+    arrays['stop_route_ptr'], arrays['stop_route_idx'] = _csr(stop_rows)
+
+    # Lay sections out after the header, each 8-byte aligned
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = (offset + 7) & ~7
+        sections[name] = [offset, array.dtype.str, int(array.size)]
+        offset += array.nbytes
+
+    header = {
+        'version': BINARY_VERSION,
+        'timestamp': timestamp,
+        'n_stops': len(stop_ids),
+        'n_routes': len(routes_cache),
+        'sections': sections,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = (len(BINARY_MAGIC) + 4 + len(header_bytes) + 7) & ~7
+
+    buffer = bytearray(data_start + offset)
+    buffer[:4] = BINARY_MAGIC
+    buffer[4:8] = len(header_bytes).to_bytes(4, 'little')
+    buffer[8:8 + len(header_bytes)] = header_bytes
+    for name, array in arrays.items():
+        start = data_start + sections[name][0]
+        buffer[start:start + array.nbytes] = array.tobytes()
+    return bytes(buffer)
+
+def _read_header(buffer):
+    """(header, section reader) for a binary buffer; sections are zero-copy np.frombuffer views"""
+    if bytes(buffer[:4]) != BINARY_MAGIC:
+        raise ValueError("Not a columnar routes cache")
+    header_len = int.from_bytes(bytes(buffer[4:8]), 'little')
+    header = json.loads(bytes(buffer[8:8 + header_len]).decode('utf-8'))
+    if header.get('version') != BINARY_VERSION:
+        raise ValueError(f"Unsupported routes cache version: {header.get('version')}")
+    data_start = (8 + header_len + 7) & ~7
+
+    def section(name):
+        offset, dtype, count = header['sections'][name]
+        return np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+
+    return header, section
+
+def decode_stop_coordinates(buffer) -> Tuple[np.ndarray, np.ndarray]:
+    """(lats, lons) float64 views into buffer, in the same order as the decoded stops_cache"""
+    _, section = _read_header(buffer)
+    return section('stop_lat'), section('stop_lon')
+
+def decode_routes_cache(buffer) -> Tuple[Dict, Dict, Dict, str]:
+    """Rebuild (routes_cache, stops_cache, route_stops_cache, timestamp) from a binary buffer
+
+    buffer may be bytes or an mmap; arrays are read in place with np.frombuffer.
+    """
+    header, section = _read_header(buffer)
+
+    stop_ids = _decode_strings(section('stop_id_off'), section('stop_id_blob'))
+    stop_codes = _decode_strings(section('stop_code_off'), section('stop_code_blob'))
+    stop_titles = _decode_strings(section('stop_title_off'), section('stop_title_blob'))
+    route_tags = _decode_strings(section('route_tag_off'), section('route_tag_blob'))
+    route_titles = _decode_strings(section('route_title_off'), section('route_title_blob'))
+    lats = section('stop_lat').tolist()
+    lons = section('stop_lon').tolist()
+    stop_route_ptr = section('stop_route_ptr').tolist()
+    stop_route_idx = section('stop_route_idx').tolist()
+    route_stop_ptr = section('route_stop_ptr').tolist()
+    route_stop_idx = section('route_stop_idx').tolist()
+
+    route_stops_cache = {}
+    stops = []
+    for i, stop_id in enumerate(stop_ids):
+        routes = [route_tags[r] for r in stop_route_idx[stop_route_ptr[i]:stop_route_ptr[i + 1]]]
+        route_stops_cache[stop_id] = routes
+        stops.append(TransitStop(
+            stop_id=stop_id,
+            stop_code=stop_codes[i],
+            title=stop_titles[i],
+            lat=lats[i],
+            lon=lons[i],
+            routes=list(routes)
+        ))
+    stops_cache = {stop.stop_id: stop for stop in stops}
+
+    routes_cache = {}
+    for r in range(header['n_routes']):
+        routes_cache[route_tags[r]] = RouteInfo(
+            tag=route_tags[r],
+            title=route_titles[r],
+            stops=[stops[s] for s in route_stop_idx[route_stop_ptr[r]:route_stop_ptr[r + 1]]]
+        )
+
+    return routes_cache, stops_cache, route_stops_cache, header.get('timestamp', 'unknown')
+
+def _from_legacy_dict(cache_data: Dict) -> Tuple[Dict, Dict, Dict]:
+    """Convert a pickled nested-dict cache (format 1.0) back to objects"""
+    routes_cache = {}
+    for route_tag, route_data in cache_data['routes'].items():
+        routes_cache[route_tag] = RouteInfo.from_dict(route_data)
+    
+    stops_cache = {}
+    for stop_id, stop_data in cache_data['stops'].items():
+        stops_cache[stop_id] = TransitStop.from_dict(stop_data)
+    
+    route_stops_cache = cache_data.get('route_stops', {})
+    return routes_cache, stops_cache, route_stops_cache
+
 def save_routes_cache(routes_cache: Dict, stops_cache: Dict, route_stops_cache: Dict):
-    """Save routes cache to Redis (if available) or disk"""
+    """Save routes cache to Redis (if available) or disk in the columnar binary format"""
     try:
-        # Convert to serializable format
-        routes_dict = {}
-        for route_tag, route_info in routes_cache.items():
-            routes_dict[route_tag] = route_info.to_dict() if hasattr(route_info, 'to_dict') else asdict(route_info)
-        
-        stops_dict = {}
-        for stop_id, stop in stops_cache.items():
-            stops_dict[stop_id] = stop.to_dict() if hasattr(stop, 'to_dict') else asdict(stop)
-        
-        cache_data = {
-            'routes': routes_dict,
-            'stops': stops_dict,
-            'route_stops': route_stops_cache,
-            'timestamp': datetime.now().isoformat(),
-            'version': '1.0'
-        }
+        timestamp = datetime.now().isoformat()
+        data = encode_routes_cache(routes_cache, stops_cache, route_stops_cache, timestamp)
         
         # Try Redis first (fastest, shared across servers)
         if redis_client:
             try:
-                pickled_data = pickle.dumps(cache_data)
-                redis_client.set(REDIS_KEY, pickled_data)
+                redis_client.set(REDIS_KEY, data)
+                redis_client.set(REDIS_VERSION_KEY, timestamp)
                 logger.info(f"✅ Saved routes cache to Redis: {len(routes_cache)} routes, {len(stops_cache)} stops")
                 return True
             except Exception as e:
@@ -137,16 +309,18 @@ def save_routes_cache(routes_cache: Dict, stops_cache: Dict, route_stops_cache:
         # Fallback to disk
         os.makedirs(CACHE_DIR, exist_ok=True)
         
-        # Save using pickle for performance
-        with open(ROUTES_CACHE_PICKLE, 'wb') as f:
-            pickle.dump(cache_data, f)
-        
-        # Also save as JSON for human readability
-        with open(ROUTES_CACHE_FILE, 'w') as f:
-            json.dump(cache_data, f, indent=2)
+        # Write then rename, so processes that have the old file mapped keep a consistent view
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".routes_cache.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, ROUTES_CACHE_BINARY)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
         
-        logger.info(f"✅ Saved routes cache to disk: {len(routes_cache)} routes, {len(stops_cache)} stops")
-        logger.info(f"📁 Cache file: {ROUTES_CACHE_PICKLE}")
+        logger.info(f"✅ Saved routes cache to disk: {len(routes_cache)} routes, {len(stops_cache)} stops ({len(data) / 1024:.0f} KB)")
+        logger.info(f"📁 Cache file: {ROUTES_CACHE_BINARY}")
         
         return True
         
@@ -155,78 +329,107 @@ def save_routes_cache(routes_cache: Dict, stops_cache: Dict, route_stops_cache:
         return False
 
 def load_routes_cache() -> Optional[Tuple]:
-    """Load routes cache from Redis (if available) or disk"""
+    """Load routes cache from Redis (if available) or the memory-mapped disk file
+    
+    Returns (routes_cache, stops_cache, route_stops_cache, stop_coordinates);
+    stop_coordinates is (lats, lons) in stops_cache order for the columnar
+    format (mmap-backed when read from disk), else None.
+    """
+    started = time.perf_counter()
     try:
         # Try Redis first (fastest, shared across servers)
         if redis_client:
             try:
-                pickled_data = redis_client.get(REDIS_KEY)
-                if pickled_data:
-                    cache_data = pickle.loads(pickled_data)
-                    
-                    # Convert back to objects
-                    routes_cache = {}
-                    for route_tag, route_data in cache_data['routes'].items():
-                        routes_cache[route_tag] = RouteInfo.from_dict(route_data)
-                    
-                    stops_cache = {}
-                    for stop_id, stop_data in cache_data['stops'].items():
-                        stops_cache[stop_id] = TransitStop.from_dict(stop_data)
-                    
-                    route_stops_cache = cache_data.get('route_stops', {})
+                data = redis_client.get(REDIS_KEY)
+                if data:
+                    coordinates = None
+                    if data[:4] == BINARY_MAGIC:
+                        routes_cache, stops_cache, route_stops_cache, timestamp = decode_routes_cache(data)
+                        coordinates = decode_stop_coordinates(data)
+                    else:
+                        cache_data = pickle.loads(data)
+                        routes_cache, stops_cache, route_stops_cache = _from_legacy_dict(cache_data)
+                        timestamp = cache_data.get('timestamp', 'unknown')
                     
-                    timestamp = cache_data.get('timestamp', 'unknown')
+                    ROUTES_CACHE_LOAD_SECONDS.observe(time.perf_counter() - started, source="redis")
                     logger.info(f"✅ Loaded routes cache from Redis ({timestamp})")
                     logger.info(f"📋 Cache contains: {len(routes_cache)} routes, {len(stops_cache)} stops")
                     
-                    return routes_cache, stops_cache, route_stops_cache
+                    return routes_cache, stops_cache, route_stops_cache, coordinates
             except Exception as e:
                 logger.warning(f"⚠️ Redis load failed: {e}. Using disk fallback.")
         
-        # Fallback to disk
-        if not os.path.exists(ROUTES_CACHE_PICKLE):
+        # Fallback to disk: columnar file, mapped read-only so worker processes share its pages.
+        # The map stays open for as long as the coordinate views reference it (an atomic
+        # replace on save leaves this mapping on the old inode)
+        coordinates = None
+        if os.path.exists(ROUTES_CACHE_BINARY):
+            with open(ROUTES_CACHE_BINARY, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            routes_cache, stops_cache, route_stops_cache, timestamp = decode_routes_cache(mapped)
+            coordinates = decode_stop_coordinates(mapped)
+            source = "disk"
+        elif os.path.exists(ROUTES_CACHE_PICKLE):
+            with open(ROUTES_CACHE_PICKLE, 'rb') as f:
+                cache_data = pickle.load(f)
+            routes_cache, stops_cache, route_stops_cache = _from_legacy_dict(cache_data)
+            timestamp = cache_data.get('timestamp', 'unknown')
+            source = "legacy pickle"
+        else:
             logger.info("📋 No routes cache found (Redis or disk)")
-            return None, None, None
-        
-        # Load using pickle
-        with open(ROUTES_CACHE_PICKLE, 'rb') as f:
-            cache_data = pickle.load(f)
-        
-        # Convert back to objects
-        routes_cache = {}
-        for route_tag, route_data in cache_data['routes'].items():
-            routes_cache[route_tag] = RouteInfo.from_dict(route_data)
+            return None, None, None, None
         
-        stops_cache = {}
-        for stop_id, stop_data in cache_data['stops'].items():
-            stops_cache[stop_id] = TransitStop.from_dict(stop_data)
-        
-        route_stops_cache = cache_data.get('route_stops', {})
-        
-        timestamp = cache_data.get('timestamp', 'unknown')
-        logger.info(f"✅ Loaded routes cache from disk ({timestamp})")
+        ROUTES_CACHE_LOAD_SECONDS.observe(time.perf_counter() - started, source="pickle" if source == "legacy pickle" else source)
+        logger.info(f"✅ Loaded routes cache from {source} ({timestamp})")
         logger.info(f"📋 Cache contains: {len(routes_cache)} routes, {len(stops_cache)} stops")
         
-        return routes_cache, stops_cache, route_stops_cache
+        return routes_cache, stops_cache, route_stops_cache, coordinates
         
     except Exception as e:
         logger.error(f"❌ Failed to load routes cache: {e}")
-        return None, None, None
+        return None, None, None, None
+
+def _cache_path() -> str:
+    """Disk cache file in use (columnar if present, else legacy pickle)"""
+    return ROUTES_CACHE_BINARY if os.path.exists(ROUTES_CACHE_BINARY) else ROUTES_CACHE_PICKLE
 
 def cache_exists() -> bool:
     """Check if routes cache file exists"""
-    return os.path.exists(ROUTES_CACHE_PICKLE)
+    return os.path.exists(ROUTES_CACHE_BINARY) or os.path.exists(ROUTES_CACHE_PICKLE)
+
+def get_cache_version() -> Optional[str]:
+    """Cheap token that changes whenever the routes cache is rewritten (None if no cache)"""
+    if redis_client:
+        try:
+            version = redis_client.get(REDIS_VERSION_KEY)
+            if version:
+                return version.decode()
+        except Exception as e:
+            logger.warning(f"⚠️ Redis version check failed: {e}. Using disk fallback.")
+    
+    try:
+        return str(os.path.getmtime(_cache_path()))
+    except OSError:
+        return None
 
 def get_cache_age() -> int:
-    """Get age of cache in days"""
+    """Get age of cache in days (-1 if there is none)"""
+    if redis_client:
+        try:
+            version = redis_client.get(REDIS_VERSION_KEY)
+            if version:
+                # The version is the save timestamp
+                return (datetime.now() - datetime.fromisoformat(version.decode())).days
+        except Exception as e:
+            logger.warning(f"⚠️ Redis cache age check failed: {e}. Using disk fallback.")
+    
     if not cache_exists():
         return -1
     
     try:
-        file_time = os.path.getmtime(ROUTES_CACHE_PICKLE)
+        file_time = os.path.getmtime(_cache_path())
         cache_time = datetime.fromtimestamp(file_time)
         age = (datetime.now() - cache_time).days
         return age
     except:
         return -1
-
@@ -0,0 +1,70 @@
+"""
+Single-flight request coalescing
+Concurrent callers asking for the same key share one in-flight upstream call
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+import structlog
+
+logger = structlog.get_logger("maple_mover.single_flight")
+
+class _Call:
+    """One in-flight call and the outcome its waiters will receive"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Deduplicate concurrent calls by key
+
+    The first caller for a key (the leader) runs fn; callers that arrive
+    while it is running block until it finishes and get the same result,
+    or the same exception re-raised. Nothing is remembered afterwards, so
+    pair it with the TTL cache to absorb later repeats.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn once for all concurrent callers of key and return its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                logger.debug(f"Coalesced {call.waiters} duplicate call(s) for key: {key}")
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of keys currently being fetched"""
+        with self._lock:
+            return len(self._calls)
+
+# Global single-flight group shared by every session
+flights = SingleFlight()
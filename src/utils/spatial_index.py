@@ -0,0 +1,141 @@
+"""
+Grid-based spatial index for transit stops
+Buckets points into fixed-size lat/lon cells so nearby queries only touch a few cells
+"""
+
+import math
+import numpy as np
+from typing import Dict, Generic, Iterable, List, Sequence, Tuple, TypeVar
+from src.utils.geo_utils import calculate_distances
+
+KM_PER_DEGREE_LAT = 111.32
+
+T = TypeVar("T")
+
+class GridSpatialIndex(Generic[T]):
+    """Fixed-size cell index over contiguous float64 coordinate arrays
+
+    Cells are cell_size_m on a side at the reference latitude. Longitude
+    degrees are scaled by cos(lat), so a cell is roughly square on the
+    ground instead of squashed east-west. Each cell holds integer offsets
+    into lats/lons/items, and candidate distances are computed with the
+    vectorized haversine.
+    """
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float], items: Sequence[T],
+                 cell_size_m: float = 250.0, ref_lat: float = 43.7):
+        self.cell_size_m = cell_size_m
+        self.ref_lat = ref_lat
+        self.cell_lat = (cell_size_m / 1000.0) / KM_PER_DEGREE_LAT
+        self.cell_lon = self.cell_lat / math.cos(math.radians(ref_lat))
+
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lons = np.ascontiguousarray(lons, dtype=np.float64)
+        self.items = items
+        self._cells: Dict[Tuple[int, int], np.ndarray] = self._bucket()
+
+    @classmethod
+    def from_points(cls, points: Iterable[Tuple[float, float, T]], **kwargs) -> "GridSpatialIndex[T]":
+        """Build from (lat, lon, item) tuples"""
+        lats, lons, items = [], [], []
+        for lat, lon, item in points:
+            lats.append(lat)
+            lons.append(lon)
+            items.append(item)
+        return cls(lats, lons, items, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _bucket(self) -> Dict[Tuple[int, int], np.ndarray]:
+        """Group point offsets by cell"""
+        if not len(self.lats):
+            return {}
+
+        ci = np.floor(self.lats / self.cell_lat).astype(np.int64)
+        cj = np.floor(self.lons / self.cell_lon).astype(np.int64)
+        order = np.lexsort((cj, ci))
+        changes = (np.diff(ci[order]) != 0) | (np.diff(cj[order]) != 0)
+        groups = np.split(order, np.flatnonzero(changes) + 1)
+        return {(int(ci[group[0]]), int(cj[group[0]])): group for group in groups}
+
+    def _cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon))
+
+    def _ring(self, center: Tuple[int, int], ring: int) -> Iterable[Tuple[int, int]]:
+        """Cells exactly `ring` steps away from center (Chebyshev distance)"""
+        ci, cj = center
+        if ring == 0:
+            yield center
+            return
+        for dj in range(-ring, ring + 1):
+            yield (ci - ring, cj + dj)
+            yield (ci + ring, cj + dj)
+        for di in range(-ring + 1, ring):
+            yield (ci + di, cj - ring)
+            yield (ci + di, cj + ring)
+
+    def _ranked(self, lat: float, lon: float, offsets: List[np.ndarray], max_distance_m: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Distances (m) and offsets of candidates, closest first"""
+        if not offsets:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        idx = np.concatenate(offsets)
+        distances = calculate_distances(lat, lon, self.lats[idx], self.lons[idx]) * 1000
+        if max_distance_m is not None:
+            keep = distances <= max_distance_m
+            idx, distances = idx[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return distances[order], idx[order]
+
+    def within_radius(self, lat: float, lon: float, radius_m: float) -> List[Tuple[float, T]]:
+        """All items within radius_m, as (distance_m, item) sorted by distance"""
+        radius_km = radius_m / 1000.0
+        lat_margin = radius_km / KM_PER_DEGREE_LAT
+        lon_margin = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+
+        min_i, min_j = self._cell_of(lat - lat_margin, lon - lon_margin)
+        max_i, max_j = self._cell_of(lat + lat_margin, lon + lon_margin)
+
+        offsets = [
+            self._cells[(i, j)]
+            for i in range(min_i, max_i + 1)
+            for j in range(min_j, max_j + 1)
+            if (i, j) in self._cells
+        ]
+        distances, idx = self._ranked(lat, lon, offsets, radius_m)
+        return [(float(d), self.items[i]) for d, i in zip(distances, idx)]
+
+    def nearest(self, lat: float, lon: float, k: int, max_radius_m: float = None) -> List[Tuple[float, T]]:
+        """k nearest items, as (distance_m, item) sorted by distance
+
+        Grows the searched ring of cells until k candidates are found and the
+        ring is wider than the k-th distance, so no closer item can remain in
+        an unvisited cell.
+        """
+        if k <= 0 or not len(self):
+            return []
+
+        center = self._cell_of(lat, lon)
+        # Smallest ground distance covered by `ring` full rings around the query point
+        min_cell_m = self.cell_size_m * min(1.0, math.cos(math.radians(lat)) / math.cos(math.radians(self.ref_lat)))
+        max_ring = int(max_radius_m / min_cell_m) + 1 if max_radius_m is not None else None
+        cells_left = len(self._cells)
+
+        offsets = []
+        ring = 0
+        while True:
+            for cell in self._ring(center, ring):
+                bucket = self._cells.get(cell)
+                if bucket is not None:
+                    offsets.append(bucket)
+                    cells_left -= 1
+
+            distances, idx = self._ranked(lat, lon, offsets, max_radius_m)
+            # Everything in unvisited rings is at least `ring * min_cell_m` away
+            if len(distances) >= k and distances[k - 1] <= ring * min_cell_m:
+                break
+            if cells_left <= 0 or (max_ring is not None and ring >= max_ring):
+                break
+            ring += 1
+
+        return [(float(d), self.items[i]) for d, i in zip(distances[:k], idx[:k])]
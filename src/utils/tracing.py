@@ -0,0 +1,158 @@
+"""
+Per-stage timing for the search pipeline
+Nested spans with structured log fields and one summary line per request
+"""
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import structlog
+from src.utils.metrics import STAGE_SECONDS
+
+logger = structlog.get_logger("maple_mover.trace")
+
+class Span:
+    """One timed stage of a request
+
+    upstream_calls counts HTTP requests made while the span (or one of its
+    children) was current. cache_hit is None when the stage has no cache.
+    """
+
+    def __init__(self, stage: str, parent: Optional["Span"] = None, **fields):
+        self.stage = stage
+        self.parent = parent
+        self.fields: Dict[str, Any] = fields
+        self.cache_hit: Optional[bool] = None
+        self.upstream_calls = 0
+        self.children: List["Span"] = []
+        self.duration_ms: Optional[float] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, cache_hit: Optional[bool] = None, **fields) -> None:
+        """Attach fields to the span's log line"""
+        if cache_hit is not None:
+            self.cache_hit = cache_hit
+        self.fields.update(fields)
+
+    def _finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 2)
+        if self.parent is not None:
+            with self.parent._lock:
+                self.parent.children.append(self)
+                self.parent.upstream_calls += self.upstream_calls
+
+    def self_ms(self) -> float:
+        """Time not covered by child spans (concurrent children can cover it all)"""
+        return max(0.0, (self.duration_ms or 0.0) - sum(child.duration_ms or 0.0 for child in self.children))
+
+    def stages(self, exclusive: bool = False) -> Dict[str, float]:
+        """Milliseconds per stage name below this span, repeated stages summed
+
+        Inclusive by default (a stage's time contains its children's);
+        exclusive gives each stage only its own time.
+        """
+        totals: Dict[str, float] = {}
+        pending = list(self.children)
+        while pending:
+            child = pending.pop()
+            elapsed = child.self_ms() if exclusive else (child.duration_ms or 0.0)
+            totals[child.stage] = round(totals.get(child.stage, 0.0) + elapsed, 2)
+            pending.extend(child.children)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.stage,
+            'duration_ms': self.duration_ms,
+            'upstream_calls': self.upstream_calls,
+            'cache_hit': self.cache_hit,
+            **self.fields,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+# Current span of this thread / asyncio task (tasks inherit it when created)
+_current: ContextVar[Optional[Span]] = ContextVar("maple_mover_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+@contextmanager
+def span(stage: str, **fields) -> Iterator[Span]:
+    """Time a stage; nests under the current span, or starts a request if there is none
+
+    Every span logs its stage, duration_ms, upstream_calls and cache_hit at
+    debug level. A top-level span also logs the per-request summary.
+    """
+    parent = _current.get()
+    current = Span(stage, parent, **fields)
+    token = _current.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        current._finish()
+        STAGE_SECONDS.observe(current.duration_ms / 1000, stage=stage)
+        logger.debug(
+            f"⏱️ {stage}: {current.duration_ms:.1f}ms",
+            stage=stage, duration_ms=current.duration_ms, upstream_calls=current.upstream_calls,
+            cache_hit=current.cache_hit, **current.fields
+        )
+        if parent is None:
+            _log_summary(current)
+
+def traced(stage: str) -> Callable:
+    """Decorator form of span() for sync and async functions"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """Run work (e.g. a background refresh) outside the current request's spans"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def record_upstream_call(count: int = 1) -> None:
+    """Count an HTTP request against the current span"""
+    current = _current.get()
+    if current is not None and current.duration_ms is None:
+        with current._lock:
+            current.upstream_calls += count
+
+def mark_cache_hit(hit: bool) -> None:
+    """Record whether the current stage was answered from a cache"""
+    current = _current.get()
+    if current is not None:
+        current.cache_hit = hit
+
+def _log_summary(root: Span) -> None:
+    stages = root.stages()
+    own_time = root.stages(exclusive=True)
+    slowest = max(own_time, key=own_time.get) if own_time else root.stage
+    logger.info(
+        f"📊 {root.stage} took {root.duration_ms:.1f}ms ({root.upstream_calls} upstream calls, slowest stage: {slowest})",
+        stage=root.stage, duration_ms=root.duration_ms, upstream_calls=root.upstream_calls,
+        cache_hit=root.cache_hit, stages=stages, slowest_stage=slowest, **root.fields
+    )